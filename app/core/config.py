@@ -48,6 +48,9 @@ class Settings(BaseSettings):
     history_retention_days: int = 90
     history_messages_limit: int = 5
     history_window_hours: int = 24
+    dynamodb_max_pool_connections: int = 64
+    history_skip_unknown_users: bool = False  # only safe with a single process writing history
+    history_layout: str = "message"  # "message" (one item per message) or "session" (one item per user-hour)
 
     class Config:
         env_file = ".env"
@@ -2,14 +2,21 @@
 FastAPI application initialization.
 Educational Query Classifier API for WhatsApp integration.
 """
+import asyncio
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from app.core.config import settings
 from app.core.logging_config import logger
 from app.api.routes import router
 from app.utils.exceptions import ClassifierException
 
+try:
+    import orjson  # noqa: F401 - required by ORJSONResponse
+    DefaultResponse = ORJSONResponse
+except ImportError:  # Optional speedup - fall back to stdlib JSON
+    DefaultResponse = JSONResponse
+
 
 # Initialize FastAPI application
 app = FastAPI(
@@ -18,7 +25,8 @@ app = FastAPI(
     description=settings.api_description,
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    default_response_class=DefaultResponse
 )
 
 # Add CORS middleware
@@ -36,7 +44,7 @@ app.add_middleware(
 async def classifier_exception_handler(request: Request, exc: ClassifierException):
     """Handle classifier-specific exceptions."""
     logger.error(f"ClassifierException: {exc}")
-    return JSONResponse(
+    return DefaultResponse(
         status_code=500,
         content={
             "error": "ClassificationError",
@@ -51,7 +59,7 @@ async def classifier_exception_handler(request: Request, exc: ClassifierExceptio
 async def global_exception_handler(request: Request, exc: Exception):
     """Handle unexpected exceptions."""
     logger.error(f"Unexpected error: {exc}", exc_info=True)
-    return JSONResponse(
+    return DefaultResponse(
         status_code=500,
         content={
             "error": "InternalServerError",
@@ -69,6 +77,21 @@ async def startup_event():
     logger.info(f"Environment: {settings.environment}")
     logger.info(f"OpenAI Model: {settings.openai_model}")
 
+    # Warm up the FAQ and guidance processors (Parquet + local index, if enabled) before the first request
+    try:
+        from app.services.exam_faq_query import get_query_processor
+        await asyncio.to_thread(get_query_processor)
+        logger.info("FAQ query processor warmed up")
+    except Exception as e:
+        logger.error(f"FAQ query processor warm-up failed: {e}")
+
+    try:
+        from app.services.guidance_processor import get_query_processor as get_guidance_processor
+        await asyncio.to_thread(get_guidance_processor)
+        logger.info("Guidance query processor warmed up")
+    except Exception as e:
+        logger.error(f"Guidance query processor warm-up failed: {e}")
+
 
 # Shutdown event
 @app.on_event("shutdown")
@@ -76,6 +99,12 @@ async def shutdown_event():
     """Run on application shutdown."""
     logger.info(f"Shutting down {settings.api_title}")
 
+    from app.services.followup_detector import followup_detector
+    await followup_detector.close()
+
+    from app.services.history_service import history_service
+    await history_service.close()
+
 
 # Include routers
 app.include_router(router, tags=["Classification"])
@@ -8,6 +8,7 @@ Coordinates the complete classification flow:
 5. Exam Sub-Classification (if exam_related_info)
 6. Response Generation (via appropriate handler)
 """
+import logging
 import time
 from typing import Optional
 from app.core.logging_config import logger
@@ -166,15 +167,17 @@ class ClassificationPipeline:
                     }
 
                     response_data = await handler.handle(query_to_classify, classification_data)
-                    logger.info(f"[Pipeline] Handler response status: {response_data.get('status')}")
-                    logger.info(f"[Pipeline] ========== HANDLER RESPONSE STRUCTURE ==========")
-                    logger.info(f"[Pipeline] Keys in response_data: {list(response_data.keys())}")
-                    logger.info(f"[Pipeline] Status: {response_data.get('status')}")
-                    logger.info(f"[Pipeline] Message: {response_data.get('message')}")
-                    if response_data.get('data'):
-                        logger.info(f"[Pipeline] Data keys: {list(response_data['data'].keys()) if isinstance(response_data['data'], dict) else 'Not a dict'}")
-                        logger.info(f"[Pipeline] Data content preview: {str(response_data['data'])[:200]}...")
-                    logger.info(f"[Pipeline] ==================================================")
+                    logger.info("[Pipeline] Handler response status: %s", response_data.get('status'))
+                    # The structure dump stringifies the whole response, so only build it when DEBUG is on
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("[Pipeline] ========== HANDLER RESPONSE STRUCTURE ==========")
+                        logger.debug("[Pipeline] Keys in response_data: %s", list(response_data.keys()))
+                        logger.debug("[Pipeline] Status: %s", response_data.get('status'))
+                        logger.debug("[Pipeline] Message: %s", response_data.get('message'))
+                        if response_data.get('data'):
+                            logger.debug("[Pipeline] Data keys: %s", list(response_data['data'].keys()) if isinstance(response_data['data'], dict) else 'Not a dict')
+                            logger.debug("[Pipeline] Data content preview: %.200s...", str(response_data['data']))
+                        logger.debug("[Pipeline] ==================================================")
                 except Exception as e:
                     logger.error(f"[Pipeline] Handler execution failed: {e}")
                     response_data = {
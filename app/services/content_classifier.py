@@ -2,6 +2,10 @@
 Simple content classifier for app-related queries.
 Classifies into: lecture, notes, toppers_notes, test_chapterwise, test_full_length
 """
+import functools
+import threading
+from collections import OrderedDict
+from typing import Optional
 from openai import OpenAI
 from app.core.config import settings
 from app.core.logging_config import logger
@@ -22,7 +26,8 @@ class SimpleContentClassifier:
 
     def classify(self, question: str) -> str:
         """
-        Classify content request into one of 5 categories.
+        Classify content request into one of 5 categories, defaulting to 'lecture' on API errors
+        or invalid model output.
 
         Args:
             question: User's content request query
@@ -30,6 +35,23 @@ class SimpleContentClassifier:
         Returns:
             One of: 'lecture', 'notes', 'toppers_notes', 'test_chapterwise', 'test_full_length'
         """
+        try:
+            return self.request_category(question) or 'lecture'
+        except Exception as e:
+            logger.error(f"❌ Content classification error: {str(e)}")
+            return 'lecture'  # Safe default
+
+    def request_category(self, question: str) -> Optional[str]:
+        """
+        Ask the model for the category; raises on API errors and returns None on invalid
+        output (so callers can avoid caching either).
+
+        Args:
+            question: User's content request query
+
+        Returns:
+            One of: 'lecture', 'notes', 'toppers_notes', 'test_chapterwise', 'test_full_length', or None
+        """
         system_prompt = f"""You are a classifier for educational content requests.
 Your ONLY job is to return ONE category from this list:
 1. lecture
@@ -102,32 +124,45 @@ Query: {question}
 Return ONLY ONE word from: lecture, notes, toppers_notes, test_chapterwise, test_full_length
 """
 
-        try:
-            response = self.client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[{"role": "user", "content": system_prompt}],
-                temperature=0,
-                max_tokens=20
-            )
-
-            raw_response = response.choices[0].message.content.strip().lower()
-
-            # Validate response
-            if raw_response in self.categories.keys():
-                logger.info(f"✅ Content Classification: '{question}' → {raw_response}")
-                return raw_response
-            else:
-                logger.warning(f"⚠️ Invalid response '{raw_response}', defaulting to 'lecture'")
-                return 'lecture'
+        response = self.client.chat.completions.create(
+            model=settings.openai_model,
+            messages=[{"role": "user", "content": system_prompt}],
+            temperature=0,
+            max_tokens=20
+        )
 
-        except Exception as e:
-            logger.error(f"❌ Content classification error: {str(e)}")
-            return 'lecture'  # Safe default
+        raw_response = response.choices[0].message.content.strip().lower()
+
+        # Validate response
+        if raw_response in self.categories.keys():
+            logger.info(f"✅ Content Classification: '{question}' → {raw_response}")
+            return raw_response
+        else:
+            logger.warning(f"⚠️ Invalid response '{raw_response}', defaulting to 'lecture'")
+            return None
+
+
+# Normalized query -> category for successful classifications only
+_CATEGORY_CACHE_SIZE = 8192
+_category_cache: "OrderedDict[str, str]" = OrderedDict()
+_category_cache_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_classifier() -> SimpleContentClassifier:
+    """Build the OpenAI client and classifier once per process."""
+    client = OpenAI(
+        api_key=settings.openai_api_key,
+        organization=settings.openai_org_id
+    )
+    return SimpleContentClassifier(client)
 
 
 def simple_classify(user_query: str) -> str:
     """
     Main function to classify user query into one of 5 content categories.
+    Repeated requests (after lowercasing and collapsing whitespace) are served from an LRU cache;
+    the model always sees the original text.
 
     Args:
         user_query: The user's question/request
@@ -135,10 +170,23 @@ def simple_classify(user_query: str) -> str:
     Returns:
         One of: 'lecture', 'notes', 'toppers_notes', 'test_chapterwise', 'test_full_length'
     """
-    client = OpenAI(
-        api_key=settings.openai_api_key,
-        organization=settings.openai_org_id
-    )
-    classifier = SimpleContentClassifier(client)
-    result = classifier.classify(user_query)
-    return result
+    cache_key = " ".join((user_query or "").lower().split())
+    with _category_cache_lock:
+        category = _category_cache.get(cache_key)
+        if category is not None:
+            _category_cache.move_to_end(cache_key)
+            return category
+
+    try:
+        category = _get_classifier().request_category(user_query)
+    except Exception as e:
+        logger.error(f"❌ Content classification error: {str(e)}")
+        return 'lecture'  # Safe default
+    if category is None:
+        return 'lecture'
+
+    with _category_cache_lock:
+        _category_cache[cache_key] = category
+        while len(_category_cache) > _CATEGORY_CACHE_SIZE:
+            _category_cache.popitem(last=False)
+    return category
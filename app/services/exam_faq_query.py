@@ -1,12 +1,20 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import pandas as pd
 import pyarrow.parquet as pq
+import asyncio
 import json
 import logging
 import re
-from typing import List, Dict
+import threading
+from typing import List, Dict, Final
 from dotenv import load_dotenv
 import os
+from app.services.question_index import EmbeddingBatcher, LocalQuestionIndex, embed_query
+
+try:
+    import polars as pl
+except ImportError:  # Optional dependency - Parquet is read with pyarrow
+    pl = None
 
 # Load environment variables
 load_dotenv() 
@@ -20,350 +28,23 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL")
 PARQUET_FILE_PATH = os.getenv("PARQUET_FILE_PATH")
 VECTOR_STORE_ID = os.getenv("VECTOR_STORE_ID", "vs_68b97d5ff1d48191adc2165ceaa4f969")
-
-
-def extract_question_id(question: str) -> dict:
-    """
-    Extract question ID from the question text.
-    
-    Example:
-        "question 2858:- FAQ 19: Teacher kaun padhayega kaise dekhein?"
-        → {"question_id": "2858", "clean_text": "FAQ 19: Teacher kaun padhayega kaise dekhein?"}
-    """
-    pattern = r'^question\s*(\d+)\s*[:\-]+\s*'
-    
-    match = re.match(pattern, question.strip(), flags=re.IGNORECASE)
-    
-    if match:
-        return {
-            "question_id": match.group(1),
-            "clean_text": question[match.end():].strip()
-        }
-    
-    return {
-        "question_id": None,
-        "clean_text": question.strip()
-    }
-class QueryProcessor:
-    def __init__(self, api_key=None):
-        """Initialize the query processor with OpenAI client"""
-        try:
-            if api_key:
-                self.openai_client = OpenAI(api_key=api_key)
-            else:
-                if not API_KEY:
-                    raise ValueError("OpenAI API key is required but not found")
-                self.openai_client = OpenAI(api_key=API_KEY)
-            
-            self.is_loaded = True
-            
-        except Exception as e:
-            logger.error(f"QueryProcessor initialization failed: {e}")
-            raise
-
-    def find_similar_questions(self, user_query, vector_store_id, subject):
-        """
-        Find the top 3 most semantically similar questions for a given user query using file search.
-        """
-        try:
-            if subject and subject.strip():
-                enhanced_query = f"Subject: {subject.strip()} Query: {user_query.strip()}"
-                logger.info(f"Enhanced query with subject: {enhanced_query}")
-            else:
-                enhanced_query = user_query.strip()
-                logger.info(f"Using original query (no subject): {enhanced_query}")
-            if not user_query:
-                raise ValueError("User query cannot be empty")
-            
-            if not vector_store_id:
-                logger.warning("Vector store ID is empty or None")
-            
-            # System prompt for question similarity matching
-            system_prompt = """Question Similarity Matching System
-You will receive a file containing a list of questions. Your task is to find the top 3 most semantically similar questions from that file for each user query.
-
-Instructions
-Wait for file upload containing the question list
-Process user queries that start with "question:" (can contain single question or list of questions)
-Find top 3 matches using semantic similarity (meaning and intent, not just keywords)
-Return results directly without reasoning
-
-Output Format
-For each query, respond with this JSON structure:
-{   "results": [     "Most similar question from file",     "Second most similar question from file",      "Third most similar question from file"   ] } 
-
-If user submits multiple questions in one message, process each separately:
-[   {     "question": "First user question",     "results": ["match1", "match2", "match3"]   },   {     "question": "Second user question",      "results": ["match1", "match2", "match3"]   } ] 
-
-Key Rules
-Process messages beginning with "question:"
-Handle single questions or lists of questions
-Compare meaning and intent, not just keywords
-Always return top 3 matches (or fewer if file has less than 3 questions)
-No reasoning required, just results
-Continue until told to stop
-Ready to receive your question file and begin processing queries."""
-
-            user_message = f"question: {user_query}"
-            
-            # Add a strict instruction block to force pure JSON output since current openai version lacks response_format param
-            system_prompt += "\nIMPORTANT OUTPUT RULE: Return ONLY a single JSON object exactly like {\"results\": [\"q1\", \"q2\", \"q3\"]} with 1-3 strings. No prose, no extra keys, no markdown."
-            
-            # Using the responses.create API with file_search (cannot use response_format param in this client version)
-            response = self.openai_client.responses.create(
-                model="gpt-4.1-mini",
-                input=[
-                    {
-                        "role": "system",
-                        "content": [
-                            {"type": "input_text", "text": system_prompt}
-                        ]
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "input_text", "text": user_message}
-                        ]
-                    }
-                ],
-                tools=[
-                    {
-                        "type": "file_search",
-                        "vector_store_ids": [vector_store_id]
-                    }
-                ],
-                temperature=0.2,  # lower temperature for deterministic retrieval style
-                max_output_tokens=300,
-                top_p=1,
-                store=True
-            )
-
-
-            if not hasattr(response, 'output') or not response.output:
-                raise ValueError("No response output from OpenAI API")
-            
-            # Extract content from the responses.create format
-            response_content = None
-            if isinstance(response.output, list) and len(response.output) > 0:
-                # Try to find text content in the response
-                for output_item in response.output:
-                    if hasattr(output_item, 'content') and output_item.content:
-                        if isinstance(output_item.content, list) and len(output_item.content) > 0:
-                            response_content = output_item.content[0].text
-                            break
-                        elif hasattr(output_item.content, 'text'):
-                            response_content = output_item.content.text
-                            break
-            
-            if not response_content:
-                raise ValueError("Could not extract content from response")
-            
-            # Attempt direct JSON parse; if it fails, try to extract JSON substring
-            raw_text = response_content.strip()
-            parsed = None
-            try:
-                parsed = json.loads(raw_text)
-            except json.JSONDecodeError:
-                # Fallback: extract first {...} block
-                import re as _re
-                match = _re.search(r'\{.*\}', raw_text, flags=_re.DOTALL)
-                if match:
-                    try:
-                        parsed = json.loads(match.group(0))
-                    except Exception as inner:
-                        logger.error(f"Secondary JSON parse failed: {inner}\nRaw: {raw_text}")
-                        raise ValueError("Failed to parse JSON response after fallback")
-                else:
-                    logger.error(f"No JSON object found in model output: {raw_text}")
-                    raise ValueError("Model output did not contain JSON object")
-            
-            if not isinstance(parsed, dict) or "results" not in parsed or not isinstance(parsed["results"], list):
-                raise ValueError("Parsed JSON missing required 'results' array")
-
-            parsed["results"] = [r for r in parsed["results"] if isinstance(r, str) and r.strip()][:3]
-            if not parsed["results"]:
-                raise ValueError("No valid similar questions returned")
-            
-            # Early exit mechanism: Check if we have exactly 3 results
-            if len(parsed["results"]) < 1:
-                logger.warning(f"EARLY EXIT: Only found {len(parsed['results'])} similar questions, expected 3")
-                logger.info("=== INSUFFICIENT SIMILAR QUESTIONS FOUND ===")
-                logger.info(f"User Query: {user_query}")
-                logger.info(f"Similar Questions Found: {len(parsed['results'])}")
-                for i, question in enumerate(parsed['results'], 1):
-                    logger.info(f"  {i}. {question}")
-                logger.info("=" * 40)
-                raise ValueError(f"Insufficient similar questions found: {len(parsed['results'])}/3")
-            
-            logger.info("=== SIMILAR QUESTIONS FOUND ===")
-            logger.info(f"User Query: {user_query}")
-            logger.info(f"Similar Questions Found: {len(parsed['results'])}")
-            for i, question in enumerate(parsed['results'], 1):
-                logger.info(f"  {i}. {question}")
-            logger.info("=" * 40)
-
-            return parsed    
-
-        except Exception as e:
-            logger.error(f"find_similar_questions failed: {e}")
-            return None
-
-    def search_questions_in_parquet(self, parquet_file_path, similar_questions, language='english'):
-        """
-        Search for similar questions in Parquet file and extract Q&A pairs with language-specific answers
-        Now searches by question_id if available
-        """
-        try:
-            if not parquet_file_path:
-                raise ValueError("Parquet file path cannot be empty")
-            
-            if not similar_questions:
-                logger.warning("Similar questions list is empty")
-                return []
-            
-            # Check if file exists
-            if not os.path.exists(parquet_file_path):
-                logger.error(f"Parquet file does not exist: {parquet_file_path}")
-                raise FileNotFoundError(f"Parquet file not found: {parquet_file_path}")
-            
-            try:
-                table = pq.read_table(parquet_file_path)
-                df = table.to_pandas()
-                
-            except Exception as file_error:
-                logger.error(f"Failed to read Parquet file: {file_error}")
-                raise
-            
-            context = []
-            
-            # Column mapping for new parquet structure
-            question_col = 'question'
-            english_answer_col = 'answer_english'
-            hindi_answer_col = 'answer_hindi'
-            id_col = 'id'  # Add ID column - adjust if your column name is different
-            
-            # Validate columns exist
-            missing_cols = []
-            if question_col not in df.columns:
-                missing_cols.append(question_col)
-            if english_answer_col not in df.columns:
-                missing_cols.append(english_answer_col)
-            if hindi_answer_col not in df.columns:
-                missing_cols.append(hindi_answer_col)
-            
-            if missing_cols:
-                logger.error(f"Missing required columns: {missing_cols}")
-                raise ValueError(f"Missing required columns in Parquet file: {missing_cols}")
-            
-            # Check if ID column exists
-            has_id_column = id_col in df.columns
-            if has_id_column:
-                logger.info(f"ID column '{id_col}' found - will search by ID")
-            else:
-                logger.info(f"ID column '{id_col}' not found - will search by question text")
-            
-            # Determine which answer column to use based on language
-            if language and language.lower() == 'hindi':
-                answer_col = hindi_answer_col
-                logger.info(f"Using Hindi answers for language: {language}")
-            else:
-                answer_col = english_answer_col
-                logger.info(f"Using English answers for language: {language}")
-            
-            logger.info("=== SEARCHING IN PARQUET FILE ===")
-            for i, similar_q in enumerate(similar_questions):
-                if not similar_q or not similar_q.strip():
-                    logger.info(f"Question {i+1}: EMPTY/INVALID - {similar_q}")
-                    logger.warning(f"Question {i+1} is empty or whitespace only")
-                    continue
-                
-                # Extract question ID from the similar question
-                extracted = extract_question_id(similar_q)
-                question_id = extracted["question_id"]
-                clean_text = extracted["clean_text"]
-                
-                logger.info(f"Question {i+1}: Raw - '{similar_q}'")
-                logger.info(f"Question {i+1}: Extracted ID - '{question_id}', Clean Text - '{clean_text}'")
-                
-                try:
-                    matches = pd.DataFrame()  # Empty dataframe
-                    
-                    # PRIORITY 1: Search by ID if available
-                    if question_id and has_id_column:
-                        # Try numeric match first
-                        try:
-                            matches = df[df[id_col] == int(question_id)]
-                        except (ValueError, TypeError):
-                            # Try string match if numeric fails
-                            matches = df[df[id_col].astype(str) == question_id]
-                        
-                        if not matches.empty:
-                            logger.info(f"  ✓ FOUND BY ID: {question_id}")
-                    
-                    # PRIORITY 2: Fallback to text search if ID search fails
-                    if matches.empty:
-                        search_term = clean_text if clean_text else similar_q.strip()
-                        logger.info(f"  → Falling back to text search: '{search_term}'")
-                        
-                        # Exact match first
-                        matches = df[df[question_col].str.lower() == search_term.lower()]
-                        
-                        # Partial match as fallback
-                        if matches.empty:
-                            matches = df[df[question_col].str.contains(search_term, case=False, na=False)]
-                    
-                    if not matches.empty:
-                        row = matches.iloc[0]
-                        qa_pair = {
-                            "question": row[question_col],
-                            "answer": row[answer_col]
-                        }
-                        context.append(qa_pair)
-                        logger.info(f"  ✓ FOUND: Match found in parquet file")
-                        logger.info(f"  ✓ Matched Question: {row[question_col][:100]}...")
-                        logger.info(f"  ✓ Using {language} answer from column: {answer_col}")
-                        
-                    else:
-                        logger.info(f"  ✗ NOT FOUND: No match in parquet file")
-                        
-                except Exception as search_error:
-                    logger.info(f"  ✗ ERROR: {search_error}")
-                    logger.error(f"Error searching for question {i+1}: {search_error}")
-                    continue
-
-            logger.info(f"Total Q&A pairs found: {len(context)}")
-            logger.info("=" * 40)
-            
-            return context
-            
-        except Exception as e:
-            logger.error(f"search_questions_in_parquet failed: {e}")
-            return []
-
-    def generate_answer_with_reasoning(self, query: str, context: List[Dict], subject: str, language: str) -> str:
-        """Generate answer with reasoning using GPT only"""
-        try:
-            if not query:
-                raise ValueError("Query cannot be empty")
-            
-            # Format context
-            context_text = "\n".join(
-                f"Q: {item['question']}\nA: {item['answer']}\n---" 
-                for item in context
-            )
-            
-            # Language instruction setup and examples
-            if language.lower() == 'hindi':
-                language_instruction = (
-                    "CRITICAL LANGUAGE REQUIREMENT: You MUST respond ONLY in pure HINDI using Devanagari script (देवनागरी लिपि).\n"
-                    "- Use only Hindi words: जैसे, के लिए, में, है, आदि\n"
-                    "- Example correct format: 'उन्नति बैच कक्षा 12वीं के छात्रों के लिए विशेष रूप से डिज़ाइन किया गया है।'\n"
-                    "- NEVER write: 'Unnati Batch specially design kiya gaya hai'\n"
-                )
-                fallback_answer = "मुझे कुछ नहीं पता। आप तुरंत मदद के लिए 8305351495 पर WhatsApp कर सकते हैं।"
-                
-                # Hindi examples
-                examples_section = """
+# "local" serves similarity search from an in-process FAISS index; anything else uses the OpenAI vector store
+FAQ_SEARCH_BACKEND = os.getenv("FAQ_SEARCH_BACKEND", "vector_store").lower()
+# Resolve ID lookups with a lazy polars scan (predicate pushdown) instead of reading the whole file
+USE_POLARS = os.getenv("USE_POLARS", "false").lower() in ("1", "true", "yes") and pl is not None
+
+
+# ============================================
+# FAQ ANSWER PROMPTS
+# ============================================
+_LANGUAGE_INSTRUCTION_HINDI: Final[str] = (
+    "CRITICAL LANGUAGE REQUIREMENT: You MUST respond ONLY in pure HINDI using Devanagari script (देवनागरी लिपि).\n"
+    "- Use only Hindi words: जैसे, के लिए, में, है, आदि\n"
+    "- Example correct format: 'उन्नति बैच कक्षा 12वीं के छात्रों के लिए विशेष रूप से डिज़ाइन किया गया है।'\n"
+    "- NEVER write: 'Unnati Batch specially design kiya gaya hai'\n"
+)
+
+_EXAMPLES_HINDI: Final[str] = """
 उदाहरण
 
 उदाहरण A — पाठ्यक्रम अवलोकन (बहु-बिंदु उत्तर)
@@ -503,17 +184,15 @@ Ready to receive your question file and begin processing queries."""
 
 अपेक्षित उत्तर:
 बेटा, यह जानकारी मुझे अभी नहीं पता। ऐप सपोर्ट से संपर्क करो या मदद अनुभाग देखो।
-"""           
-            else:  # Default to English/Hinglish
-                language_instruction = (
-                    "LANGUAGE: Reply in HINGLISH (Roman script with Hindi words). "
-                    "Keep the language easy; avoid difficult English words. "
-                    "Example style: 'main ekta hu mera kaam padhana h'."
-                )
-                fallback_answer = "I don't know something. Aap urgent help ke liye 8305351495 par WhatsApp kar sakte hain."
-                
-                # English/Hinglish examples
-                examples_section = """
+"""
+
+_LANGUAGE_INSTRUCTION_EN: Final[str] = (
+    "LANGUAGE: Reply in HINGLISH (Roman script with Hindi words). "
+    "Keep the language easy; avoid difficult English words. "
+    "Example style: 'main ekta hu mera kaam padhana h'."
+)
+
+_EXAMPLES_EN: Final[str] = """
 Examples
 
 Example A — Syllabus Overview (Multi-point answer)
@@ -716,8 +395,10 @@ Main hoon na tumhare saath beta! Jab bhi dar lage, doubt ho, ya bas baat karni h
 Ab smile karo aur ek chhota sa topic padh lo aaj. Himmat rakho, tumse ho jayega! 💪
 """
 
-            # System prompt with language-specific examples
-            system_prompt = f"""You are Ritesh Sir, an experienced Class 12th teacher helping students understand their **board exam syllabus, paper patterns, and practicals**. Answer queries **using ONLY the provided Context** in a warm, supportive manner.
+
+def _build_answer_system_prompt(language_instruction: str, examples_section: str) -> str:
+    """Assemble the FAQ answer system prompt for one language (called once per language at import)."""
+    return f"""You are Ritesh Sir, an experienced Class 12th teacher helping students understand their **board exam syllabus, paper patterns, and practicals**. Answer queries **using ONLY the provided Context** in a warm, supportive manner.
 
 {language_instruction}
 
@@ -934,66 +615,564 @@ Important Notes:
 
 {examples_section}
 """
-            
-            user_prompt = f"""Student Question: {subject} :- {query}
 
-Context Available:
-{context_text if context_text else "No relevant context found"}
 
-Choose the appropriate template based on whether the context answers their question."""
-
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.1,
-                top_p=0.9
-            )
-            
-            if not response.choices:
-                raise ValueError("No response choices from OpenAI")
-            
-            raw_result = response.choices[0].message.content
-            result = raw_result.strip() if raw_result else ""
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"generate_answer_with_reasoning failed: {e}")
-            
-            # Return fallback based on language
-            if language and language.lower() == "hindi":
-                fallback_response = "**Reasoning:** Technical issue occurred\n\n**Answer:** मुझे कुछ नहीं पता। आप तुरंत मदद के लिए 8305351495 पर WhatsApp कर सकते हैं।"
-            else:
-                fallback_response = "**Reasoning:** Technical issue occurred\n\n**Answer:** I don't know something. Aap urgent help ke liye 8305351495 par WhatsApp kar sakte hain."
-            
-            return fallback_response
+_SYSTEM_PROMPT_HINDI: Final[str] = _build_answer_system_prompt(_LANGUAGE_INSTRUCTION_HINDI, _EXAMPLES_HINDI)
+_SYSTEM_PROMPT_EN: Final[str] = _build_answer_system_prompt(_LANGUAGE_INSTRUCTION_EN, _EXAMPLES_EN)
 
-    def search_similar(self, user_query, subject=None, return_k=3, language='english'):
-        """
-        Method to be compatible with the guidance_main function.
-        Returns context in the expected format.
-        """
-        try:
-            # Configuration from environment variables
-            vector_store_id = VECTOR_STORE_ID
-            
-            # Check if parquet file path is configured
-            if not PARQUET_FILE_PATH:
-                logger.error("PARQUET_FILE_PATH not configured in environment variables")
-                return []
-            
-            if not os.path.exists(PARQUET_FILE_PATH):
-                logger.error(f"Parquet file does not exist: {PARQUET_FILE_PATH}")
-                return []
-            
-            # Find similar questions - this will raise an exception if < 3 results found
-            similar_response = self.find_similar_questions(user_query, vector_store_id, subject)
-            
-            if not similar_response or 'results' not in similar_response:
+_FALLBACK_RESPONSE_HINDI: Final[str] = "**Reasoning:** Technical issue occurred\n\n**Answer:** मुझे कुछ नहीं पता। आप तुरंत मदद के लिए 8305351495 पर WhatsApp कर सकते हैं।"
+_FALLBACK_RESPONSE_EN: Final[str] = "**Reasoning:** Technical issue occurred\n\n**Answer:** I don't know something. Aap urgent help ke liye 8305351495 par WhatsApp kar sakte hain."
+_FALLBACKS: Final[Dict[str, str]] = {"hindi": _FALLBACK_RESPONSE_HINDI}
+
+
+# Output token budgets for the answer call; the reasoning block counts against them too.
+# Devanagari costs several tokens per word, so Hindi answers always get the full budget.
+_MAX_TOKENS_SHORT: Final[int] = 400
+_MAX_TOKENS_EXPLAIN: Final[int] = 600
+_MAX_TOKENS_DEFAULT: Final[int] = 1000
+_SHORT_QUERY_WORDS: Final[int] = 6
+_EXPLAIN_KEYWORDS: Final[tuple] = ("samjhao", "explain", "kaise", "how", "kya hai", "what is")
+_DEVANAGARI_RE: Final[re.Pattern] = re.compile(r"[\u0900-\u097F]")
+
+
+def _budget(query: str, language: str = "english") -> int:
+    """Pick max_tokens for the answer call from the answer language and the shape of the query"""
+    if (language or "").lower() == "hindi" or _DEVANAGARI_RE.search(query):
+        return _MAX_TOKENS_DEFAULT
+    if len(query.split()) <= _SHORT_QUERY_WORDS:
+        return _MAX_TOKENS_SHORT
+    lowered = query.lower()
+    if any(keyword in lowered for keyword in _EXPLAIN_KEYWORDS):
+        return _MAX_TOKENS_EXPLAIN
+    return _MAX_TOKENS_DEFAULT
+
+
+def _fallback_response(language: str) -> str:
+    """Pick the precomputed fallback answer for the given language (English by default)"""
+    return _FALLBACKS.get((language or "").lower(), _FALLBACK_RESPONSE_EN)
+
+
+def extract_question_id(question: str) -> dict:
+    """
+    Extract question ID from the question text.
+    
+    Example:
+        "question 2858:- FAQ 19: Teacher kaun padhayega kaise dekhein?"
+        → {"question_id": "2858", "clean_text": "FAQ 19: Teacher kaun padhayega kaise dekhein?"}
+    """
+    pattern = r'^question\s*(\d+)\s*[:\-]+\s*'
+    
+    match = re.match(pattern, question.strip(), flags=re.IGNORECASE)
+    
+    if match:
+        return {
+            "question_id": match.group(1),
+            "clean_text": question[match.end():].strip()
+        }
+    
+    return {
+        "question_id": None,
+        "clean_text": question.strip()
+    }
+class QueryProcessor:
+    def __init__(self, api_key=None):
+        """Initialize the query processor with OpenAI client"""
+        try:
+            if not api_key:
+                if not API_KEY:
+                    raise ValueError("OpenAI API key is required but not found")
+                api_key = API_KEY
+
+            self.openai_client = OpenAI(api_key=api_key)
+            self.async_openai_client = AsyncOpenAI(api_key=api_key)
+            self.embedding_batcher = EmbeddingBatcher(self.async_openai_client)
+
+            # (path, mtime, DataFrame) of the last Parquet read; re-read only when the file changes
+            self._parquet_cache = None
+            self._parquet_lock = threading.Lock()
+            if PARQUET_FILE_PATH and os.path.exists(PARQUET_FILE_PATH) and not USE_POLARS:
+                # Loaded eagerly so the first request does not pay the disk + parse cost
+                self._load_parquet(PARQUET_FILE_PATH)
+
+            # Optional local ANN index; stays None (vector store path) if disabled or the build fails
+            self.local_index = None
+            if FAQ_SEARCH_BACKEND == "local" and PARQUET_FILE_PATH and os.path.exists(PARQUET_FILE_PATH):
+                local_index = LocalQuestionIndex(PARQUET_FILE_PATH)
+                if local_index.build(self.openai_client):
+                    self.local_index = local_index
+            
+            self.is_loaded = True
+            
+        except Exception as e:
+            logger.error(f"QueryProcessor initialization failed: {e}")
+            raise
+
+    def _build_similarity_request(self, user_query, vector_store_id, subject):
+        """
+        Build the responses.create kwargs for the file-search similarity lookup.
+        """
+        if subject and subject.strip():
+            enhanced_query = f"Subject: {subject.strip()} Query: {user_query.strip()}"
+            logger.info(f"Enhanced query with subject: {enhanced_query}")
+        else:
+            enhanced_query = user_query.strip()
+            logger.info(f"Using original query (no subject): {enhanced_query}")
+        if not user_query:
+            raise ValueError("User query cannot be empty")
+        
+        if not vector_store_id:
+            logger.warning("Vector store ID is empty or None")
+        
+        # System prompt for question similarity matching
+        system_prompt = """Question Similarity Matching System
+You will receive a file containing a list of questions. Your task is to find the top 3 most semantically similar questions from that file for each user query.
+
+Instructions
+Wait for file upload containing the question list
+Process user queries that start with "question:" (can contain single question or list of questions)
+Find top 3 matches using semantic similarity (meaning and intent, not just keywords)
+Return results directly without reasoning
+
+Output Format
+For each query, respond with this JSON structure:
+{   "results": [     "Most similar question from file",     "Second most similar question from file",      "Third most similar question from file"   ] } 
+
+If user submits multiple questions in one message, process each separately:
+[   {     "question": "First user question",     "results": ["match1", "match2", "match3"]   },   {     "question": "Second user question",      "results": ["match1", "match2", "match3"]   } ] 
+
+Key Rules
+Process messages beginning with "question:"
+Handle single questions or lists of questions
+Compare meaning and intent, not just keywords
+Always return top 3 matches (or fewer if file has less than 3 questions)
+No reasoning required, just results
+Continue until told to stop
+Ready to receive your question file and begin processing queries."""
+
+        user_message = f"question: {user_query}"
+        
+        # Add a strict instruction block to force pure JSON output since current openai version lacks response_format param
+        system_prompt += "\nIMPORTANT OUTPUT RULE: Return ONLY a single JSON object exactly like {\"results\": [\"q1\", \"q2\", \"q3\"]} with 1-3 strings. No prose, no extra keys, no markdown."
+        
+        # Using the responses.create API with file_search (cannot use response_format param in this client version)
+        return dict(
+            model="gpt-4.1-mini",
+            input=[
+                {
+                    "role": "system",
+                    "content": [
+                        {"type": "input_text", "text": system_prompt}
+                    ]
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "input_text", "text": user_message}
+                    ]
+                }
+            ],
+            tools=[
+                {
+                    "type": "file_search",
+                    "vector_store_ids": [vector_store_id]
+                }
+            ],
+            temperature=0.2,  # lower temperature for deterministic retrieval style
+            max_output_tokens=300,
+            top_p=1,
+            store=True
+        )
+
+    def _parse_similarity_response(self, response, user_query):
+        """
+        Extract and validate the {"results": [...]} payload from a file-search response.
+        """
+        if not hasattr(response, 'output') or not response.output:
+            raise ValueError("No response output from OpenAI API")
+        
+        # Extract content from the responses.create format
+        response_content = None
+        if isinstance(response.output, list) and len(response.output) > 0:
+            # Try to find text content in the response
+            for output_item in response.output:
+                if hasattr(output_item, 'content') and output_item.content:
+                    if isinstance(output_item.content, list) and len(output_item.content) > 0:
+                        response_content = output_item.content[0].text
+                        break
+                    elif hasattr(output_item.content, 'text'):
+                        response_content = output_item.content.text
+                        break
+        
+        if not response_content:
+            raise ValueError("Could not extract content from response")
+        
+        # Attempt direct JSON parse; if it fails, try to extract JSON substring
+        raw_text = response_content.strip()
+        parsed = None
+        try:
+            parsed = json.loads(raw_text)
+        except json.JSONDecodeError:
+            # Fallback: extract first {...} block
+            import re as _re
+            match = _re.search(r'\{.*\}', raw_text, flags=_re.DOTALL)
+            if match:
+                try:
+                    parsed = json.loads(match.group(0))
+                except Exception as inner:
+                    logger.error(f"Secondary JSON parse failed: {inner}\nRaw: {raw_text}")
+                    raise ValueError("Failed to parse JSON response after fallback")
+            else:
+                logger.error(f"No JSON object found in model output: {raw_text}")
+                raise ValueError("Model output did not contain JSON object")
+        
+        if not isinstance(parsed, dict) or "results" not in parsed or not isinstance(parsed["results"], list):
+            raise ValueError("Parsed JSON missing required 'results' array")
+
+        parsed["results"] = [r for r in parsed["results"] if isinstance(r, str) and r.strip()][:3]
+        if not parsed["results"]:
+            raise ValueError("No valid similar questions returned")
+        
+        # Early exit mechanism: Check if we have exactly 3 results
+        if len(parsed["results"]) < 1:
+            logger.warning(f"EARLY EXIT: Only found {len(parsed['results'])} similar questions, expected 3")
+            logger.info("=== INSUFFICIENT SIMILAR QUESTIONS FOUND ===")
+            logger.info(f"User Query: {user_query}")
+            logger.info(f"Similar Questions Found: {len(parsed['results'])}")
+            for i, question in enumerate(parsed['results'], 1):
+                logger.info(f"  {i}. {question}")
+            logger.info("=" * 40)
+            raise ValueError(f"Insufficient similar questions found: {len(parsed['results'])}/3")
+        
+        logger.info("=== SIMILAR QUESTIONS FOUND ===")
+        logger.info(f"User Query: {user_query}")
+        logger.info(f"Similar Questions Found: {len(parsed['results'])}")
+        for i, question in enumerate(parsed['results'], 1):
+            logger.info(f"  {i}. {question}")
+        logger.info("=" * 40)
+
+        return parsed
+
+    def _local_results(self, user_query, query_vector, top_k=3):
+        """
+        Top-k lookup against the local FAISS index, shaped like the vector store result.
+        """
+        results = self.local_index.search(query_vector, top_k)
+        if not results:
+            raise ValueError("No valid similar questions returned")
+
+        logger.info(f"Local index found {len(results)} similar questions for: {user_query}")
+        return {"results": results}
+
+    def find_similar_questions(self, user_query, vector_store_id, subject):
+        """
+        Find the top 3 most semantically similar questions for a given user query using file search.
+        """
+        if self.local_index is not None:
+            try:
+                return self._local_results(user_query, embed_query(self.openai_client, user_query.strip()))
+            except Exception as e:
+                logger.warning(f"Local index search failed, falling back to vector store: {e}")
+
+        try:
+            request = self._build_similarity_request(user_query, vector_store_id, subject)
+            response = self.openai_client.responses.create(**request)
+            return self._parse_similarity_response(response, user_query)
+
+        except Exception as e:
+            logger.error(f"find_similar_questions failed: {e}")
+            return None
+
+    async def afind_similar_questions(self, user_query, vector_store_id, subject):
+        """
+        Async variant of find_similar_questions; awaits the file search without blocking the event loop.
+        """
+        if self.local_index is not None:
+            try:
+                query_vector = await self.embedding_batcher.embed(user_query.strip())
+                return self._local_results(user_query, query_vector)
+            except Exception as e:
+                logger.warning(f"Local index search failed, falling back to vector store: {e}")
+
+        try:
+            request = self._build_similarity_request(user_query, vector_store_id, subject)
+            response = await self.async_openai_client.responses.create(**request)
+            return self._parse_similarity_response(response, user_query)
+
+        except Exception as e:
+            logger.error(f"afind_similar_questions failed: {e}")
+            return None
+
+    @staticmethod
+    def _read_parquet_df(parquet_file_path):
+        """Read the FAQ Parquet file into a DataFrame"""
+        if not os.path.exists(parquet_file_path):
+            logger.error(f"Parquet file does not exist: {parquet_file_path}")
+            raise FileNotFoundError(f"Parquet file not found: {parquet_file_path}")
+
+        try:
+            table = pq.read_table(parquet_file_path)
+            return table.to_pandas()
+
+        except Exception as file_error:
+            logger.error(f"Failed to read Parquet file: {file_error}")
+            raise
+
+    def _load_parquet(self, parquet_file_path):
+        """Return the FAQ DataFrame, reading the file only on first use or after its mtime changes"""
+        with self._parquet_lock:
+            mtime = os.stat(parquet_file_path).st_mtime if os.path.exists(parquet_file_path) else None
+            cached = self._parquet_cache
+            if cached is not None and mtime is not None and cached[0] == parquet_file_path and cached[1] == mtime:
+                return cached[2]
+
+            df = self._read_parquet_df(parquet_file_path)
+            self._parquet_cache = (parquet_file_path, mtime, df)
+            logger.info(f"Loaded {len(df)} FAQ rows from {parquet_file_path}")
+            return df
+
+    @staticmethod
+    def _scan_parquet_ids(parquet_file_path, question_ids):
+        """
+        Read only the rows whose id is in question_ids with a lazy polars scan.
+        Returns None if any ID is missing, so the caller can fall back to a full read for text search.
+        """
+        subset = (
+            pl.scan_parquet(parquet_file_path)
+            .filter(pl.col('id').cast(pl.Utf8).is_in(question_ids))
+            .collect()
+            .to_pandas()
+        )
+        if subset['id'].astype(str).nunique() < len(set(question_ids)):
+            return None
+        return subset
+
+    def search_questions_in_parquet(self, parquet_file_path, similar_questions, language='english', df=None):
+        """
+        Search for similar questions in Parquet file and extract Q&A pairs with language-specific answers
+        Now searches by question_id if available
+        Pass an already loaded df to skip reading the file.
+        """
+        try:
+            if not parquet_file_path:
+                raise ValueError("Parquet file path cannot be empty")
+            
+            if not similar_questions:
+                logger.warning("Similar questions list is empty")
+                return []
+
+            # Drop repeated results (same chunk cited more than once) while preserving rank order
+            similar_questions = list(dict.fromkeys(similar_questions))
+
+            extracted_questions = [
+                extract_question_id(similar_q) if similar_q and similar_q.strip() else None
+                for similar_q in similar_questions
+            ]
+            question_ids = [e["question_id"] for e in extracted_questions if e and e["question_id"]]
+
+            # Every result carries an ID: only those rows are needed, no text-search fallback
+            if df is None and USE_POLARS and question_ids and len(question_ids) == sum(e is not None for e in extracted_questions):
+                try:
+                    df = self._scan_parquet_ids(parquet_file_path, question_ids)
+                except Exception as scan_error:
+                    logger.warning(f"Polars scan failed, falling back to full read: {scan_error}")
+            
+            if df is None:
+                df = self._load_parquet(parquet_file_path)
+            
+            context = []
+            
+            # Column mapping for new parquet structure
+            question_col = 'question'
+            english_answer_col = 'answer_english'
+            hindi_answer_col = 'answer_hindi'
+            id_col = 'id'  # Add ID column - adjust if your column name is different
+            
+            # Validate columns exist
+            missing_cols = []
+            if question_col not in df.columns:
+                missing_cols.append(question_col)
+            if english_answer_col not in df.columns:
+                missing_cols.append(english_answer_col)
+            if hindi_answer_col not in df.columns:
+                missing_cols.append(hindi_answer_col)
+            
+            if missing_cols:
+                logger.error(f"Missing required columns: {missing_cols}")
+                raise ValueError(f"Missing required columns in Parquet file: {missing_cols}")
+            
+            # Check if ID column exists
+            has_id_column = id_col in df.columns
+            if has_id_column:
+                logger.info(f"ID column '{id_col}' found - will search by ID")
+            else:
+                logger.info(f"ID column '{id_col}' not found - will search by question text")
+            
+            # Determine which answer column to use based on language
+            if language and language.lower() == 'hindi':
+                answer_col = hindi_answer_col
+                logger.info(f"Using Hindi answers for language: {language}")
+            else:
+                answer_col = english_answer_col
+                logger.info(f"Using English answers for language: {language}")
+            
+            # PRIORITY 1 lookups: one hashed reindex over all IDs instead of a mask scan per question
+            id_rows = pd.DataFrame()
+            if has_id_column and question_ids:
+                indexed = df.set_index(df[id_col].astype(str))
+                indexed = indexed[~indexed.index.duplicated()]
+                id_rows = indexed.reindex(question_ids).dropna(subset=[question_col])
+
+            logger.info("=== SEARCHING IN PARQUET FILE ===")
+            for i, (similar_q, extracted) in enumerate(zip(similar_questions, extracted_questions)):
+                if extracted is None:
+                    logger.info(f"Question {i+1}: EMPTY/INVALID - {similar_q}")
+                    logger.warning(f"Question {i+1} is empty or whitespace only")
+                    continue
+                
+                question_id = extracted["question_id"]
+                clean_text = extracted["clean_text"]
+                
+                logger.info(f"Question {i+1}: Raw - '{similar_q}'")
+                logger.info(f"Question {i+1}: Extracted ID - '{question_id}', Clean Text - '{clean_text}'")
+                
+                try:
+                    matches = pd.DataFrame()  # Empty dataframe
+                    
+                    # PRIORITY 1: Search by ID if available
+                    if question_id and question_id in id_rows.index:
+                        matches = id_rows.loc[[question_id]]
+                        
+                        if not matches.empty:
+                            logger.info(f"  ✓ FOUND BY ID: {question_id}")
+                    
+                    # PRIORITY 2: Fallback to text search if ID search fails
+                    if matches.empty:
+                        search_term = clean_text if clean_text else similar_q.strip()
+                        logger.info(f"  → Falling back to text search: '{search_term}'")
+                        
+                        # Exact match first
+                        matches = df[df[question_col].str.lower() == search_term.lower()]
+                        
+                        # Partial match as fallback
+                        if matches.empty:
+                            matches = df[df[question_col].str.contains(search_term, case=False, na=False)]
+                    
+                    if not matches.empty:
+                        row = matches.iloc[0]
+                        qa_pair = {
+                            "question": row[question_col],
+                            "answer": row[answer_col]
+                        }
+                        context.append(qa_pair)
+                        logger.info(f"  ✓ FOUND: Match found in parquet file")
+                        logger.info(f"  ✓ Matched Question: {row[question_col][:100]}...")
+                        logger.info(f"  ✓ Using {language} answer from column: {answer_col}")
+                        
+                    else:
+                        logger.info(f"  ✗ NOT FOUND: No match in parquet file")
+                        
+                except Exception as search_error:
+                    logger.info(f"  ✗ ERROR: {search_error}")
+                    logger.error(f"Error searching for question {i+1}: {search_error}")
+                    continue
+
+            logger.info(f"Total Q&A pairs found: {len(context)}")
+            logger.info("=" * 40)
+            
+            return context
+            
+        except Exception as e:
+            logger.error(f"search_questions_in_parquet failed: {e}")
+            return []
+
+    def _build_answer_request(self, query: str, context: List[Dict], subject: str, language: str) -> Dict:
+        """Build the chat.completions kwargs for the FAQ answer call."""
+        if not query:
+            raise ValueError("Query cannot be empty")
+
+        # Format context
+        context_text = "\n".join(
+            f"Q: {item['question']}\nA: {item['answer']}\n---"
+            for item in context
+        )
+
+        # Language-specific system prompt (built once at import)
+        system_prompt = _SYSTEM_PROMPT_HINDI if language.lower() == 'hindi' else _SYSTEM_PROMPT_EN
+
+        # Static instruction first, per-request context and question last (keeps the cacheable prefix stable)
+        user_prompt = f"""Choose the appropriate template based on whether the context answers their question.
+
+Context Available:
+{context_text if context_text else "No relevant context found"}
+
+Student Question: {subject} :- {query}"""
+
+        return dict(
+            model="gpt-4.1-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=_budget(query, language),
+            temperature=0.1,
+            top_p=0.9
+        )
+
+    @staticmethod
+    def _extract_answer(response) -> str:
+        """Return the stripped answer text from a chat completion response."""
+        if not response.choices:
+            raise ValueError("No response choices from OpenAI")
+
+        raw_result = response.choices[0].message.content
+        return raw_result.strip() if raw_result else ""
+
+    def generate_answer_with_reasoning(self, query: str, context: List[Dict], subject: str, language: str) -> str:
+        """Generate answer with reasoning using GPT only"""
+        try:
+            request = self._build_answer_request(query, context, subject, language)
+            response = self.openai_client.chat.completions.create(**request)
+            return self._extract_answer(response)
+
+        except Exception as e:
+            logger.error(f"generate_answer_with_reasoning failed: {e}")
+
+            return _fallback_response(language)
+
+    async def agenerate_answer_with_reasoning(self, query: str, context: List[Dict], subject: str, language: str) -> str:
+        """Async variant of generate_answer_with_reasoning"""
+        try:
+            request = self._build_answer_request(query, context, subject, language)
+            response = await self.async_openai_client.chat.completions.create(**request)
+            return self._extract_answer(response)
+
+        except Exception as e:
+            logger.error(f"agenerate_answer_with_reasoning failed: {e}")
+
+            return _fallback_response(language)
+
+    def search_similar(self, user_query, subject=None, return_k=3, language='english'):
+        """
+        Method to be compatible with the guidance_main function.
+        Returns context in the expected format.
+        """
+        try:
+            # Configuration from environment variables
+            vector_store_id = VECTOR_STORE_ID
+            
+            # Check if parquet file path is configured
+            if not PARQUET_FILE_PATH:
+                logger.error("PARQUET_FILE_PATH not configured in environment variables")
+                return []
+            
+            if not os.path.exists(PARQUET_FILE_PATH):
+                logger.error(f"Parquet file does not exist: {PARQUET_FILE_PATH}")
+                return []
+            
+            # Find similar questions - this will raise an exception if < 3 results found
+            similar_response = self.find_similar_questions(user_query, vector_store_id, subject)
+            
+            if not similar_response or 'results' not in similar_response:
                 logger.warning("find_similar_questions returned None or invalid response")
                 return []
             
@@ -1029,11 +1208,49 @@ Choose the appropriate template based on whether the context answers their quest
         except Exception as e:
             logger.error(f"generate_answer failed: {e}")
             
-            # Return appropriate fallback
-            if language and language.lower() == "hindi":
-                return "**Reasoning:** Technical issue occurred\n\n**Answer:** मुझे कुछ नहीं पता। आप तुरंत मदद के लिए 8305351495 पर WhatsApp कर सकते हैं।"
+            return _fallback_response(language)
+
+
+    async def asearch_similar(self, user_query, subject=None, return_k=3, language='english'):
+        """
+        Async variant of search_similar.
+        Overlaps the vector search with the Parquet freshness check (a re-read only if the file
+        changed) and offloads the lookup to a worker thread.
+        """
+        try:
+            if not PARQUET_FILE_PATH or not os.path.exists(PARQUET_FILE_PATH):
+                logger.error(f"Parquet file not configured or missing: {PARQUET_FILE_PATH}")
+                return []
+
+            if USE_POLARS:
+                # Rows are fetched by ID after the search, so there is nothing to preload
+                similar_response, df = await self.afind_similar_questions(user_query, VECTOR_STORE_ID, subject), None
             else:
-                return "**Reasoning:** Technical issue occurred\n\n**Answer:** I don't know something. Aap urgent help ke liye 8305351495 par WhatsApp kar sakte hain."
+                # Check the cached DataFrame in a worker thread while the similarity search is in flight
+                similar_response, df = await asyncio.gather(
+                    self.afind_similar_questions(user_query, VECTOR_STORE_ID, subject),
+                    asyncio.to_thread(self._load_parquet, PARQUET_FILE_PATH),
+                )
+
+            if not similar_response or 'results' not in similar_response:
+                logger.warning("afind_similar_questions returned None or invalid response")
+                return []
+
+            similar_questions = similar_response['results'][:return_k]
+
+            return await asyncio.to_thread(
+                self.search_questions_in_parquet, PARQUET_FILE_PATH, similar_questions, language, df
+            )
+
+        except Exception as e:
+            logger.error(f"asearch_similar failed: {e}")
+            return []
+
+    async def agenerate_answer(self, user_query, context, subject, language):
+        """
+        Async variant of generate_answer.
+        """
+        return await self.agenerate_answer_with_reasoning(user_query, context, subject, language)
 
 
 # Create a global instance that can be used by guidance_main
@@ -1070,13 +1287,23 @@ def ask_arivihan_question(user_query, subject=None, language="english"):
     except Exception as e:
         logger.error(f"ask_arivihan_question failed: {e}")
         
-        # Return error message in appropriate language
-        if language and language.lower() == "hindi":
-            error_response = "**Reasoning:** Technical issue occurred\n\n**Answer:** मुझे कुछ नहीं पता। आप तुरंत मदद के लिए 8305351495 पर WhatsApp कर सकते हैं।"
-        else:
-            error_response = "**Reasoning:** Technical issue occurred\n\n**Answer:** I don't know something. Aap urgent help ke liye 8305351495 par WhatsApp kar sakte hain."
-        
-        return error_response
+        return _fallback_response(language)
+
+async def aask_arivihan_question(user_query, subject=None, language="english"):
+    """Async variant of ask_arivihan_question"""
+    try:
+        if not user_query:
+            raise ValueError("User query cannot be empty")
+
+        query_processor = get_query_processor()
+
+        context = await query_processor.asearch_similar(user_query, subject, return_k=3, language=language)
+        return await query_processor.agenerate_answer(user_query, context, subject, language.lower())
+
+    except Exception as e:
+        logger.error(f"aask_arivihan_question failed: {e}")
+
+        return _fallback_response(language)
 
 def normalize(text):
     """Normalize text for comparison"""
@@ -1092,6 +1319,69 @@ def normalize(text):
         logger.error(f"Error in normalize function: {e}")
         return ""
 
+def _build_faq_result(model_result, initial_classification, response_type):
+    """Turn the raw **Reasoning:** / **Answer:** model output into the FAQ handler result dict"""
+    logger.info(f"[Classifier Exam Faq] exam faq query response {model_result}")
+
+    full_response = model_result
+    answer = full_response.split("Answer:")[-1].strip()
+    answer_normalize = normalize(answer)
+
+    # Check for "I don't know" responses in multiple languages
+    dont_know_responses = [
+        "i dont know something",
+        "मुझे कुछ नहीं पता",  # Hindi equivalent
+        "mujhe kuch nahi pata"  # Romanized Hindi
+    ]
+
+    if any(dont_know in answer_normalize for dont_know in dont_know_responses):
+        result = {
+            "initialClassification": initial_classification,
+            "classifiedAs": "faq",
+            "response": answer,
+            "openWhatsapp": True,
+            "responseType": response_type,
+            "actions": "",
+            "microLecture": "",
+            "testSeries": "",
+        }
+        return result
+    else:
+        final_answer = {"text": answer, "queryType": "screen_related", "request_type": "exam_related_faq"}
+
+        result = {
+            "initialClassification": initial_classification,
+            "classifiedAs": "faq",
+            "response": final_answer,
+            "openWhatsapp": False,
+            "responseType": response_type,
+            "actions": "",
+            "microLecture": "",
+            "testSeries": "",
+        }
+
+        return result
+
+
+_FAQ_ERROR_RESULT: Final[Dict[str, object]] = {
+    "classifiedAs": "faq",
+    "response": "Technical error occurred. Please try again.",
+    "openWhatsapp": True,
+    "actions": "",
+    "microLecture": "",
+    "testSeries": "",
+}
+
+
+def _build_faq_error_result(json_data, initial_classification):
+    """Error result returned when FAQ processing fails"""
+    return {
+        "initialClassification": initial_classification,
+        **_FAQ_ERROR_RESULT,
+        "responseType": json_data.get("requestType", "") if isinstance(json_data, dict) else "",
+    }
+
+
 def exam_faq_query_main(json_data, initial_classification):
     """Exam FAQ query handler - now fully GPT-based with no model loading"""
     logger.info("[Classifier Exam Faq] exam faq query starts")
@@ -1115,61 +1405,33 @@ def exam_faq_query_main(json_data, initial_classification):
         
         # Pass language to the question function - fully GPT-based now
         model_result = ask_arivihan_question(query, subject, language)
-        
-        logger.info(f"[Classifier Exam Faq] exam faq query response {model_result}")
-
-        full_response = model_result
-        answer = full_response.split("Answer:")[-1].strip()
-        answer_normalize = normalize(answer)
-
-        # Check for "I don't know" responses in multiple languages
-        dont_know_responses = [
-            "i dont know something",
-            "मुझे कुछ नहीं पता",  # Hindi equivalent
-            "mujhe kuch nahi pata"  # Romanized Hindi
-        ]
-        
-        if any(dont_know in answer_normalize for dont_know in dont_know_responses):
-            result = {
-                "initialClassification": initial_classification,
-                "classifiedAs": "faq",
-                "response": answer,
-                "openWhatsapp": True,
-                "responseType": response_type,
-                "actions": "",
-                "microLecture": "",
-                "testSeries": "",
-            }
-            return result
-        else:
-            final_answer = {"text": answer, "queryType": "screen_related", "request_type": "exam_related_faq"}
-            
-            result = {
-                "initialClassification": initial_classification,
-                "classifiedAs": "faq",
-                "response": final_answer,
-                "openWhatsapp": False,
-                "responseType": response_type,
-                "actions": "",
-                "microLecture": "",
-                "testSeries": "",
-            }
 
-            return result
+        return _build_faq_result(model_result, initial_classification, response_type)
         
     except Exception as e:
         logger.error(f"exam_faq_query_main failed: {e}")
-        
-        # Return error result
-        error_result = {
-            "initialClassification": initial_classification,
-            "classifiedAs": "faq",
-            "response": "Technical error occurred. Please try again.",
-            "openWhatsapp": True,
-            "responseType": json_data.get("requestType", "") if isinstance(json_data, dict) else "",
-            "actions": "",
-            "microLecture": "",
-            "testSeries": "",
-        }
-        
-        return error_result
+        return _build_faq_error_result(json_data, initial_classification)
+
+
+async def aexam_faq_query_main(json_data, initial_classification):
+    """Async variant of exam_faq_query_main; keeps the event loop free during OpenAI calls"""
+    logger.info("[Classifier Exam Faq] async exam faq query starts")
+
+    try:
+        response_type = json_data.get("requestType", "")
+        language = json_data.get("language", "english")
+        query = json_data.get("userQuery", "")
+        subject = json_data.get("subject")
+
+        if not query:
+            raise ValueError("User query is required")
+
+        logger.info(f"[Classifier Exam Faq] Using subject: {subject}, language: {language}")
+
+        model_result = await aask_arivihan_question(query, subject, language)
+
+        return _build_faq_result(model_result, initial_classification, response_type)
+
+    except Exception as e:
+        logger.error(f"aexam_faq_query_main failed: {e}")
+        return _build_faq_error_result(json_data, initial_classification)
@@ -53,7 +53,7 @@ def format_pyq_questions(response_data: Dict[str, Any], language: str = "hindi")
             return "कोई प्रश्न नहीं मिला। कृपया दूसरा topic try करें।" if language == "Hindi" else "No questions found. Please try another topic."
 
         # Prepare questions list for GPT
-        questions_text = ""
+        question_parts = []
         for idx, q in enumerate(questions, 1):
             question_text = clean_html(q.get("question", ""))
             marks = q.get("marks", "")
@@ -61,7 +61,8 @@ def format_pyq_questions(response_data: Dict[str, Any], language: str = "hindi")
             q_type = q.get("question_type", "")
             q_lang = q.get("language", "")
 
-            questions_text += f"\n{idx}. [{marks} marks, {year}, {q_type}, {q_lang}]\n{question_text}\n"
+            question_parts.append(f"\n{idx}. [{marks} marks, {year}, {q_type}, {q_lang}]\n{question_text}\n")
+        questions_text = "".join(question_parts)
 
         # Create prompt for GPT
         if language.lower() == "hindi":
@@ -182,22 +183,21 @@ def format_questions_simple(response_data: Dict[str, Any], language: str = "hind
             header = f"📚 *{verified_subject} - {matched_chapter} ke Previous Year Questions*\n\n"
             header += f"✅ Total {questions_count} questions mile\n\n"
 
-        formatted = header
+        parts = [header]
 
         for idx, q in enumerate(questions, 1):
             question_text = clean_html(q.get("question", ""))
             marks = q.get("marks", "")
             year = q.get("year", "")
 
-            formatted += f"📝 *Question {idx}* [{marks} marks, {year}]\n"
-            formatted += f"{question_text}\n\n"
+            parts.append(f"📝 *Question {idx}* [{marks} marks, {year}]\n{question_text}\n\n")
 
         if language.lower() == "hindi":
-            formatted += "⭐ *इन प्रश्नों को solve करके अपनी तैयारी मजबूत बनाएं!*"
+            parts.append("⭐ *इन प्रश्नों को solve करके अपनी तैयारी मजबूत बनाएं!*")
         else:
-            formatted += "⭐ *In questions ko solve karke apni preparation strong banao!*"
+            parts.append("⭐ *In questions ko solve karke apni preparation strong banao!*")
 
-        return formatted
+        return "".join(parts)
 
     except Exception as e:
         logger.error(f"[ExamFormatter] Error in simple formatting: {e}")
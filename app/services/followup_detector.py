@@ -3,85 +3,62 @@ Follow-up detection service using GPT.
 Analyzes conversation history to detect if current message is a follow-up
 and enriches it with context if needed.
 """
-from typing import Optional
-from openai import OpenAI
+import asyncio
+import json
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from openai import AsyncOpenAI
 from app.core.config import settings
 from app.core.logging_config import logger
 from app.models.history_schemas import (
-    ConversationHistory,
+    ConversationMessage,
     FollowUpDetectionResult
 )
 from app.services.history_service import history_service
+from app.services.question_index import EmbeddingBatcher
 
+try:
+    import orjson
 
-class FollowUpDetector:
-    """Service for detecting follow-up questions and enriching them with context."""
-
-    def __init__(self):
-        """Initialize OpenAI client."""
-        self.client = OpenAI(api_key=settings.openai_api_key)
-        self.model = "gpt-4o-mini"
-
-    def _build_context_string(self, history: ConversationHistory) -> str:
-        """
-        Build context string from conversation history.
-
-        Args:
-            history: ConversationHistory object
+    def _json_loads(text: str) -> Any:
+        return orjson.loads(text)
 
-        Returns:
-            Formatted context string for GPT prompt
-        """
-        if not history.messages:
-            return "No previous conversation."
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:  # orjson is optional - stdlib json gives identical results, just slower
+    def _json_loads(text: str) -> Any:
+        return json.loads(text)
 
-        context_parts = []
-        for idx, msg in enumerate(reversed(history.messages), 1):  # Oldest to newest
-            context_parts.append(
-                f"Message {idx}:\n"
-                f"User: {msg.request_message}\n"
-                f"Bot: {msg.response_message}\n"
-            )
-
-        return "\n".join(context_parts)
-
-    async def detect_and_enrich(
-        self,
-        current_message: str,
-        phone_number: str
-    ) -> FollowUpDetectionResult:
-        """
-        Detect if current message is a follow-up and enrich it with context.
-
-        Args:
-            current_message: Current user message
-            phone_number: User's phone number
-
-        Returns:
-            FollowUpDetectionResult with detection and enrichment
-        """
-        try:
-            # Get conversation history (last 5 messages in 24h window)
-            history = await history_service.get_conversation_history(phone_number)
+    def _json_dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
 
-            # If no history, not a follow-up
-            if not history.messages:
-                logger.info(f"[FollowUpDetector] No history for {phone_number}, not a follow-up")
-                return FollowUpDetectionResult(
-                    is_follow_up=False,
-                    enriched_message=None,
-                    original_message=current_message,
-                    context_used=[]
-                )
 
-            # Build context from history
-            context_string = self._build_context_string(history)
-            context_messages = [msg.request_message for msg in reversed(history.messages)]
+# Per-turn character budget for the detection context (bot replies can be multi-KB HTML)
+_TRUNC_USER = 300
+_TRUNC_BOT = 500
+_TAG_RE = re.compile(r'<[^>]+>')
 
-            logger.info(f"[FollowUpDetector] Analyzing with {len(history.messages)} previous messages")
+# Local pre-filter: messages that are long, unrelated to the last turn and free of
+# anaphora / stop phrases are treated as new topics without a GPT call.
+# (?<!\w)/(?!\w) instead of \b: \b never fires after a Devanagari vowel sign.
+_ANAPHORA = re.compile(
+    r"(?<!\w)(it|that|this|the one|more|yes|explain|how|why|example|उसके|उसका|उसकी|वो|ये|इसके|इसका|इसकी)(?!\w)",
+    re.IGNORECASE
+)
+_STOP_HINTS = re.compile(
+    r"(?<!\w)(stop|bye|goodbye|chup|mat bolo|band karo|baat nahi|baat mat karo|disturb|tang mat|pareshan|rehne do|jane do"
+    r"|bas|hatao|shut up|go away|enough|leave me alone|not interested|don'?t (?:reply|respond|message|text)"
+    r"|चुप|बंद करो|बात नहीं|बात मत करो|परेशान|रहने दो|जाने दो|बस)(?!\w)",
+    re.IGNORECASE
+)
+_SHORT_MESSAGE_WORDS = 4
+_MIN_FOLLOW_UP_SIMILARITY = 0.35
+_LAST_TURN_CACHE_SIZE = 10000
 
-            # Create GPT prompt for follow-up detection
-            system_prompt = """You are an intelligent assistant that analyzes conversations to detect follow-up questions and stop conversation requests.
+# System prompt for follow-up / stop-conversation detection
+_SYSTEM_PROMPT = """You are an intelligent assistant that analyzes conversations to detect follow-up questions and stop conversation requests.
 
 Your task:
 1. FIRST check if the user wants to STOP the conversation
@@ -149,55 +126,289 @@ Previous: "User: What is chemistry Bot: Chemistry is..."
 Current: "don't disturb me"
 Response: {"is_follow_up": false, "enriched_message": null, "should_stop": true}"""
 
-            user_prompt = f"""Previous Conversation (last 24 hours):
+# Appended to the system prompt when several detections are sent in one call
+_BATCH_INSTRUCTION = """
+
+BATCH MODE:
+You will receive several messages from the same user, each with its previous conversation.
+Apply the rules above to every item separately - never mix context between items.
+Respond with a JSON object: {"results": [{"idx": <item idx>, "is_follow_up": ..., "enriched_message": ..., "should_stop": ...}, ...]}
+Include exactly one entry per item."""
+
+
+class _DetectBatcher:
+    """
+    Micro-batcher for follow-up detection.
+
+    Requests from the same user arriving within a short window (up to max_batch
+    of them) are answered with a single GPT call; conversations of different
+    users never share a prompt. A lone request uses the regular
+    single-conversation prompt, and batch entries the model skipped or garbled
+    are re-run through it.
+    """
+
+    def __init__(self, detector: "FollowUpDetector", max_batch: int = 8, window_seconds: float = 0.03):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def submit(self, phone_number: str, current_message: str, context_string: str) -> Dict[str, Any]:
+        """Queue one detection and wait for its parsed JSON result."""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((phone_number, current_message, context_string, future))
+        return await future
+
+    async def close(self):
+        """Stop the worker and any in-flight GPT calls (call on shutdown)."""
+        tasks = list(self._in_flight)
+        if self._worker is not None:
+            tasks.append(self._worker)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+
+    async def _run(self):
+        """Drain the queue into batches and dispatch them without waiting for the previous call."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window_seconds
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # One GPT call per user, so no prompt carries another user's conversation
+            per_user: Dict[str, list] = {}
+            for item in batch:
+                per_user.setdefault(item[0], []).append(item)
+            for user_batch in per_user.values():
+                task = asyncio.create_task(self._dispatch(user_batch))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch):
+        """Run one GPT call for the batch and resolve each caller's future."""
+        items = [(current_message, context_string) for _, current_message, context_string, _ in batch]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        if len(items) > 1:
+            logger.info(f"[FollowUpDetector] Batching {len(items)} detections into one GPT call")
+            try:
+                results = await self.detector._detect_batch(items)
+            except Exception as e:
+                logger.warning(f"[FollowUpDetector] Batch detection failed, retrying items one by one: {e}")
+
+        # Lone requests, and entries the batch call skipped or garbled, use the single prompt
+        retry = [idx for idx, result in enumerate(results) if result is None]
+        retried = await asyncio.gather(
+            *(self.detector._detect_single(*items[idx]) for idx in retry),
+            return_exceptions=True
+        )
+        for idx, result in zip(retry, retried):
+            results[idx] = result
+
+        for (_, _, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class FollowUpDetector:
+    """Service for detecting follow-up questions and enriching them with context."""
+
+    def __init__(self):
+        """Initialize OpenAI client."""
+        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.model = "gpt-4o-mini"
+        self._batcher = _DetectBatcher(self)
+        self._embedding_batcher = EmbeddingBatcher(self.client)
+        # phone_number -> (last request text, normalized embedding)
+        self._last_turn_embeddings: "OrderedDict[str, Tuple[str, np.ndarray]]" = OrderedDict()
+
+    def _build_context_string(self, messages: List[ConversationMessage]) -> str:
+        """
+        Build context string from conversation history.
+        Each turn is trimmed (HTML stripped from bot replies) to keep prompt tokens small.
+
+        Args:
+            messages: History messages ordered oldest to newest
+
+        Returns:
+            Formatted context string for GPT prompt
+        """
+        if not messages:
+            return "No previous conversation."
+
+        return "\n".join([
+            f"Message {idx}:\n"
+            f"User: {msg.request_message[:_TRUNC_USER]}\n"
+            f"Bot: {_TAG_RE.sub('', msg.response_message)[:_TRUNC_BOT]}\n"
+            for idx, msg in enumerate(messages, 1)
+        ])
+
+    async def _detect_single(self, current_message: str, context_string: str) -> Dict[str, Any]:
+        """
+        Run follow-up detection for one conversation.
+
+        Returns:
+            Parsed JSON dict with is_follow_up, enriched_message, should_stop
+        """
+        user_prompt = f"""Previous Conversation (last 24 hours):
 {context_string}
 
 Current Message: "{current_message}"
 
 Is this a follow-up question? If yes, rewrite it with context. Respond in JSON format."""
 
-            # Call GPT for analysis
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=300,
-                response_format={"type": "json_object"}
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0.3,
+            max_tokens=300,
+            response_format={"type": "json_object"}
+        )
+
+        result_text = response.choices[0].message.content.strip()
+        return _json_loads(result_text)
+
+    async def _detect_batch(self, items: List[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Run follow-up detection for several messages of one user in one GPT call.
+
+        Args:
+            items: (current_message, context_string) pairs
+
+        Returns:
+            One parsed result dict per item, in input order (None if the model skipped or garbled an item)
+        """
+        payload = [
+            {"idx": idx, "context": context_string, "message": current_message}
+            for idx, (current_message, context_string) in enumerate(items)
+        ]
+        user_prompt = f"""Items (JSON):
+{_json_dumps(payload)}
+
+For each item: is the message a follow-up to its previous conversation? If yes, rewrite it with context. Respond in JSON format."""
+
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": _SYSTEM_PROMPT + _BATCH_INSTRUCTION},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0.3,
+            max_tokens=300 * len(items),
+            response_format={"type": "json_object"}
+        )
+
+        result_text = response.choices[0].message.content.strip()
+        by_idx = {
+            entry.get("idx"): entry
+            for entry in _json_loads(result_text).get("results", [])
+            if isinstance(entry, dict) and isinstance(entry.get("is_follow_up"), bool)
+        }
+        return [by_idx.get(idx) for idx in range(len(items))]
+
+    async def _turn_embedding(self, phone_number: str, message: str) -> np.ndarray:
+        """Embedding of the user's last turn, reused from the per-phone cache when the text matches."""
+        cached = self._last_turn_embeddings.get(phone_number)
+        if cached and cached[0] == message:
+            self._last_turn_embeddings.move_to_end(phone_number)
+            return cached[1]
+        return await self._embedding_batcher.embed(message)
+
+    def _remember_turn(self, phone_number: str, message: str, vector: np.ndarray):
+        """Cache this message's embedding; it becomes the 'last turn' on the user's next message."""
+        self._last_turn_embeddings[phone_number] = (message, vector)
+        self._last_turn_embeddings.move_to_end(phone_number)
+        if len(self._last_turn_embeddings) > _LAST_TURN_CACHE_SIZE:
+            self._last_turn_embeddings.popitem(last=False)
+
+    async def _may_be_follow_up(self, current_message: str, phone_number: str, last_message: str) -> bool:
+        """
+        Cheap local check run before the GPT call.
+
+        Returns:
+            False only when the message is clearly a new topic; True means GPT must decide
+        """
+        if (
+            len(current_message.split()) <= _SHORT_MESSAGE_WORDS
+            or _ANAPHORA.search(current_message)
+            or _STOP_HINTS.search(current_message)
+        ):
+            return True
+
+        try:
+            current_vector, last_vector = await asyncio.gather(
+                self._embedding_batcher.embed(current_message),
+                self._turn_embedding(phone_number, last_message)
             )
+            self._remember_turn(phone_number, current_message, current_vector)
+            similarity = float(np.dot(current_vector[0], last_vector[0]))
+            logger.info(f"[FollowUpDetector] Pre-filter similarity to last turn: {similarity:.3f}")
+            return similarity >= _MIN_FOLLOW_UP_SIMILARITY
+        except Exception as e:
+            logger.warning(f"[FollowUpDetector] Pre-filter failed, deferring to GPT: {e}")
+            return True
 
-            result_text = response.choices[0].message.content.strip()
+    async def detect_and_enrich(
+        self,
+        current_message: str,
+        phone_number: str
+    ) -> FollowUpDetectionResult:
+        """
+        Detect if current message is a follow-up and enrich it with context.
 
-            # Parse JSON response
-            import json
-            try:
-                result = json.loads(result_text)
-                is_follow_up = result.get("is_follow_up", False)
-                enriched_message = result.get("enriched_message")
-                should_stop = result.get("should_stop", False)
-
-                logger.info(
-                    f"[FollowUpDetector] Detection result - "
-                    f"is_follow_up: {is_follow_up}, "
-                    f"should_stop: {should_stop}, "
-                    f"original: '{current_message}', "
-                    f"enriched: '{enriched_message if enriched_message else 'N/A'}'"
-                )
+        Args:
+            current_message: Current user message
+            phone_number: User's phone number
 
+        Returns:
+            FollowUpDetectionResult with detection and enrichment
+        """
+        try:
+            # Get conversation history (last 5 messages in 24h window)
+            history = await history_service.get_conversation_history(phone_number)
+
+            # If no history, not a follow-up
+            if not history.messages:
+                logger.info(f"[FollowUpDetector] No history for {phone_number}, not a follow-up")
                 return FollowUpDetectionResult(
-                    is_follow_up=is_follow_up,
-                    enriched_message=enriched_message if is_follow_up else None,
+                    is_follow_up=False,
+                    enriched_message=None,
                     original_message=current_message,
-                    context_used=context_messages if is_follow_up else [],
-                    confidence=None,  # Can add confidence scoring later if needed
-                    should_stop_conversation=should_stop
+                    context_used=[]
                 )
 
-            except json.JSONDecodeError as e:
-                logger.error(f"[FollowUpDetector] Failed to parse GPT response: {e}")
-                # Fallback: not a follow-up
+            # Build context from history
+            # History is newest-first; reverse once and reuse for both views
+            ordered_messages = history.messages[::-1]
+            context_string = self._build_context_string(ordered_messages)
+            context_messages = [msg.request_message for msg in ordered_messages]
+
+            # Skip GPT entirely for messages that are clearly a new topic
+            if not await self._may_be_follow_up(current_message, phone_number, history.messages[0].request_message):
+                logger.info("[FollowUpDetector] Pre-filter: unrelated to last turn, not a follow-up")
                 return FollowUpDetectionResult(
                     is_follow_up=False,
                     enriched_message=None,
@@ -205,6 +416,31 @@ Is this a follow-up question? If yes, rewrite it with context. Respond in JSON f
                     context_used=[]
                 )
 
+            logger.info(f"[FollowUpDetector] Analyzing with {len(history.messages)} previous messages")
+
+            # Detection call is coalesced with this user's concurrent messages by the batcher
+            result = await self._batcher.submit(phone_number, current_message, context_string)
+            is_follow_up = result.get("is_follow_up", False)
+            enriched_message = result.get("enriched_message")
+            should_stop = result.get("should_stop", False)
+
+            logger.info(
+                f"[FollowUpDetector] Detection result - "
+                f"is_follow_up: {is_follow_up}, "
+                f"should_stop: {should_stop}, "
+                f"original: '{current_message}', "
+                f"enriched: '{enriched_message if enriched_message else 'N/A'}'"
+            )
+
+            return FollowUpDetectionResult(
+                is_follow_up=is_follow_up,
+                enriched_message=enriched_message if is_follow_up else None,
+                original_message=current_message,
+                context_used=context_messages if is_follow_up else [],
+                confidence=None,  # Can add confidence scoring later if needed
+                should_stop_conversation=should_stop
+            )
+
         except Exception as e:
             logger.error(f"[FollowUpDetector] Error in follow-up detection: {e}")
             # Fallback: return original message
@@ -216,5 +452,10 @@ Is this a follow-up question? If yes, rewrite it with context. Respond in JSON f
             )
 
 
+    async def close(self):
+        """Stop the detection batcher's background worker (call on shutdown)."""
+        await self._batcher.close()
+
+
 # Global follow-up detector instance
 followup_detector = FollowUpDetector()
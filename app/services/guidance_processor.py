@@ -4,14 +4,45 @@ Handles guidance queries without external API calls.
 Includes Sambhav Batch knowledge for contextual promotion.
 """
 
+import asyncio
+import functools
+import hashlib
 import os
 import json
+import logging
 import re
-from typing import Dict, Any, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+import numpy as np
 import pandas as pd
-from openai import OpenAI
+import httpx
+import pyarrow.parquet as pq
+from openai import AsyncOpenAI, OpenAI, OpenAIError
 from app.core.logging_config import logger
 from app.core.config import settings
+from app.services.question_index import EmbeddingBatcher, LocalQuestionIndex
+
+try:
+    import ahocorasick
+except ImportError:  # Optional dependency - partial matches use one regex-alternation scan instead
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:  # Optional speedup - fall back to stdlib JSON
+    orjson = None
+
+try:
+    import redis
+except ImportError:  # Optional dependency - caches stay in-process
+    redis = None
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency - cached answers are stored uncompressed
+    zstandard = None
 
 
 # ============================================
@@ -19,6 +50,78 @@ from app.core.config import settings
 # ============================================
 WHATSAPP_NUMBER = "8305351495"
 
+# Answers mentioning any of these open WhatsApp support (one case-insensitive pass, no lowercased copy)
+_WHATSAPP_RE = re.compile(
+    "|".join(re.escape(kw) for kw in ('contact', 'support', 'whatsapp', 'संपर्क', 'सहायता', WHATSAPP_NUMBER)),
+    re.IGNORECASE
+)
+
+# Models for the file_search retrieval call and the answer generation call
+_MODEL_SEARCH = os.getenv("GUIDANCE_SEARCH_MODEL", "gpt-4.1-mini")
+_MODEL_ANSWER = os.getenv("GUIDANCE_ANSWER_MODEL", "gpt-4.1-mini")
+
+# The retrieval call only returns {"results": [...]} with up to 3 short strings
+SEARCH_MAX_OUTPUT_TOKENS = int(os.getenv("GUIDANCE_SEARCH_MAX_OUTPUT_TOKENS", "200"))
+
+# Guidance answers are 50-80 words by prompt; cap output tokens near that instead of 500
+GUIDANCE_MAX_TOKENS = int(os.getenv("GUIDANCE_MAX_TOKENS", "300"))
+
+# Pooled HTTP connections shared by all OpenAI calls from this processor
+OPENAI_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# Similarity search backend: vector_store (OpenAI file_search), local (FAISS index over the Parquet questions)
+# or hybrid (local index first, vector store only when the best local match is below LOCAL_FASTPATH_THRESHOLD)
+GUIDANCE_SEARCH_BACKEND = os.getenv("GUIDANCE_SEARCH_BACKEND", "vector_store").lower()
+LOCAL_FASTPATH_THRESHOLD = float(os.getenv("GUIDANCE_LOCAL_FASTPATH_THRESHOLD", "0.92"))
+
+# Only these Parquet columns are used for lookups; anything else is not decoded
+PARQUET_COLUMNS = ("id", "question", "answer_english", "answer_hindi", "answer")
+
+# Precompiled patterns for question-ID extraction, text normalization, the JSON fallback parse and cache keys
+_QID_RE = re.compile(r'^question\s*(\d+)\s*[:\-]+\s*', re.IGNORECASE)
+_NORMALIZE_RE = re.compile(r"[^\w\s]")
+_JSON_BLOCK_RE = re.compile(r'\{.*\}', re.DOTALL)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Both raise a ValueError subclass on malformed input
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Parquet rows keyed by str(id) and by lowercased question text, rebuilt when the file's mtime changes
+_QA_INDEX: Dict[str, Dict[str, Any]] = {}
+_QUESTION_LOWER_INDEX: Dict[str, Dict[str, Any]] = {}
+_QA_INDEX_LOCK = threading.Lock()
+
+# Fallback texts, built once at import instead of on every error path
+FALLBACK_GENERATION_TEXT = f"Beta, abhi kuch technical issue aa raha hai. Aap {WHATSAPP_NUMBER} par WhatsApp kar sakte hain! 🙏"
+FALLBACK_QUESTION_TEXT = f"Beta, abhi kuch issue aa raha hai. Aap {WHATSAPP_NUMBER} par WhatsApp kar sakte hain! 🙏"
+FALLBACK_MAIN_TEXT = f"Beta, kuch error aa gaya. Aap {WHATSAPP_NUMBER} par WhatsApp kar sakte hain! 🙏"
+
+# Fallback response payloads; callers get a copy since responses are mutated downstream
+FALLBACK_QUESTION_RESPONSE = {"text": FALLBACK_QUESTION_TEXT, "queryType": "guidance_related", "openWhatsapp": True}
+FALLBACK_MAIN_RESPONSE = {"text": FALLBACK_MAIN_TEXT, "queryType": "guidance_related", "openWhatsapp": True}
+
+# Answer cache for repeated guidance queries
+ANSWER_CACHE_MAX_SIZE = int(os.getenv("GUIDANCE_ANSWER_CACHE_SIZE", "2048"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("GUIDANCE_ANSWER_CACHE_TTL", "86400"))
+
+# Local-index similarity at which the stored answer is returned as-is, skipping the LLM
+GUIDANCE_SHORTCUT_THRESHOLD = float(os.getenv("GUIDANCE_SHORTCUT_THRESHOLD", "0.97"))
+
+# Cached answers at least this large (UTF-8 bytes) are zstd-compressed when zstandard is installed
+CACHE_COMPRESS_MIN_BYTES = 256
+
+# Cache of find_similar_questions results keyed by (normalized query, subject, top_k)
+SIMILAR_CACHE_MAX_SIZE = int(os.getenv("GUIDANCE_SIMILAR_CACHE_SIZE", "2000"))
+SIMILAR_CACHE_TTL_SECONDS = int(os.getenv("GUIDANCE_SIMILAR_CACHE_TTL", "600"))
+
+# Shared Redis behind the similar-questions cache (unset: per-process cache only)
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.05"))
+
+# Semantic cache for near-duplicate guidance queries
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("GUIDANCE_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("GUIDANCE_SEMANTIC_CACHE_SIZE", "1024"))
+
 
 # ============================================
 # SAMBHAV BATCH KNOWLEDGE BASE
@@ -48,367 +151,21 @@ SAMBHAV_KNOWLEDGE = """
 """
 
 
-def extract_question_id(question: str) -> dict:
-    """
-    Extract question ID from the question text.
-    
-    Example:
-        "question 2858:- FAQ 19: Teacher kaun padhayega kaise dekhein?"
-        → {"question_id": "2858", "clean_text": "FAQ 19: Teacher kaun padhayega kaise dekhein?"}
-    """
-    pattern = r'^question\s*(\d+)\s*[:\-]+\s*'
-    match = re.match(pattern, question.strip(), flags=re.IGNORECASE)
-    
-    if match:
-        return {
-            "question_id": match.group(1),
-            "clean_text": question[match.end():].strip()
-        }
-    return {
-        "question_id": None,
-        "clean_text": question.strip()
-    }
-
-
-class QueryProcessor:
-    """Process guidance queries using vector store and Parquet file."""
-
-    def __init__(self):
-        """Initialize the query processor with OpenAI client."""
-        self.client = OpenAI(api_key=settings.openai_api_key)
-        self.parquet_file_path = os.getenv("PARQUET_FILE_PATH")
-        self.vector_store_id = os.getenv("VECTOR_STORE_ID", "vs_68b97d5ff1d48191adc2165ceaa4f969")
-
-        if not self.parquet_file_path:
-            logger.warning("[QueryProcessor] PARQUET_FILE_PATH not set in environment")
-
-    def find_similar_questions(self, query: str, subject: str = None, top_k: int = 3) -> dict:
-        """
-        Find similar questions using OpenAI vector store.
-        Returns dict with 'results' key containing list of question strings.
-        """
-        try:
-            # Enhance query with subject if provided
-            if subject and subject.strip():
-                enhanced_query = f"Subject: {subject.strip()} Query: {query.strip()}"
-                logger.info(f"[VectorSearch] Enhanced query with subject: {enhanced_query}")
-            else:
-                enhanced_query = query.strip()
-                logger.info(f"[VectorSearch] Using original query: {enhanced_query}")
-
-            system_prompt = """# Enhanced Question Similarity Matching System
-
-You are a precise semantic question matching assistant with these exact specifications:
-
-The Sambhav Batch is a special 50-day crash course designed for Class 12 MP Board students to help them complete their entire board exam preparation in a short time with full confidence. It includes one-shot lectures for all important topics, PDFs of last year's important questions and answers, dedicated numerical videos, and essential tips and tricks for solving the question paper effectively. You also receive daily tasks, chapter-wise tests, and expert guidance from Arivan so that you stay focused and avoid confusion while aiming for 85% or above. You can join this batch through the Arivan application by selecting the subscription plan, and then access all the crash-course content under the "40 Days Board Exam Preparation" section along with your daily tasks.
-
-## Core Function
-- **Input**: English user queries starting with "question:"
-- **Dataset**: Hinglish (Hindi-English mix) questions from uploaded file
-- **Output**: Top 3 semantically similar questions from dataset only
-
-## Strict Processing Rules
-
-### Input Validation
-- ONLY process messages beginning with "question:"
-- Ignore all other messages
-- Handle exactly one question per query
-
-### Matching Algorithm Priority
-1. **Primary**: Semantic meaning and intent similarity
-2. **Secondary**: Contextual relevance 
-3. **Tertiary**: Topic alignment
-4. **Avoid**: Simple keyword matching without context
-
-### Output Requirements
-- Return EXACTLY 3 matches (or fewer if dataset < 3 questions)
-- Use EXACT text from dataset - zero modifications
-- Preserve original Hinglish formatting, spelling, punctuation
-- NO translations, explanations, reasoning, or commentary
-- ONLY JSON response
-
-### Forbidden Actions
-- Do NOT generate new questions
-- Do NOT translate dataset questions
-- Do NOT modify dataset text in any way
-- Do NOT provide explanations
-- Do NOT add commentary
-
-## Exact Output Format
-
-{   
-  "results": [     
-    "Exact question 1 from dataset",     
-    "Exact question 2 from dataset",      
-    "Exact question 3 from dataset"   
-  ] 
-}
-
-
-## Process Flow
-1. Receive dataset file
-2. Wait for "question:" input
-3. Semantic matching against dataset
-4. Return top 3 exact matches in JSON
-5. Repeat until instructed to stop
-
-## Key Constraints
-- **Language Flow**: English query → Hinglish dataset matching
-- **Text Preservation**: Return dataset questions exactly as written
-- **Response Format**: JSON only, no additional text
-- **Processing Scope**: Single question per query
-- **Matching Focus**: Semantic similarity over keyword matching
-
-**FINAL INSTRUCTION: You are a FILE SEARCH ENGINE. You CANNOT CREATE. You ONLY FIND and COPY from uploaded file. If you generate ANY new question, you have FAILED your task.**
-
-IMPORTANT OUTPUT RULE: Return ONLY a single JSON object exactly like {"results": ["q1", "q2", "q3"]} with 1-3 strings. No prose, no extra keys, no markdown."""
-
-            user_message = f"question: {enhanced_query}"
-            
-            response = self.client.responses.create(
-                model="gpt-4.1-mini",
-                input=[
-                    {
-                        "role": "system",
-                        "content": [{"type": "input_text", "text": system_prompt}]
-                    },
-                    {
-                        "role": "user",
-                        "content": [{"type": "input_text", "text": user_message}]
-                    }
-                ],
-                tools=[{
-                    "type": "file_search",
-                    "vector_store_ids": [self.vector_store_id],
-                    "max_num_results": top_k
-                }],
-                temperature=0.1,
-                max_output_tokens=300,
-                top_p=1,
-                store=True
-            )
-
-            # Extract response content
-            response_content = None
-            if hasattr(response, 'output') and response.output:
-                for item in response.output:
-                    if hasattr(item, 'content') and item.content:
-                        if isinstance(item.content, list) and len(item.content) > 0:
-                            response_content = item.content[0].text
-                            break
-                        elif hasattr(item.content, 'text'):
-                            response_content = item.content.text
-                            break
-                    if response_content:
-                        break
-
-            if not response_content:
-                logger.error("[ERROR] No content in response")
-                return None
-
-            # Parse JSON response
-            raw_text = response_content.strip()
-            parsed = None
-            
-            try:
-                parsed = json.loads(raw_text)
-            except json.JSONDecodeError:
-                # Fallback: extract JSON block
-                match = re.search(r'\{.*\}', raw_text, flags=re.DOTALL)
-                if match:
-                    try:
-                        parsed = json.loads(match.group(0))
-                    except Exception as inner:
-                        logger.error(f"[ERROR] Secondary JSON parse failed: {inner}")
-                        logger.error(f"[ERROR] Raw text: {raw_text[:200]}")
-                        return None
-                else:
-                    logger.error(f"[ERROR] No JSON found in: {raw_text[:200]}")
-                    return None
-
-            if not isinstance(parsed, dict) or "results" not in parsed or not isinstance(parsed["results"], list):
-                logger.error("[ERROR] Invalid JSON structure - missing 'results' array")
-                return None
-
-            # Filter valid results
-            parsed["results"] = [r for r in parsed["results"] if isinstance(r, str) and r.strip()][:top_k]
-            
-            if not parsed["results"]:
-                logger.warning("[WARN] No valid similar questions returned")
-                return None
-
-            # Early exit check
-            if len(parsed["results"]) < 1:
-                logger.warning(f"[WARN] EARLY EXIT: Only found {len(parsed['results'])} similar questions")
-                return None
-
-            # Log found questions
-            logger.info("=== SIMILAR QUESTIONS FOUND ===")
-            logger.info(f"User Query: {query}")
-            logger.info(f"Similar Questions Found: {len(parsed['results'])}")
-            for i, question in enumerate(parsed['results'], 1):
-                logger.info(f"  {i}. {question}")
-
-            return parsed
-
-        except Exception as e:
-            logger.error(f"[ERROR] Vector search failed: {e}")
-            return None
-
-    def search_questions_in_parquet(self, similar_questions: List[str], language: str = 'hindi') -> List[Dict[str, str]]:
-        """
-        Search for similar questions in Parquet file and extract Q&A pairs.
-        Properly searches by question_id if available.
-        
-        Args:
-            similar_questions: List of question strings from vector search
-            language: 'hindi' or 'english' for answer selection
-        """
-        try:
-            if not self.parquet_file_path:
-                logger.warning("[WARN] Parquet file path not configured")
-                return []
-                
-            if not os.path.exists(self.parquet_file_path):
-                logger.warning(f"[WARN] Parquet file not found: {self.parquet_file_path}")
-                return []
-
-            if not similar_questions:
-                logger.warning("[WARN] Similar questions list is empty")
-                return []
-
-            df = pd.read_parquet(self.parquet_file_path)
-            context = []
-
-            # Column mapping
-            question_col = 'question'
-            english_answer_col = 'answer_english'
-            hindi_answer_col = 'answer_hindi'
-            id_col = 'id'
-
-            # Validate columns exist
-            missing_cols = []
-            if question_col not in df.columns:
-                missing_cols.append(question_col)
-            if english_answer_col not in df.columns:
-                missing_cols.append(english_answer_col)
-            if hindi_answer_col not in df.columns:
-                missing_cols.append(hindi_answer_col)
-
-            if missing_cols:
-                logger.error(f"[ERROR] Missing required columns: {missing_cols}")
-                # Fallback: try to use 'answer' column if specific ones missing
-                if 'answer' in df.columns:
-                    english_answer_col = 'answer'
-                    hindi_answer_col = 'answer'
-                else:
-                    return []
-
-            # Check if ID column exists
-            has_id_column = id_col in df.columns
-            if has_id_column:
-                logger.info(f"[Parquet] ID column '{id_col}' found - will search by ID")
-            else:
-                logger.info(f"[Parquet] ID column '{id_col}' not found - will search by question text")
-
-            # Determine which answer column to use based on language
-            if language and language.lower() == 'hindi':
-                answer_col = hindi_answer_col
-                logger.info(f"[Parquet] Using Hindi answers")
-            else:
-                answer_col = english_answer_col
-                logger.info(f"[Parquet] Using English answers")
-
-            logger.info("=== SEARCHING IN PARQUET FILE ===")
-            for i, similar_q in enumerate(similar_questions):
-                if not similar_q or not similar_q.strip():
-                    logger.info(f"Question {i+1}: EMPTY/INVALID - skipping")
-                    continue
-
-                # Extract question ID from the similar question
-                extracted = extract_question_id(similar_q)
-                question_id = extracted["question_id"]
-                clean_text = extracted["clean_text"]
-
-                logger.info(f"Question {i+1}: Raw - '{similar_q[:80]}...'")
-                logger.info(f"Question {i+1}: Extracted ID - '{question_id}', Clean Text - '{clean_text[:50]}...'")
-
-                try:
-                    matches = pd.DataFrame()  # Empty dataframe
-
-                    # PRIORITY 1: Search by ID if available
-                    if question_id and has_id_column:
-                        # Try numeric match first
-                        try:
-                            matches = df[df[id_col] == int(question_id)]
-                        except (ValueError, TypeError):
-                            # Try string match if numeric fails
-                            matches = df[df[id_col].astype(str) == question_id]
-
-                        if not matches.empty:
-                            logger.info(f"  ✓ FOUND BY ID: {question_id}")
-
-                    # PRIORITY 2: Fallback to text search if ID search fails
-                    if matches.empty:
-                        search_term = clean_text if clean_text else similar_q.strip()
-                        logger.info(f"  → Falling back to text search: '{search_term[:50]}...'")
-
-                        # Exact match first
-                        matches = df[df[question_col].str.lower() == search_term.lower()]
-
-                        # Partial match as fallback
-                        if matches.empty:
-                            matches = df[df[question_col].str.contains(search_term, case=False, na=False)]
-
-                    if not matches.empty:
-                        row = matches.iloc[0]
-                        qa_pair = {
-                            "question": row[question_col],
-                            "answer": row[answer_col]
-                        }
-                        context.append(qa_pair)
-                        logger.info(f"  ✓ FOUND: Match found in parquet file")
-                        logger.info(f"  ✓ Matched Question: {row[question_col][:80]}...")
-                    else:
-                        logger.info(f"  ✗ NOT FOUND: No match in parquet file")
-
-                except Exception as search_error:
-                    logger.error(f"  ✗ ERROR: {search_error}")
-                    continue
-
-            logger.info(f"Total Q&A pairs found: {len(context)}")
-
-            return context
-
-        except Exception as e:
-            logger.error(f"[ERROR] Parquet read failed: {e}")
-            import traceback
-            logger.error(f"[ERROR] Traceback: {traceback.format_exc()}")
-            return []
-
-    def generate_answer(self, query: str, context: List[Dict[str, str]] = None, subject: str = None, language: str = 'hindi') -> str:
-        """
-        Generate answer using GPT with context from similar Q&A pairs.
-
-        Args:
-            query: User's original query
-            context: List of similar question-answer pairs
-            subject: Subject of the query
-            language: Response language (hindi or english)
+# ============================================
+# GUIDANCE ANSWER PROMPT
+# ============================================
+# Built once at import and never interpolated per request, so OpenAI's automatic
+# prompt caching can reuse the system prompt + fixed user prefix across calls
+GUIDANCE_USER_PROMPT_PREFIX = """Remember:
+- 50-70 words (max 80)
+- Natural Hinglish
+- Subtle Sambhav mention if relevant
+- End with question/encouragement
+- NO HTML, plain text only
 
-        Returns:
-            Plain text formatted answer string
-        """
-        try:
-            # Format context
-            context_text = ""
-            if context:
-                context_text = "\n".join(
-                    f"Q: {item['question']}\nA: {item['answer']}\n---"
-                    for item in context
-                )
+Based on these similar questions and answers for context:"""
 
-            system_prompt = f"""You are Ritesh Sir - a warm, experienced Class 12th teacher for MP Board students.
+GUIDANCE_SYSTEM_PROMPT = f"""You are Ritesh Sir - a warm, experienced Class 12th teacher for MP Board students.
 
 ---
 
@@ -592,41 +349,828 @@ Kya specific tension hai? Share karo, me yaha hu aapki help karne ke liye! 🤗"
 Now respond to the student's query naturally and concisely!
 """
 
-            user_prompt = f"""Based on these similar questions and answers for context:
-{context_text if context_text else "No relevant context found"}
+# OpenAI only caches prompt prefixes of 1024+ tokens; warn if an edit shrinks the system prompt
+# below that, or makes it vary per request (all per-request text goes in the user message)
+PROMPT_CACHE_MIN_TOKENS = 1024
+_CHARS_PER_TOKEN = 4  # Rough estimate for English text with the GPT-4o tokenizer
 
-Student's Question: {subject + ': ' if subject else ''}{query}
 
-Remember:
-- 50-70 words (max 80)
-- Natural Hinglish
-- Subtle Sambhav mention if relevant
-- End with question/encouragement
-- NO HTML, plain text only"""
+def _estimate_tokens(text: str) -> int:
+    """Approximate token count, without pulling in a tokenizer at import time."""
+    return len(text) // _CHARS_PER_TOKEN
+
+
+if _estimate_tokens(GUIDANCE_SYSTEM_PROMPT) < PROMPT_CACHE_MIN_TOKENS:
+    logger.warning(
+        f"[GuidanceProcessor] System prompt is ~{_estimate_tokens(GUIDANCE_SYSTEM_PROMPT)} tokens, "
+        f"below the {PROMPT_CACHE_MIN_TOKENS}-token prompt-cache threshold"
+    )
+
+
+# ============================================
+# VECTOR SEARCH PROMPT
+# ============================================
+_VECTOR_SEARCH_SYSTEM_PROMPT = """# Enhanced Question Similarity Matching System
+
+You are a precise semantic question matching assistant with these exact specifications:
+
+The Sambhav Batch is a special 50-day crash course designed for Class 12 MP Board students to help them complete their entire board exam preparation in a short time with full confidence. It includes one-shot lectures for all important topics, PDFs of last year's important questions and answers, dedicated numerical videos, and essential tips and tricks for solving the question paper effectively. You also receive daily tasks, chapter-wise tests, and expert guidance from Arivan so that you stay focused and avoid confusion while aiming for 85% or above. You can join this batch through the Arivan application by selecting the subscription plan, and then access all the crash-course content under the "40 Days Board Exam Preparation" section along with your daily tasks.
+
+## Core Function
+- **Input**: English user queries starting with "question:"
+- **Dataset**: Hinglish (Hindi-English mix) questions from uploaded file
+- **Output**: Top 3 semantically similar questions from dataset only
+
+## Strict Processing Rules
+
+### Input Validation
+- ONLY process messages beginning with "question:"
+- Ignore all other messages
+- Handle exactly one question per query
+
+### Matching Algorithm Priority
+1. **Primary**: Semantic meaning and intent similarity
+2. **Secondary**: Contextual relevance 
+3. **Tertiary**: Topic alignment
+4. **Avoid**: Simple keyword matching without context
+
+### Output Requirements
+- Return EXACTLY 3 matches (or fewer if dataset < 3 questions)
+- Use EXACT text from dataset - zero modifications
+- Preserve original Hinglish formatting, spelling, punctuation
+- NO translations, explanations, reasoning, or commentary
+- ONLY JSON response
+
+### Forbidden Actions
+- Do NOT generate new questions
+- Do NOT translate dataset questions
+- Do NOT modify dataset text in any way
+- Do NOT provide explanations
+- Do NOT add commentary
+
+## Exact Output Format
+
+{   
+  "results": [     
+    "Exact question 1 from dataset",     
+    "Exact question 2 from dataset",      
+    "Exact question 3 from dataset"   
+  ] 
+}
+
+
+## Process Flow
+1. Receive dataset file
+2. Wait for "question:" input
+3. Semantic matching against dataset
+4. Return top 3 exact matches in JSON
+5. Repeat until instructed to stop
+
+## Key Constraints
+- **Language Flow**: English query → Hinglish dataset matching
+- **Text Preservation**: Return dataset questions exactly as written
+- **Response Format**: JSON only, no additional text
+- **Processing Scope**: Single question per query
+- **Matching Focus**: Semantic similarity over keyword matching
+
+**FINAL INSTRUCTION: You are a FILE SEARCH ENGINE. You CANNOT CREATE. You ONLY FIND and COPY from uploaded file. If you generate ANY new question, you have FAILED your task.**
+
+IMPORTANT OUTPUT RULE: Return ONLY a single JSON object exactly like {"results": ["q1", "q2", "q3"]} with 1-3 strings. No prose, no extra keys, no markdown."""
+
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+
+def _pack_answer(answer: str):
+    """Compress a cached answer with zstd when it is large enough to benefit."""
+    encoded = answer.encode("utf-8")
+    if _zstd_compressor is None or len(encoded) < CACHE_COMPRESS_MIN_BYTES:
+        return answer
+    return _zstd_compressor.compress(encoded)
+
+
+def _unpack_answer(packed) -> str:
+    """Inverse of _pack_answer."""
+    if isinstance(packed, bytes):
+        return _zstd_decompressor.decompress(packed).decode("utf-8")
+    return packed
+
+
+class QueryCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters."""
+
+    STATS_LOG_EVERY = 100
+
+    def __init__(self, max_size: int, ttl_seconds: float, name: str = "QueryCache"):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] >= self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+            if (self.hits + self.misses) % self.STATS_LOG_EVERY == 0:
+                logger.info(f"[{self.name}] {len(self._entries)} entries, {self.hits} hits, {self.misses} misses, hit rate {self.hit_rate:.1%}")
+        return None if entry is None else entry[1]
+
+    def put(self, key: Tuple[Any, ...], value: Any) -> None:
+        """Store a value, evicting the least recently used entries when full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Drop every entry (e.g. when the data the values were derived from changes)."""
+        with self._lock:
+            self._entries.clear()
+
+    async def aget(self, key: Tuple[Any, ...]) -> Optional[Any]:
+        """get() for coroutines; subclasses backed by a network store override it to stay off the event loop."""
+        return self.get(key)
+
+    async def aput(self, key: Tuple[Any, ...], value: Any) -> None:
+        """put() for coroutines; see aget."""
+        self.put(key, value)
+
+
+class RedisQueryCache(QueryCache):
+    """
+    QueryCache backed by Redis so every worker process shares entries.
+    The in-process LRU stays in front as a first level; Redis errors count as misses.
+    Values must be JSON-serializable.
+    """
+
+    def __init__(self, client, prefix: str, max_size: int, ttl_seconds: float, name: str = "RedisQueryCache"):
+        super().__init__(max_size, ttl_seconds, name=name)
+        self.client = client
+        self.prefix = prefix
+
+    def _redis_key(self, key: Tuple[Any, ...]) -> str:
+        return f"{self.prefix}:{hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()}"
 
-            response = self.client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
+    def _get_remote(self, key: Tuple[Any, ...]) -> Optional[Any]:
+        """Fetch the value from Redis (filling the local LRU); blocking."""
+        try:
+            raw = self.client.get(self._redis_key(key))
+        except redis.RedisError as e:
+            logger.warning(f"[{self.name}] Redis get failed: {e}")
+            return None
+        if raw is None:
+            return None
+        logger.info(f"[{self.name}] Redis hit")
+        value = _json_loads(raw)
+        super().put(key, value)
+        return value
+
+    def _put_remote(self, key: Tuple[Any, ...], value: Any) -> None:
+        """Write the value to Redis with the cache TTL; blocking."""
+        try:
+            self.client.set(self._redis_key(key), json.dumps(value, ensure_ascii=False), ex=int(self.ttl_seconds))
+        except redis.RedisError as e:
+            logger.warning(f"[{self.name}] Redis set failed: {e}")
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[Any]:
+        """Return the value from the local LRU, else from Redis (filling the local LRU)."""
+        value = super().get(key)
+        if value is not None:
+            return value
+        return self._get_remote(key)
+
+    def put(self, key: Tuple[Any, ...], value: Any) -> None:
+        """Store the value locally and in Redis with the same TTL."""
+        super().put(key, value)
+        self._put_remote(key, value)
+
+    async def aget(self, key: Tuple[Any, ...]) -> Optional[Any]:
+        """Like get, but a local miss goes to Redis in a worker thread so the event loop never blocks."""
+        value = super().get(key)
+        if value is not None:
+            return value
+        return await asyncio.to_thread(self._get_remote, key)
+
+    async def aput(self, key: Tuple[Any, ...], value: Any) -> None:
+        """Like put, with the Redis write in a worker thread."""
+        super().put(key, value)
+        await asyncio.to_thread(self._put_remote, key, value)
+
+    def invalidate(self) -> None:
+        """Drop every entry locally and under this cache's Redis prefix."""
+        super().invalidate()
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.prefix}:*", count=500))
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"[{self.name}] Redis invalidate failed: {e}")
+
+
+@functools.lru_cache(maxsize=1)
+def get_redis_client():
+    """Return the shared Redis client, or None when REDIS_URL is unset or redis is not installed."""
+    if not REDIS_URL:
+        return None
+    if redis is None:
+        logger.warning("[QueryCache] REDIS_URL is set but redis is not installed, using in-process caches")
+        return None
+    return redis.Redis.from_url(
+        REDIS_URL,
+        socket_timeout=REDIS_SOCKET_TIMEOUT_SECONDS,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT_SECONDS
+    )
+
+
+def make_query_cache(prefix: str, max_size: int, ttl_seconds: float, name: str) -> QueryCache:
+    """Redis-backed cache when Redis is configured, else a per-process QueryCache."""
+    client = get_redis_client()
+    if client is None:
+        return QueryCache(max_size, ttl_seconds, name=name)
+    return RedisQueryCache(client, prefix, max_size, ttl_seconds, name=name)
+
+
+class AnswerCache(QueryCache):
+    """QueryCache for generated guidance answers, stored zstd-packed."""
+
+    def __init__(self, max_size: int = ANSWER_CACHE_MAX_SIZE, ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS):
+        super().__init__(max_size, ttl_seconds, name="AnswerCache")
+
+    @staticmethod
+    def make_key(query: str, subject: Optional[str], language: str) -> Tuple[str, ...]:
+        """Build a cache key from the whitespace/case-normalized query, subject and language."""
+        normalized_query = _WHITESPACE_RE.sub(" ", (query or "").strip().lower())
+        return normalized_query, (subject or "").lower(), (language or "hindi").lower()
+
+    def get(self, key: Tuple[str, ...]) -> Optional[str]:
+        """Return the cached answer, or None if missing or expired."""
+        packed = super().get(key)
+        return None if packed is None else _unpack_answer(packed)
+
+    def put(self, key: Tuple[str, ...], answer: str) -> None:
+        """Store an answer, evicting the least recently used entry when full."""
+        super().put(key, _pack_answer(answer))
+
+
+answer_cache = AnswerCache()
+
+
+class SemanticAnswerCache:
+    """
+    Embedding-similarity cache for generated answers.
+    One bucket per (language, subject); each bucket keeps a matrix of L2-normalized
+    query embeddings and the parallel list of answers, so a lookup is a single gemv.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._buckets: Dict[Tuple[str, str], Tuple[Optional[np.ndarray], List[Any]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket_key(language: str, subject: Optional[str]) -> Tuple[str, str]:
+        return (language or "hindi").lower(), (subject or "").lower()
+
+    def get(self, query_vector: np.ndarray, language: str, subject: Optional[str]) -> Optional[str]:
+        """Return the cached answer of the most similar previous query if it clears the threshold."""
+        with self._lock:
+            embeddings, answers = self._buckets.get(self._bucket_key(language, subject), (None, []))
+            if embeddings is None:
+                return None
+            scores = embeddings @ query_vector[0]
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            logger.info(f"[SemanticCache] Hit with similarity {scores[best]:.3f}")
+            packed = answers[best]
+        return _unpack_answer(packed)
+
+    def add(self, query_vector: np.ndarray, language: str, subject: Optional[str], answer: str) -> None:
+        """Append a query embedding and its answer, dropping the oldest entries when the bucket is full."""
+        key = self._bucket_key(language, subject)
+        packed = _pack_answer(answer)
+        with self._lock:
+            embeddings, answers = self._buckets.get(key, (None, []))
+            embeddings = query_vector if embeddings is None else np.vstack([embeddings, query_vector])
+            answers = answers + [packed]
+            if len(answers) > self.max_entries:
+                embeddings = embeddings[-self.max_entries:]
+                answers = answers[-self.max_entries:]
+            self._buckets[key] = (embeddings, answers)
+
+
+semantic_answer_cache = SemanticAnswerCache()
+
+
+def find_first_containing(questions_lower: pd.Series, terms: List[str]) -> Dict[str, int]:
+    """
+    Map each lowercase term to the position of the first question containing it.
+    With pyahocorasick the terms become one automaton and the column is scanned once,
+    stopping as soon as every term has a match.
+    """
+    terms = set(terms)
+    first: Dict[str, int] = {}
+
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for term in terms:
+            automaton.add_word(term, term)
+        automaton.make_automaton()
+
+        for pos, question in enumerate(questions_lower.tolist()):
+            if not isinstance(question, str):
+                continue
+            for _, term in automaton.iter(question):
+                first.setdefault(term, pos)
+            if len(first) == len(terms):
+                break
+        return first
+
+    combined = "|".join(re.escape(term) for term in terms)
+    mask = questions_lower.str.contains(combined, na=False, regex=True).to_numpy()
+    for pos in np.flatnonzero(mask):
+        question = questions_lower.iat[pos]
+        for term in terms:
+            if term not in first and term in question:
+                first[term] = int(pos)
+    return first
+
+
+def extract_question_id(question: str) -> dict:
+    """
+    Extract question ID from the question text.
+    
+    Example:
+        "question 2858:- FAQ 19: Teacher kaun padhayega kaise dekhein?"
+        → {"question_id": "2858", "clean_text": "FAQ 19: Teacher kaun padhayega kaise dekhein?"}
+    """
+    match = _QID_RE.match(question.strip())
+    
+    if match:
+        return {
+            "question_id": match.group(1),
+            "clean_text": question[match.end():].strip()
+        }
+    return {
+        "question_id": None,
+        "clean_text": question.strip()
+    }
+
+
+class QueryProcessor:
+    """Process guidance queries using vector store and Parquet file."""
+
+    def __init__(self):
+        """Initialize the query processor with an async OpenAI client on a pooled HTTP client."""
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=httpx.AsyncClient(limits=OPENAI_HTTP_LIMITS)
+        )
+        self.embedding_batcher = EmbeddingBatcher(self.client)
+        self.parquet_file_path = os.getenv("PARQUET_FILE_PATH")
+        self.vector_store_id = os.getenv("VECTOR_STORE_ID", "vs_68b97d5ff1d48191adc2165ceaa4f969")
+        self._sim_cache = make_query_cache("guidance:sim", SIMILAR_CACHE_MAX_SIZE, SIMILAR_CACHE_TTL_SECONDS, name="SimilarCache")
+
+        # Parquet is loaded eagerly so the first request does not pay the disk + parse cost
+        self._df: Optional[pd.DataFrame] = None
+        self._parquet_mtime: Optional[float] = None
+        self.parquet_disabled = False
+        self._load_parquet()
+
+        # Optional local ANN index; stays None (vector store path) if disabled or the build fails
+        self.local_index = None
+        if GUIDANCE_SEARCH_BACKEND in ("local", "hybrid") and not self.parquet_disabled:
+            # Same corpus as the exam FAQ index, so both share its default sidecar and loaded copy
+            local_index = LocalQuestionIndex(self.parquet_file_path)
+            # One-off corpus embedding at startup uses a short-lived sync client
+            if local_index.build(OpenAI(api_key=settings.openai_api_key)):
+                self.local_index = local_index
+
+    async def embed(self, query: str) -> Optional[np.ndarray]:
+        """Embed a query once for both the local index and the semantic cache; None on failure."""
+        try:
+            return await self.embedding_batcher.embed(query.strip())
+        except OpenAIError as e:
+            logger.warning(f"[QueryProcessor] Query embedding failed: {e}")
+            return None
+
+    def _load_parquet(self) -> Optional[pd.DataFrame]:
+        """
+        Read the Parquet file into memory.
+        Disables Parquet lookups (instead of retrying per request) if the file is not configured or missing.
+        """
+        if not self.parquet_file_path:
+            logger.error("[QueryProcessor] PARQUET_FILE_PATH not set in environment, Parquet lookups disabled")
+            self.parquet_disabled = True
+            return None
+
+        if not os.path.exists(self.parquet_file_path):
+            logger.error(f"[QueryProcessor] Parquet file not found: {self.parquet_file_path}, Parquet lookups disabled")
+            self.parquet_disabled = True
+            return None
+
+        global _QA_INDEX, _QUESTION_LOWER_INDEX
+        try:
+            with _QA_INDEX_LOCK:
+                mtime = os.stat(self.parquet_file_path).st_mtime
+                if self._df is not None and mtime == self._parquet_mtime:
+                    return self._df
+
+                available = set(pq.read_schema(self.parquet_file_path).names)
+                columns = [col for col in PARQUET_COLUMNS if col in available]
+                df = pq.read_table(self.parquet_file_path, columns=columns).to_pandas()
+
+                # Built aside and swapped in below, so lookups during a reload see the old or new index, never a partial one
+                qa_index: Dict[str, Dict[str, Any]] = {}
+                question_lower_index: Dict[str, Dict[str, Any]] = {}
+                has_id, has_question = 'id' in df.columns, 'question' in df.columns
+                if has_id or has_question:
+                    # First occurrence wins, same as taking the first matching row
+                    for record in df.to_dict('records'):
+                        if has_id:
+                            qa_index.setdefault(str(record['id']), record)
+                        if has_question and isinstance(record['question'], str):
+                            question_lower_index.setdefault(record['question'].lower(), record)
+
+                # Lowercased questions computed once per load for exact-text matching.
+                # Question columns are Arrow-backed (contiguous buffers, faster .str scans);
+                # answers stay object dtype so missing values remain None/NaN rather than pd.NA.
+                if 'question' in df.columns:
+                    df['question'] = df['question'].astype("string[pyarrow]")
+                    df['_question_lower'] = df['question'].str.lower()
+
+                if self._df is not None:
+                    # File changed on disk: answers built from the old Q&A pairs are stale
+                    answer_cache.invalidate()
+
+                _QA_INDEX, _QUESTION_LOWER_INDEX = qa_index, question_lower_index
+                self._df = df
+                self._parquet_mtime = mtime
+                logger.info(f"[QueryProcessor] Loaded {len(df)} rows ({len(qa_index)} indexed by id) from {self.parquet_file_path}")
+        except Exception as e:
+            logger.error(f"[QueryProcessor] Failed to load Parquet file: {e}")
+        return self._df
+
+    async def find_similar_questions(self, query: str, subject: str = None, top_k: int = 3, query_vector: Optional[np.ndarray] = None) -> dict:
+        """
+        Find similar questions using the local index if enabled, else the OpenAI vector store.
+        Returns dict with 'results' key containing list of question strings.
+        Successful results are cached, so repeated queries skip the search entirely.
+        """
+        cache_key = (normalize(query), (subject or "").lower().strip(), top_k)
+        cached = await self._sim_cache.aget(cache_key)
+        if cached is not None:
+            logger.info("[VectorSearch] Similar-questions cache hit")
+            return cached
+
+        if self.local_index is not None:
+            if query_vector is None:
+                query_vector = await self.embed(query)
+            if query_vector is not None:
+                try:
+                    results, scores = self.local_index.search_with_scores(query_vector, top_k)
+                    if GUIDANCE_SEARCH_BACKEND == "hybrid" and (not scores or scores[0] < LOCAL_FASTPATH_THRESHOLD):
+                        logger.info(f"[LocalIndex] Best match {scores[0] if scores else 0.0:.3f} below fast-path threshold, using vector store")
+                    else:
+                        logger.info(f"[LocalIndex] Found {len(results)} similar questions")
+                        parsed = {"results": results, "scores": scores}
+                        await self._sim_cache.aput(cache_key, parsed)
+                        return parsed
+                except Exception as e:
+                    logger.warning(f"[LocalIndex] Search failed, falling back to vector store: {e}")
+
+        # Enhance query with subject if provided
+        if subject and subject.strip():
+            enhanced_query = f"Subject: {subject.strip()} Query: {query.strip()}"
+            logger.info(f"[VectorSearch] Enhanced query with subject: {enhanced_query}")
+        else:
+            enhanced_query = query.strip()
+            logger.info(f"[VectorSearch] Using original query: {enhanced_query}")
+
+        user_message = f"question: {enhanced_query}"
+        
+        try:
+            response = await self.client.responses.create(
+                model=_MODEL_SEARCH,
+                input=[
+                    {
+                        "role": "system",
+                        "content": [{"type": "input_text", "text": _VECTOR_SEARCH_SYSTEM_PROMPT}]
+                    },
+                    {
+                        "role": "user",
+                        "content": [{"type": "input_text", "text": user_message}]
+                    }
                 ],
-                temperature=0.7,
-                max_tokens=500,
-                top_p=0.9
+                tools=[{
+                    "type": "file_search",
+                    "vector_store_ids": [self.vector_store_id],
+                    "max_num_results": top_k
+                }],
+                temperature=0.1,
+                max_output_tokens=SEARCH_MAX_OUTPUT_TOKENS,
+                top_p=1,
+                store=True
+            )
+        except OpenAIError as e:
+            logger.error(f"[ERROR] Vector search failed: {e}")
+            return None
+
+        # Extract response content (the SDK joins the text of every output message)
+        response_content = getattr(response, "output_text", None)
+
+        if not response_content:
+            logger.error("[ERROR] No content in response")
+            return None
+
+        # Parse JSON response
+        raw_text = response_content.strip()
+        parsed = None
+        
+        try:
+            parsed = _json_loads(raw_text)
+        except ValueError:
+            # Fallback: extract JSON block
+            match = _JSON_BLOCK_RE.search(raw_text)
+            if match:
+                try:
+                    parsed = _json_loads(match.group(0))
+                except ValueError as inner:
+                    logger.error(f"[ERROR] Secondary JSON parse failed: {inner}")
+                    logger.error(f"[ERROR] Raw text: {raw_text[:200]}")
+                    return None
+            else:
+                logger.error(f"[ERROR] No JSON found in: {raw_text[:200]}")
+                return None
+
+        if not isinstance(parsed, dict) or "results" not in parsed or not isinstance(parsed["results"], list):
+            logger.error("[ERROR] Invalid JSON structure - missing 'results' array")
+            return None
+
+        # Filter valid results
+        parsed["results"] = [r for r in parsed["results"] if isinstance(r, str) and r.strip()][:top_k]
+        
+        if not parsed["results"]:
+            logger.warning("[WARN] No valid similar questions returned")
+            return None
+
+        # Early exit check
+        if len(parsed["results"]) < 1:
+            logger.warning(f"[WARN] EARLY EXIT: Only found {len(parsed['results'])} similar questions")
+            return None
+
+        # Log found questions
+        logger.info("[VectorSearch] Similar Questions Found: %d", len(parsed['results']))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("User Query: %s", query)
+            for i, question in enumerate(parsed['results'], 1):
+                logger.debug("  %d. %s", i, question)
+
+        await self._sim_cache.aput(cache_key, parsed)
+        return parsed
+
+    def search_questions_in_parquet(self, similar_questions: List[str], language: str = 'hindi', df: Optional[pd.DataFrame] = None) -> List[Dict[str, str]]:
+        """
+        Search for similar questions in Parquet file and extract Q&A pairs.
+        Properly searches by question_id if available.
+        
+        Args:
+            similar_questions: List of question strings from vector search
+            language: 'hindi' or 'english' for answer selection
+            df: DataFrame already returned by _load_parquet for this request (loaded here if omitted)
+        """
+        if self.parquet_disabled:
+            logger.warning("[WARN] Parquet lookups disabled")
+            return []
+
+        if not similar_questions:
+            logger.warning("[WARN] Similar questions list is empty")
+            return []
+
+        # Reloads only if the file changed on disk since the last load (skipped when the caller already checked)
+        if df is None:
+            df = self._load_parquet()
+        if df is None:
+            return []
+        qa_index, question_lower_index = _QA_INDEX, _QUESTION_LOWER_INDEX
+        context = []
+
+        # Column mapping
+        question_col = 'question'
+        english_answer_col = 'answer_english'
+        hindi_answer_col = 'answer_hindi'
+        id_col = 'id'
+
+        # Validate columns exist
+        missing_cols = []
+        if question_col not in df.columns:
+            missing_cols.append(question_col)
+        if english_answer_col not in df.columns:
+            missing_cols.append(english_answer_col)
+        if hindi_answer_col not in df.columns:
+            missing_cols.append(hindi_answer_col)
+
+        if missing_cols:
+            logger.error(f"[ERROR] Missing required columns: {missing_cols}")
+            # Fallback: try to use 'answer' column if specific ones missing
+            if 'answer' in df.columns:
+                english_answer_col = 'answer'
+                hindi_answer_col = 'answer'
+            else:
+                return []
+
+        # Check if ID column exists
+        has_id_column = id_col in df.columns
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("[Parquet] ID column '%s' %s", id_col, "found - will search by ID" if has_id_column else "not found - will search by question text")
+
+        # Determine which answer column to use based on language
+        if language and language.lower() == 'hindi':
+            answer_col = hindi_answer_col
+        else:
+            answer_col = english_answer_col
+        if debug:
+            logger.debug("[Parquet] Using %s answers", "Hindi" if answer_col == hindi_answer_col else "English")
+
+        extracted_questions = [
+            extract_question_id(similar_q) if similar_q and similar_q.strip() else None
+            for similar_q in similar_questions
+        ]
+
+        rows: List[Any] = [None] * len(similar_questions)
+        partial_terms: Dict[int, str] = {}
+        for i, (similar_q, extracted) in enumerate(zip(similar_questions, extracted_questions)):
+            if extracted is None:
+                if debug:
+                    logger.debug("Question %d: EMPTY/INVALID - skipping", i + 1)
+                continue
+
+            question_id = extracted["question_id"]
+            clean_text = extracted["clean_text"]
+
+            if debug:
+                logger.debug("Question %d: Raw - '%s...'", i + 1, similar_q[:80])
+                logger.debug("Question %d: Extracted ID - '%s', Clean Text - '%s...'", i + 1, question_id, clean_text[:50])
+
+            # PRIORITY 1: O(1) lookup by ID in the in-memory index
+            rows[i] = qa_index.get(question_id) if question_id and has_id_column else None
+            if rows[i] is not None:
+                if debug:
+                    logger.debug("  ✓ FOUND BY ID: %s", question_id)
+                continue
+
+            # PRIORITY 2: Fallback to text search if ID search fails
+            search_term = clean_text if clean_text else similar_q.strip()
+            if debug:
+                logger.debug("  → Falling back to text search: '%s...'", search_term[:50])
+
+            # Exact match first, O(1) from the lowercased-question index
+            search_term_lower = search_term.lower()
+            rows[i] = question_lower_index.get(search_term_lower)
+            if rows[i] is None:
+                partial_terms[i] = search_term_lower
+
+        # PRIORITY 3: Partial match for whatever is left, one pass over the column for all terms
+        if partial_terms:
+            first_positions = find_first_containing(df['_question_lower'], list(partial_terms.values()))
+            question_loc, answer_loc = df.columns.get_loc(question_col), df.columns.get_loc(answer_col)
+            for i, term in partial_terms.items():
+                if term in first_positions:
+                    # Two scalar reads instead of materializing the whole row as a Series
+                    pos = first_positions[term]
+                    rows[i] = {question_col: df.iat[pos, question_loc], answer_col: df.iat[pos, answer_loc]}
+
+        seen_questions = set()
+        for i, row in enumerate(rows):
+            if row is not None and row[question_col] in seen_questions:
+                if debug:
+                    logger.debug("Question %d: duplicate of an earlier match - skipping", i + 1)
+            elif row is not None:
+                seen_questions.add(row[question_col])
+                qa_pair = {
+                    "question": row[question_col],
+                    "answer": row[answer_col]
+                }
+                context.append(qa_pair)
+                if debug:
+                    logger.debug("Question %d: ✓ FOUND: %s...", i + 1, row[question_col][:80])
+            elif debug and extracted_questions[i] is not None:
+                logger.debug("Question %d: ✗ NOT FOUND: No match in parquet file", i + 1)
+
+        logger.info("[Parquet] Total Q&A pairs found: %d", len(context))
+
+        return context
+
+
+    @staticmethod
+    def _build_answer_messages(query: str, context: List[Dict[str, str]] = None, subject: str = None) -> List[Dict[str, str]]:
+        """Build the chat messages for the guidance answer call."""
+        # Format context
+        context_text = ""
+        if context:
+            context_text = "\n".join(
+                f"Q: {item['question']}\nA: {item['answer']}\n---"
+                for item in context
             )
 
-            if not response.choices:
-                raise ValueError("No response choices from OpenAI")
+        # Static instructions first, per-request context and question last (keeps the cacheable prefix stable)
+        user_prompt = f"""{GUIDANCE_USER_PROMPT_PREFIX}
+{context_text if context_text else "No relevant context found"}
 
-            answer = response.choices[0].message.content.strip()
-            logger.info("[GPT] Answer generated successfully")
+Student's Question: {subject + ': ' if subject else ''}{query}"""
+
+        return [
+            {"role": "system", "content": GUIDANCE_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    async def astream_answer(self, query: str, context: List[Dict[str, str]] = None, subject: str = None) -> AsyncIterator[str]:
+        """Stream the answer as text deltas as soon as OpenAI produces them."""
+        stream = await self.client.chat.completions.create(
+            model=_MODEL_ANSWER,
+            messages=self._build_answer_messages(query, context, subject),
+            temperature=0.7,
+            max_tokens=GUIDANCE_MAX_TOKENS,
+            top_p=0.9,
+            stream=True
+        )
+
+        async for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+
+    async def generate_answer(self, query: str, context: List[Dict[str, str]] = None, subject: str = None, language: str = 'hindi', query_vector: Optional[np.ndarray] = None) -> str:
+        """
+        Generate answer using GPT with context from similar Q&A pairs.
+
+        Args:
+            query: User's original query
+            context: List of similar question-answer pairs
+            subject: Subject of the query
+            language: Response language (hindi or english)
+            query_vector: Query embedding, used to add the answer to the semantic cache
+
+        Returns:
+            Plain text formatted answer string
+        """
+        stored_answer = self._stored_answer(context)
+        if stored_answer is not None:
+            return stored_answer
+
+        try:
+            answer = "".join([chunk async for chunk in self.astream_answer(query, context, subject)]).strip()
+            if not answer:
+                raise ValueError("Empty response from OpenAI")
+            logger.info(f"[GPT] Answer generated successfully ({len(answer.split())} words, max_tokens={GUIDANCE_MAX_TOKENS})")
+            # Only grounded answers are reused for near-duplicate questions
+            if query_vector is not None and context:
+                semantic_answer_cache.add(query_vector, language, subject, answer)
             return answer
 
-        except Exception as e:
+        except (OpenAIError, ValueError) as e:
             logger.error(f"[ERROR] GPT generation failed: {e}")
-            return f"Beta, abhi kuch technical issue aa raha hai. Aap {WHATSAPP_NUMBER} par WhatsApp kar sakte hain! 🙏"
+            return FALLBACK_GENERATION_TEXT
 
-    def search_similar(self, user_query: str, subject: str = None, return_k: int = 3, language: str = 'hindi') -> List[Dict[str, str]]:
+    @staticmethod
+    def _stored_answer(context: Optional[List[Dict[str, str]]]) -> Optional[str]:
+        """
+        Stored answer of a near-duplicate question, which is what the LLM would paraphrase.
+        Missing answers come back from Parquet as None/NaN and must fall through to generation.
+        """
+        stored_answer = context[0].get("answer") if context else None
+        if (
+            isinstance(stored_answer, str)
+            and stored_answer.strip()
+            and context[0].get("score", 0.0) >= GUIDANCE_SHORTCUT_THRESHOLD
+        ):
+            logger.info(f"[guidance.shortcut_hit] Returning stored answer (similarity {context[0]['score']:.3f})")
+            return stored_answer.strip()
+        return None
+
+    async def search_similar(self, user_query: str, subject: str = None, return_k: int = 3, language: str = 'hindi', query_vector: Optional[np.ndarray] = None) -> List[Dict[str, str]]:
         """
         Search for similar questions and return Q&A pairs.
         Method compatible with original API.
@@ -636,6 +1180,7 @@ Remember:
             subject: Subject of the query
             return_k: Number of similar questions to find
             language: 'hindi' or 'english' for answer selection
+            query_vector: Precomputed query embedding for the local index
 
         Returns:
             List of question-answer pairs
@@ -643,22 +1188,37 @@ Remember:
         try:
             logger.info(f"[DEBUG] search_similar called with query: {user_query}")
 
-            if not self.parquet_file_path or not os.path.exists(self.parquet_file_path):
+            if self.parquet_disabled:
                 logger.warning("[WARN] Parquet file not configured or doesn't exist")
                 return []
 
-            # Find similar questions
-            similar_response = self.find_similar_questions(user_query, subject, return_k)
+            # Find similar questions while the Parquet freshness check (and any reload) runs off the event loop
+            similar_response, df = await asyncio.gather(
+                self.find_similar_questions(user_query, subject, return_k, query_vector),
+                asyncio.to_thread(self._load_parquet)
+            )
 
             if not similar_response or 'results' not in similar_response:
                 logger.warning("[WARN] find_similar_questions returned None or invalid response")
                 return []
 
-            similar_questions = similar_response['results'][:return_k]
+            # Drop repeats of the same stored question (same ID, or same text when there is no ID)
+            similar_questions = []
+            seen = set()
+            for question in similar_response['results'][:return_k]:
+                key = extract_question_id(question)["question_id"] or normalize(question)
+                if key not in seen:
+                    seen.add(key)
+                    similar_questions.append(question)
             logger.info(f"[DEBUG] Found {len(similar_questions)} similar questions")
 
             # Extract context from parquet with language parameter
-            context = self.search_questions_in_parquet(similar_questions, language)
+            context = await asyncio.to_thread(self.search_questions_in_parquet, similar_questions, language, df)
+
+            # Carry the top local-index score onto the first context item when it is that same question
+            scores = similar_response.get("scores")
+            if scores and context and normalize(context[0]["question"]) == normalize(extract_question_id(similar_questions[0])["clean_text"]):
+                context[0]["score"] = scores[0]
             logger.info(f"[DEBUG] Retrieved {len(context)} context items from parquet")
 
             return context
@@ -675,11 +1235,57 @@ Remember:
             return []
 
 
-# Global processor instance
-query_processor = QueryProcessor()
+@functools.lru_cache(maxsize=1)
+def get_query_processor() -> QueryProcessor:
+    """Return the process-wide QueryProcessor, created on first use instead of at import."""
+    return QueryProcessor()
+
 
+# Cache key -> future of (answer, grounded) for answers currently being generated (request coalescing)
+_inflight_answers: Dict[Tuple[str, ...], asyncio.Future] = {}
 
-def ask_arivihan_question(query: str, subject: str, language: str = "hindi") -> Dict[str, Any]:
+
+async def _answer_query(query: str, subject: str, language: str) -> Tuple[str, bool]:
+    """
+    Answer one guidance query: semantic cache first, then similarity search and generation.
+
+    Returns:
+        (answer, grounded): grounded is False when no context was retrieved (e.g. the search failed)
+    """
+    query_processor = get_query_processor()
+
+    # The vector store search does not need the embedding, so it starts right away and is cancelled
+    # on a semantic hit; the local index searches with the embedding, so it waits for the cache check
+    search_task = None
+    if query_processor.local_index is None:
+        search_task = asyncio.create_task(
+            query_processor.search_similar(query, subject, return_k=3, language=language)
+        )
+    try:
+        query_vector = await query_processor.embed(query)
+        if query_vector is not None:
+            cached_answer = semantic_answer_cache.get(query_vector, language, subject)
+            if cached_answer is not None:
+                return cached_answer, True
+
+        try:
+            if search_task is not None:
+                context = await search_task
+            else:
+                context = await query_processor.search_similar(query, subject, return_k=3, language=language, query_vector=query_vector)
+        except Exception as e:
+            logger.warning(f"[WARN] Similarity search skipped: {e}")
+            context = []
+
+        # Generate answer with context and subject
+        answer = await query_processor.generate_answer(query, context, subject, language, query_vector)
+        return answer, bool(context)
+    finally:
+        if search_task is not None and not search_task.done():
+            search_task.cancel()
+
+
+async def ask_arivihan_question(query: str, subject: str, language: str = "hindi") -> Dict[str, Any]:
     """
     Main function to process guidance queries.
 
@@ -695,19 +1301,40 @@ def ask_arivihan_question(query: str, subject: str, language: str = "hindi") ->
         logger.info(f"[ask_arivihan_question] Processing query: {query[:100]}...")
         logger.info(f"[ask_arivihan_question] Subject: {subject}, Language: {language}")
 
-        # Find similar questions and get context
-        context = []
-        try:
-            context = query_processor.search_similar(query, subject, return_k=3, language=language)
-        except Exception as e:
-            logger.warning(f"[WARN] Similarity search skipped: {e}")
-
-        # Generate answer with context and subject
-        answer_text = query_processor.generate_answer(query, context, subject, language)
+        cache_key = answer_cache.make_key(query, subject, language)
+        answer_text = answer_cache.get(cache_key)
+
+        if answer_text is not None:
+            logger.info("[ask_arivihan_question] Answer cache hit")
+        elif cache_key in _inflight_answers:
+            # Identical query already being answered; share its result instead of a second LLM call
+            logger.info("[ask_arivihan_question] Joining in-flight request")
+            answer_text, _ = await asyncio.shield(_inflight_answers[cache_key])
+        else:
+            future = asyncio.get_running_loop().create_future()
+            _inflight_answers[cache_key] = future
+            try:
+                answer_text, grounded = await _answer_query(query, subject, language)
+                future.set_result((answer_text, grounded))
+            except asyncio.CancelledError:
+                # Owner was cancelled; let any joined requests fall back instead of hanging or cancelling
+                future.set_result((FALLBACK_GENERATION_TEXT, False))
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                # Mark retrieved so an unawaited failure is not reported again by asyncio
+                future.exception()
+                raise
+            finally:
+                del _inflight_answers[cache_key]
+
+            # Never cache the error fallback, nor an answer generated without context: an empty
+            # context is often a transient search failure and would pin an ungrounded answer for the TTL
+            if grounded and answer_text != FALLBACK_GENERATION_TEXT:
+                answer_cache.put(cache_key, answer_text)
 
         # Check for WhatsApp trigger
-        open_whatsapp = any(kw in answer_text.lower() for kw in
-                           ['contact', 'support', 'whatsapp', 'संपर्क', 'सहायता', WHATSAPP_NUMBER])
+        open_whatsapp = bool(_WHATSAPP_RE.search(answer_text))
 
         response = {
             "text": answer_text,
@@ -720,14 +1347,10 @@ def ask_arivihan_question(query: str, subject: str, language: str = "hindi") ->
 
     except Exception as e:
         logger.error(f"[ask_arivihan_question] Error: {e}")
-        return {
-            "text": f"Beta, abhi kuch issue aa raha hai. Aap {WHATSAPP_NUMBER} par WhatsApp kar sakte hain! 🙏",
-            "queryType": "guidance_related",
-            "openWhatsapp": True
-        }
+        return FALLBACK_QUESTION_RESPONSE.copy()
 
 
-def guidance_main(json_data: Dict[str, Any], initial_classification: str) -> Dict[str, Any]:
+async def guidance_main(json_data: Dict[str, Any], initial_classification: str) -> Dict[str, Any]:
     """
     Main entry point for guidance processing.
 
@@ -753,7 +1376,7 @@ def guidance_main(json_data: Dict[str, Any], initial_classification: str) -> Dic
         logger.info(f"[guidance_main] Subject: {subject}, Language: {language}")
 
         # Generate response
-        response_data = ask_arivihan_question(query, subject, language)
+        response_data = await ask_arivihan_question(query, subject, language)
 
         result = {
             "classifiedAs": initial_classification,
@@ -765,16 +1388,10 @@ def guidance_main(json_data: Dict[str, Any], initial_classification: str) -> Dic
         return result
 
     except Exception as e:
-        logger.error(f"[guidance_main] Error: {e}")
-        import traceback
-        logger.error(f"[guidance_main] Traceback: {traceback.format_exc()}")
+        logger.exception(f"[guidance_main] Error: {e}")
         return {
             "classifiedAs": initial_classification,
-            "response": {
-                "text": f"Beta, kuch error aa gaya. Aap {WHATSAPP_NUMBER} par WhatsApp kar sakte hain! 🙏",
-                "queryType": "guidance_related",
-                "openWhatsapp": True
-            },
+            "response": FALLBACK_MAIN_RESPONSE.copy(),
             "openWhatsapp": True
         }
 
@@ -784,7 +1401,7 @@ def normalize(text: str) -> str:
     try:
         if not text:
             return ""
-        text = re.sub(r"[^\w\s]", "", text.lower().strip())
+        text = _NORMALIZE_RE.sub("", text.lower().strip())
         return text
     except Exception as e:
         logger.error(f"[ERROR] Error in normalize function: {e}")
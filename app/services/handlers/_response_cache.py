@@ -0,0 +1,86 @@
+"""
+Response cache shared by the handlers.
+Greetings, thanks and app FAQs collapse into a small set of messages once case,
+punctuation and spacing are normalized, so their processor responses are reused
+instead of re-running the downstream processors and their GPT calls. Exam FAQ
+and subject answers are cached the same way for repeated questions (guidance
+answers are cached inside the guidance processor). Matching is exact on the
+normalized text (a sha1 key), not on embeddings.
+"""
+import copy
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.logging_config import logger
+
+
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("HANDLER_RESPONSE_CACHE_SIZE", "4096"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("HANDLER_RESPONSE_CACHE_TTL", "3600"))
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("Hello!!  Sir" -> "hello sir")."""
+    return _WHITESPACE_RE.sub(" ", _PUNCTUATION_RE.sub("", (query or "").lower())).strip()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with per-entry TTL for processor responses."""
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_MAX_SIZE, ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        intent: str,
+        language: Optional[str],
+        first_message: bool,
+        query: str,
+        subject: Optional[str] = None,
+        normalize: bool = True
+    ) -> Tuple[Any, ...]:
+        """
+        Key on (intent, language, first_message, subject, sha1 of the normalized query).
+        With normalize=False only surrounding whitespace is stripped, for queries where
+        punctuation and case carry meaning (e.g. equations in subject doubts).
+        """
+        key_query = normalize_query(query) if normalize else (query or "").strip()
+        digest = hashlib.sha1(key_query.encode("utf-8")).hexdigest()
+        return intent, (language or "hindi").lower(), first_message, (subject or "").lower(), digest
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response (callers mutate responses), or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        logger.info("[ResponseCache] Hit for intent '%s'", key[0])
+        return copy.deepcopy(response)
+
+    def put(self, key: Tuple[Any, ...], response: Dict[str, Any]) -> None:
+        """Store a copy of the response, evicting the least recently used entries when full."""
+        stored = copy.deepcopy(response)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, stored)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+# Global instance
+response_cache = ResponseCache()
@@ -6,15 +6,31 @@ Routes to app_related_classifier for proper sub-classification:
 - subscription_data_related: Pricing/plans -> subscription template
 """
 from typing import Dict, Any
-from app.services.handlers.base_handler import BaseResponseHandler
+from app.services.handlers.base_handler import BaseResponseHandler, build_error, build_success, check_first_message
 from app.core.logging_config import logger
 from app.services.app_related_classifier import app_related_classifier_main
-from app.services.history_service import history_service
+from app.services.handlers._response_cache import response_cache
+
+
+# Sub-classifications whose reply is a fixed template for a given query; screen_data_related
+# answers come from the GPT-based FAQ and are never cached
+CACHEABLE_APP_CLASSIFICATIONS = frozenset({"subscription_data_related", "app_data_related"})
+
+# Request skeleton for app_related_classifier_main; copied and filled per request
+APP_JSON_TEMPLATE = {
+    "userQuery": None,
+    "message": None,
+    "subject": None,
+    "language": "hindi",
+    "requestType": "text"
+}
 
 
 class AppHandler(BaseResponseHandler):
     """Handler for app-related classification responses using sub-classification routing."""
 
+    __slots__ = ()
+
     async def handle(self, query: str, classification_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Route app-related queries through app_related_classifier for sub-classification.
@@ -27,30 +43,22 @@ class AppHandler(BaseResponseHandler):
             Dict with response data
         """
         try:
-            logger.info(f"[AppHandler] Routing to app_related_classifier for sub-classification...")
+            logger.info("[AppHandler] Routing to app_related_classifier for sub-classification...")
 
             # Get phone_number from classification_data (use as user_id for app classifier)
             phone_number = classification_data.get("phone_number", "unknown")
 
-            # Check if this is the user's first message by checking conversation history
-            first_message = True  # Default to True if we can't determine
-            if phone_number and phone_number != "unknown":
-                try:
-                    history = await history_service.get_conversation_history(phone_number, limit=1)
-                    # If user has any previous messages, it's not their first message
-                    first_message = history.total_count == 0
-                    logger.info(f"[AppHandler] User {phone_number} has {history.total_count} previous messages, first_message={first_message}")
-                except Exception as e:
-                    logger.warning(f"[AppHandler] Could not check conversation history: {e}, assuming first_message=True")
+            # Check if this is the user's first message by checking conversation history.
+            # Not overlapped with the reply like ConversationHandler: app_related_classifier_main runs its
+            # GPT calls synchronously inside the coroutine, so a speculative task could neither overlap
+            # with the lookup nor be cancelled.
+            first_message = await check_first_message(phone_number, "AppHandler")
 
             # Prepare json_data for app_related_classifier_main
-            json_data = {
-                "userQuery": query,
-                "message": query,
-                "subject": classification_data.get("subject"),
-                "language": classification_data.get("language", "hindi"),
-                "requestType": "text"
-            }
+            json_data = APP_JSON_TEMPLATE.copy()
+            json_data["userQuery"] = json_data["message"] = query
+            json_data["subject"] = classification_data.get("subject")
+            json_data["language"] = classification_data.get("language", "hindi")
 
             # Get initial classification
             initial_classification = classification_data.get("classification", "app_related")
@@ -60,31 +68,28 @@ class AppHandler(BaseResponseHandler):
             # - screen_data_related -> app_screen_related_main (GPT-based FAQ)
             # - app_data_related -> content templates
             # - subscription_data_related -> subscription message
-            result = await app_related_classifier_main(json_data, phone_number, initial_classification, first_message)
+            cache_key = response_cache.make_key("app_related", json_data["language"], first_message, query, json_data["subject"])
+            result = response_cache.get(cache_key)
+            if result is None:
+                result = await app_related_classifier_main(json_data, phone_number, initial_classification, first_message)
+                if result.get("classifiedAs") in CACHEABLE_APP_CLASSIFICATIONS and not result.get("openWhatsapp"):
+                    response_cache.put(cache_key, result)
 
             # Wrap the result in the expected handler response format
-            response = {
-                "status": "success",
-                "data": result,
-                "message": "App-related response generated via classifier routing",
-                "metadata": {
-                    "subject": classification_data.get("subject"),
-                    "language": classification_data.get("language"),
-                    "classified_as": result.get("classifiedAs"),
-                    "processor": "app_related_classifier"
-                }
-            }
-
-            logger.info(f"[AppHandler] Classifier routing completed: {result.get('classifiedAs')}")
+            response = build_success(
+                result,
+                "App-related response generated via classifier routing",
+                classification_data,
+                classified_as=result.get("classifiedAs"),
+                processor="app_related_classifier"
+            )
+
+            logger.info("[AppHandler] Classifier routing completed: %s", result.get('classifiedAs'))
             return response
 
         except Exception as e:
             logger.error(f"[AppHandler] Error in classifier routing: {e}")
-            return {
-                "status": "error",
-                "data": None,
-                "message": f"Failed to route app-related query: {str(e)}"
-            }
+            return build_error(f"Failed to route app-related query: {str(e)}")
 
 
 # Global handler instance
@@ -2,12 +2,76 @@
 Base handler class for response generation.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Optional, TypedDict
+from app.core.logging_config import logger
+from app.services.history_service import history_service
+
+
+def is_probably_returning(phone_number: Optional[str]) -> bool:
+    """Whether this process has seen the user with history before (the entry may have expired since)."""
+    return bool(phone_number) and history_service.is_known_user(phone_number)
+
+
+# Detected language -> value the downstream processors accept, keyed by the casings the
+# classifier actually emits so the common case is a single dict lookup
+_LANGUAGE_MAP = {
+    None: "hindi",
+    "": "hindi",
+    "hindi": "hindi", "Hindi": "hindi", "HINDI": "hindi",
+    "english": "english", "English": "english", "ENGLISH": "english",
+    "hindlish": "hindi", "Hindlish": "hindi", "HINDLISH": "hindi",
+    "hinglish": "hinglish", "Hinglish": "hinglish", "HINGLISH": "hinglish",
+}
+
+
+def normalize_handler_language(raw_language: Optional[str]) -> str:
+    """Lowercase the detected language (default hindi) and map hindlish to hindi; other values pass through."""
+    language = _LANGUAGE_MAP.get(raw_language)
+    if language is not None:
+        return language
+    language = raw_language.lower()
+    return _LANGUAGE_MAP.get(language, language)
+
+
+class HandlerResponse(TypedDict, total=False):
+    """
+    Shape of every handler response. A TypedDict rather than a dataclass: the pipeline
+    adds metadata in place and ClassificationResponse.response_data expects a plain dict.
+    """
+    status: str
+    data: Any
+    message: str
+    metadata: Dict[str, Any]
+
+
+def build_success(data: Any, message: str, classification_data: Dict[str, Any], **extra_meta: Any) -> HandlerResponse:
+    """Standard success response; metadata carries subject and language plus any extra fields."""
+    return {
+        "status": "success",
+        "data": data,
+        "message": message,
+        "metadata": {
+            "subject": classification_data.get("subject"),
+            "language": classification_data.get("language"),
+            **extra_meta
+        }
+    }
+
+
+def build_error(message: str) -> HandlerResponse:
+    """Standard error response."""
+    return {
+        "status": "error",
+        "data": None,
+        "message": message
+    }
 
 
 class BaseResponseHandler(ABC):
     """Base class for all response handlers."""
 
+    __slots__ = ()
+
     @abstractmethod
     def handle(self, query: str, classification_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -33,3 +97,28 @@ class BaseResponseHandler(ABC):
             }
         """
         pass
+
+
+async def check_first_message(phone_number: Optional[str], log_prefix: str) -> bool:
+    """
+    Whether this is the user's first message, from their conversation history.
+    Defaults to True if there is no phone number or the history lookup fails.
+    """
+    if not phone_number or phone_number == "unknown":
+        logger.info("[%s] No phone_number provided, assuming first_message=True", log_prefix)
+        return True
+
+    # Users this process saved or read in-window history for skip the DynamoDB lookup
+    if history_service.has_recent_history(phone_number):
+        return False
+
+    try:
+        # Only the count is needed, so skip building message models
+        history = await history_service.get_conversation_history(phone_number, limit=1, raw=True)
+        # If user has any previous messages, it's not their first message
+        first_message = history["total_count"] == 0
+        logger.info("[%s] User %s has %s previous messages, first_message=%s", log_prefix, phone_number, history["total_count"], first_message)
+        return first_message
+    except Exception as e:
+        logger.warning("[%s] Could not check conversation history: %s, assuming first_message=True", log_prefix, e)
+        return True
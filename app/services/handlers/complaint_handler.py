@@ -3,16 +3,25 @@ Handler for complaint queries.
 Handles expressions of dissatisfaction, frustration, or reported problems.
 """
 from typing import Dict, Any
-from app.services.handlers.base_handler import BaseResponseHandler
+from app.services.handlers.base_handler import BaseResponseHandler, build_success
 from app.core.logging_config import logger
 
 
+# Placeholder complaint response, built once at import
+COMPLAINT_DATA = {
+    "type": "complaint",
+    "text": "whatsapp",
+    "ticket_created": False,  # TODO: Create actual ticket
+    "support_contact": "Available in Arivihan App"
+}
+COMPLAINT_MESSAGE = "Complaint acknowledged (placeholder)"
+COMPLAINT_NOTE = "This is a placeholder. Implement actual complaint handling with CRM integration."
+
+
 class ComplaintHandler(BaseResponseHandler):
     """Handler for complaint classification responses."""
 
-    def __init__(self):
-        """Initialize the complaint handler."""
-        pass
+    __slots__ = ()
 
     async def handle(self, query: str, classification_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -28,39 +37,18 @@ class ComplaintHandler(BaseResponseHandler):
         Returns:
             Dict with response data
         """
-        try:
-            logger.info(f"[ComplaintHandler] Processing complaint: {query[:100]}...")
-
-
-            # Placeholder response
-            response = {
-                "status": "success",
-                "data": {
-                    "type": "complaint",
-                    "text": (
-                        "whatsapp"
-                    ),
-                    "ticket_created": False,  # TODO: Create actual ticket
-                    "support_contact": "Available in Arivihan App"
-                },
-                "message": "Complaint acknowledged (placeholder)",
-                "metadata": {
-                    "subject": classification_data.get("subject"),
-                    "language": classification_data.get("language"),
-                    "note": "This is a placeholder. Implement actual complaint handling with CRM integration."
-                }
-            }
-
-            logger.info(f"[ComplaintHandler] Placeholder response generated")
-            return response
-
-        except Exception as e:
-            logger.error(f"[ComplaintHandler] Error generating response: {e}")
-            return {
-                "status": "error",
-                "data": None,
-                "message": f"Failed to generate complaint response: {str(e)}"
-            }
+        logger.info("[ComplaintHandler] Processing complaint: %.100s...", query)
+
+        # Placeholder response; data is copied so callers never share the module-level dict
+        response = build_success(
+            dict(COMPLAINT_DATA),
+            COMPLAINT_MESSAGE,
+            classification_data,
+            note=COMPLAINT_NOTE
+        )
+
+        logger.info("[ComplaintHandler] Placeholder response generated")
+        return response
 
 
 # Global handler instance
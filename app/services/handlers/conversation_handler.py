@@ -3,19 +3,30 @@ Handler for conversation-based queries.
 Handles casual greetings, thanks, and social interactions.
 Uses local ConversationProcessor instead of external API.
 """
+import asyncio
 from typing import Dict, Any
-from app.services.handlers.base_handler import BaseResponseHandler
+from app.services.handlers.base_handler import (
+    BaseResponseHandler, build_error, build_success, check_first_message, is_probably_returning, normalize_handler_language
+)
 from app.core.logging_config import logger
 from app.services.conversation_processor import conversation_main
-from app.services.history_service import history_service
+from app.services.handlers._response_cache import response_cache
+
+
+# Request skeleton for conversation_main; copied per request since the processor adds keys to it
+CONVERSATION_JSON_TEMPLATE = {
+    "message": None,
+    "userQuery": None,
+    "requestType": "text",
+    "subject": None,
+    "language": "hindi"
+}
 
 
 class ConversationHandler(BaseResponseHandler):
     """Handler for conversation-based classification responses using local processor."""
 
-    def __init__(self):
-        """Initialize the conversation handler."""
-        pass
+    __slots__ = ()
 
     async def handle(self, query: str, classification_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -29,67 +40,63 @@ class ConversationHandler(BaseResponseHandler):
             Dict with response data
         """
         try:
-            logger.info(f"[ConversationHandler] Processing query locally: {query[:100]}...")
+            logger.info("[ConversationHandler] Processing query locally: %.100s...", query)
 
             # Prepare data for local processor
             # Normalize language to API format (only "english" or "hindi" accepted)
-            raw_language = classification_data.get("language", "hindi")
-            language = raw_language.lower() if raw_language else "hindi"
-            # Map hindlish to hindi since API only accepts english/hindi
-            if language == "hindlish":
-                language = "hindi"
-
-            json_data = {
-                "message": query,
-                "userQuery": query,
-                "requestType": "text",
-                "subject": classification_data.get("subject"),
-                "language": language
-            }
+            language = normalize_handler_language(classification_data.get("language", "hindi"))
+
+            json_data = CONVERSATION_JSON_TEMPLATE.copy()
+            json_data["message"] = json_data["userQuery"] = query
+            json_data["subject"] = classification_data.get("subject")
+            json_data["language"] = language
 
             # Get classification type
             initial_classification = classification_data.get("main_classification", "conversation")
 
-            # Check if this is the user's first message by checking conversation history
-            first_message = True  # Default to True if we can't determine
-            phone_number = classification_data.get("phone_number")
+            async def respond(first_message: bool) -> Dict[str, Any]:
+                # Repeated greetings/thanks reuse the earlier reply instead of another GPT call
+                cache_key = response_cache.make_key("conversation", language, first_message, query)
+                processor_response = response_cache.get(cache_key)
+                if processor_response is None:
+                    # Process using local conversation processor (sync OpenAI client, so off the event loop);
+                    # each call gets its own dict since the processor writes into it
+                    processor_response = await asyncio.to_thread(conversation_main, dict(json_data), initial_classification, first_message)
+                    # Only successful replies are cached, never the WhatsApp fallback
+                    if processor_response.get("response") and not processor_response.get("openWhatsapp"):
+                        response_cache.put(cache_key, processor_response)
+                return processor_response
 
-            if phone_number:
-                try:
-                    history = await history_service.get_conversation_history(phone_number, limit=1)
-                    # If user has any previous messages, it's not their first message
-                    first_message = history.total_count == 0
-                    logger.info(f"[ConversationHandler] User {phone_number} has {history.total_count} previous messages, first_message={first_message}")
-                except Exception as e:
-                    logger.warning(f"[ConversationHandler] Could not check conversation history: {e}, assuming first_message=True")
+            phone_number = classification_data.get("phone_number")
+            if is_probably_returning(phone_number):
+                # Seen before but the history lookup is still needed: run it alongside a speculative
+                # returning-user reply. Cancelling cannot stop the worker thread, so a wrong guess still
+                # pays for one discarded GPT call - which is why unseen users do not speculate.
+                # sleep(0) lets the speculative task hand off to its worker thread before the lookup runs.
+                speculative_task = asyncio.create_task(respond(False))
+                await asyncio.sleep(0)
+                if await check_first_message(phone_number, "ConversationHandler"):
+                    speculative_task.cancel()
+                    processor_response = await respond(True)
+                else:
+                    processor_response = await speculative_task
             else:
-                logger.info(f"[ConversationHandler] No phone_number provided, assuming first_message=True")
-
-            # Process using local conversation processor
-            processor_response = conversation_main(json_data, initial_classification, first_message)
+                processor_response = await respond(await check_first_message(phone_number, "ConversationHandler"))
 
             # Wrap the processor response
-            response = {
-                "status": "success",
-                "data": processor_response,
-                "message": "Conversation response generated successfully (local)",
-                "metadata": {
-                    "subject": classification_data.get("subject"),
-                    "language": classification_data.get("language"),
-                    "processor": "local"
-                }
-            }
-
-            logger.info(f"[ConversationHandler] Local response generated successfully")
+            response = build_success(
+                processor_response,
+                "Conversation response generated successfully (local)",
+                classification_data,
+                processor="local"
+            )
+
+            logger.info("[ConversationHandler] Local response generated successfully")
             return response
 
         except Exception as e:
             logger.error(f"[ConversationHandler] Error generating local response: {e}")
-            return {
-                "status": "error",
-                "data": None,
-                "message": f"Failed to generate conversation response: {str(e)}"
-            }
+            return build_error(f"Failed to generate conversation response: {str(e)}")
 
 
 # Global handler instance
@@ -3,23 +3,139 @@ Handler for exam-related queries.
 Handles exam patterns, PYQs, important questions, syllabus, etc.
 Formats responses using GPT for better readability.
 """
-from typing import Dict, Any
-from app.services.handlers.base_handler import BaseResponseHandler
+import functools
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, Optional
+from app.services.handlers.base_handler import BaseResponseHandler, build_error, build_success, normalize_handler_language
 from app.core.logging_config import logger
 from app.utils.api_client import external_api_client
 from app.services.exam_formatter import format_exam_response
 from app.services.content_responses import CONTENT_RESPONSES
-from app.services.exam_faq_query import exam_faq_query_main
+from app.services.exam_faq_query import aexam_faq_query_main
+from app.services.handlers._response_cache import response_cache
+
+try:
+    import ahocorasick
+except ImportError:  # Optional dependency - keyword routing uses one regex-alternation scan instead
+    ahocorasick = None
+
+
+# Request skeleton for the local FAQ handler; copied and filled per request
+FAQ_PAYLOAD_TEMPLATE = {
+    "userQuery": None,
+    "subject": None,
+    "language": "hindi",
+    "requestType": "text"
+}
+
+# Response data for the FAQ branch; copied per request with the answer filled in
+FAQ_DATA = {
+    "classifiedAs": "exam_related_info",
+    "sub_classification": "faq",
+    "response": None,
+    "openWhatsapp": False,
+    "responseType": "text",
+    "source": "local_faq_handler"
+}
+
+# Sub-classifications the exam classifier can return (ExamClassifierAgent.categories)
+KNOWN_SUB_CLASSIFICATIONS = frozenset({
+    "faq",
+    "asking_PYQ_question",
+    "asking_important_question",
+    "pyq_pdf",
+    "asking_test",
+})
+
+# Lowercase phrases that identify a canned local-template intent when the upstream
+# sub_classification is missing or unknown, so these queries never reach the external exam API
+LOCAL_INTENT_KEYWORDS = {
+    "important question": "asking_important_question",
+    "imp question": "asking_important_question",
+    "important sawal": "asking_important_question",
+    "imp sawal": "asking_important_question",
+    "mahatvapurna prashn": "asking_important_question",
+    "mahatvapurn prashn": "asking_important_question",
+    "mahatvpurn prashn": "asking_important_question",
+    "zaruri sawal": "asking_important_question",
+    "jaruri sawal": "asking_important_question",
+    "महत्वपूर्ण प्रश्न": "asking_important_question",
+    "महत्वपूर्ण सवाल": "asking_important_question",
+    "जरूरी सवाल": "asking_important_question",
+    "ज़रूरी सवाल": "asking_important_question",
+}
+
+
+def _build_keyword_matcher():
+    """Build the keyword scanner once at import: an Aho-Corasick automaton, or a compiled regex."""
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for keyword, intent in LOCAL_INTENT_KEYWORDS.items():
+            automaton.add_word(keyword, intent)
+        automaton.make_automaton()
+        return automaton
+    return re.compile("|".join(re.escape(keyword) for keyword in sorted(LOCAL_INTENT_KEYWORDS, key=len, reverse=True)))
+
+
+_KEYWORD_MATCHER = _build_keyword_matcher()
+
+
+def match_local_intent(query: str) -> Optional[str]:
+    """Return the local-template sub_classification whose keyword appears in the query, if any."""
+    text = (query or "").lower()
+    if ahocorasick is not None:
+        for _, intent in _KEYWORD_MATCHER.iter(text):
+            return intent
+        return None
+    match = _KEYWORD_MATCHER.search(text)
+    return LOCAL_INTENT_KEYWORDS[match.group(0)] if match else None
+
+
+def _uuid7() -> str:
+    """Time-ordered UUIDv7 string: 48-bit millisecond timestamp followed by 74 random bits."""
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
+
+@functools.lru_cache(maxsize=64)
+def _payload_skeleton(subject: str, language: str) -> Dict[str, Any]:
+    """Base exam API payload per (subject, language); callers copy it and fill in userQuery."""
+    return external_api_client.get_base_payload(subject=subject, user_query="", language=language)
+
+
+# Response data for asking_important_question; copied per request with the template text filled in
+IMPORTANT_QUESTIONS_DATA = {
+    "classifiedAs": "exam_related_info",
+    "sub_classification": "asking_important_question",
+    "response": None,
+    "openWhatsapp": False,
+    "responseType": "text",
+    "source": "local_template"
+}
 
 
 class ExamHandler(BaseResponseHandler):
     """Handler for exam-related classification responses with GPT formatting."""
 
+    __slots__ = ('api_client', 'endpoint', 'important_questions')
+
     def __init__(self):
         """Initialize the exam handler."""
         self.api_client = external_api_client
         self.endpoint = "/exam/query/classifier"
 
+        # Bind the important_questions templates once; empty if the template is missing
+        try:
+            templates = CONTENT_RESPONSES["important_questions"]
+            self.important_questions = {"hindi": templates["hindi"], "hinglish": templates["hinglish"]}
+        except KeyError:
+            self.important_questions = {}
+
     async def handle(self, query: str, classification_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate exam-related response for the query by calling external API.
@@ -33,17 +149,21 @@ class ExamHandler(BaseResponseHandler):
             Dict with response data and formatted message
         """
         try:
-            logger.info(f"[ExamHandler] Processing query: {query[:100]}...")
-            logger.info(f"[ExamHandler] Sub-classification: {classification_data.get('sub_classification')}")
+            sub_classification = classification_data.get("sub_classification")
+            logger.info("[ExamHandler] Processing query: %.100s...", query)
+            logger.info("[ExamHandler] Sub-classification: %s", sub_classification)
 
             # Normalize language to API format (only "english" or "hindi" accepted)
-            raw_language = classification_data.get("language", "hindi")
-            language = raw_language.lower() if raw_language else "hindi"
-            # Map hindlish to hindi since API only accepts english/hindi
-            if language == "hindlish":
-                language = "hindi"
+            language = normalize_handler_language(classification_data.get("language", "hindi"))
             subject = classification_data.get("subject", "General")
-            sub_classification = classification_data.get("sub_classification")
+
+            # Without a usable upstream label, canned intents are routed to their local template
+            # (a concrete label such as asking_PYQ_question is never overridden)
+            if sub_classification not in KNOWN_SUB_CLASSIFICATIONS:
+                local_intent = match_local_intent(query)
+                if local_intent:
+                    logger.info("[ExamHandler] Keyword match routes %s to %s", sub_classification, local_intent)
+                    sub_classification = local_intent
 
             # Check if this is an "asking_important_question" query
             # If yes, return the template directly without calling external API
@@ -54,28 +174,19 @@ class ExamHandler(BaseResponseHandler):
                 lang_key = "hindi" if language == "hindi" else "hinglish"
 
                 # Get the important_questions template
-                if "important_questions" in CONTENT_RESPONSES:
-                    response_text = CONTENT_RESPONSES["important_questions"][lang_key]
+                response_text = self.important_questions.get(lang_key)
+                if response_text is not None:
+                    data = IMPORTANT_QUESTIONS_DATA.copy()
+                    data["response"] = response_text
 
                     # Build response with the template
-                    response = {
-                        "status": "success",
-                        "data": {
-                            "classifiedAs": "exam_related_info",
-                            "sub_classification": "asking_important_question",
-                            "response": response_text,
-                            "openWhatsapp": False,
-                            "responseType": "text",
-                            "source": "local_template"
-                        },
-                        "message": "Important questions response generated from local template",
-                        "metadata": {
-                            "subject": classification_data.get("subject"),
-                            "language": classification_data.get("language"),
-                            "sub_classification": sub_classification,
-                            "source": "local_template"
-                        }
-                    }
+                    response = build_success(
+                        data,
+                        "Important questions response generated from local template",
+                        classification_data,
+                        sub_classification=sub_classification,
+                        source="local_template"
+                    )
 
                     logger.info("[ExamHandler] Important questions template returned successfully")
                     return response
@@ -88,53 +199,46 @@ class ExamHandler(BaseResponseHandler):
                 logger.info("[ExamHandler] Detected FAQ - using local exam_faq_query handler")
 
                 # Prepare payload for FAQ handler
-                faq_payload = {
-                    "userQuery": query,
-                    "subject": subject,
-                    "language": language,
-                    "requestType": "text"
-                }
+                faq_payload = FAQ_PAYLOAD_TEMPLATE.copy()
+                faq_payload["userQuery"] = query
+                faq_payload["subject"] = subject
+                faq_payload["language"] = language
 
-                # Call local FAQ handler
-                faq_result = exam_faq_query_main(faq_payload, "exam_related_info")
+                # Repeated FAQ questions reuse the earlier answer
+                cache_key = response_cache.make_key("exam_faq", language, False, query, subject)
+                faq_result = response_cache.get(cache_key)
+                if faq_result is None:
+                    # Call local FAQ handler
+                    faq_result = await aexam_faq_query_main(faq_payload, "exam_related_info")
+                    # Only answered questions are cached, never the WhatsApp fallback
+                    if faq_result.get("response") and not faq_result.get("openWhatsapp"):
+                        response_cache.put(cache_key, faq_result)
 
                 # Extract response from FAQ result
                 faq_response = faq_result.get("response", "")
                 open_whatsapp = faq_result.get("openWhatsapp", False)
 
                 # Build response
-                response = {
-                    "status": "success",
-                    "data": {
-                        "classifiedAs": "exam_related_info",
-                        "sub_classification": "faq",
-                        "response": faq_response,
-                        "openWhatsapp": open_whatsapp,
-                        "responseType": "text",
-                        "source": "local_faq_handler"
-                    },
-                    "message": "FAQ response generated from local handler",
-                    "metadata": {
-                        "subject": classification_data.get("subject"),
-                        "language": classification_data.get("language"),
-                        "sub_classification": sub_classification,
-                        "source": "local_faq_handler"
-                    }
-                }
-
-                logger.info(f"[ExamHandler] FAQ response returned successfully (openWhatsapp: {open_whatsapp})")
+                data = FAQ_DATA.copy()
+                data["response"] = faq_response
+                data["openWhatsapp"] = open_whatsapp
+                response = build_success(
+                    data,
+                    "FAQ response generated from local handler",
+                    classification_data,
+                    sub_classification=sub_classification,
+                    source="local_faq_handler"
+                )
+
+                logger.info("[ExamHandler] FAQ response returned successfully (openWhatsapp: %s)", open_whatsapp)
                 return response
 
             # Generate a chat session ID (in production, this should come from your system)
-            import uuid
-            chat_session_id = str(uuid.uuid4())
+            chat_session_id = _uuid7()
 
             # Prepare payload for external API
-            payload = self.api_client.get_base_payload(
-                subject=subject,
-                user_query=query,
-                language=language
-            )
+            payload = dict(_payload_skeleton(subject, language))
+            payload["userQuery"] = query
 
             # Add sub-classification info to payload if available
             if sub_classification:
@@ -158,29 +262,21 @@ class ExamHandler(BaseResponseHandler):
             )
 
             # Wrap the external API response
-            response = {
-                "status": "success",
-                "data": formatted_data,
-                "message": "Exam-related response generated successfully",
-                "metadata": {
-                    "subject": classification_data.get("subject"),
-                    "language": classification_data.get("language"),
-                    "sub_classification": classification_data.get("sub_classification"),
-                    "endpoint": self.endpoint,
-                    "formatted": formatted_data.get("has_formatted_response", False)
-                }
-            }
-
-            logger.info(f"[ExamHandler] Response generated successfully (formatted: {formatted_data.get('has_formatted_response', False)})")
+            response = build_success(
+                formatted_data,
+                "Exam-related response generated successfully",
+                classification_data,
+                sub_classification=sub_classification,
+                endpoint=self.endpoint,
+                formatted=formatted_data.get("has_formatted_response", False)
+            )
+
+            logger.info("[ExamHandler] Response generated successfully (formatted: %s)", formatted_data.get('has_formatted_response', False))
             return response
 
         except Exception as e:
             logger.error(f"[ExamHandler] Error generating response: {e}")
-            return {
-                "status": "error",
-                "data": None,
-                "message": f"Failed to generate exam-related response: {str(e)}"
-            }
+            return build_error(f"Failed to generate exam-related response: {str(e)}")
 
 
 # Global handler instance
@@ -4,7 +4,7 @@ Provides study advice, planning help, motivation, and academic guidance.
 Uses local QueryProcessor instead of external API.
 """
 from typing import Dict, Any
-from app.services.handlers.base_handler import BaseResponseHandler
+from app.services.handlers.base_handler import BaseResponseHandler, build_error, build_success, normalize_handler_language
 from app.core.logging_config import logger
 from app.services.guidance_processor import guidance_main
 
@@ -12,9 +12,7 @@ from app.services.guidance_processor import guidance_main
 class GuidanceHandler(BaseResponseHandler):
     """Handler for guidance-based classification responses using local processor."""
 
-    def __init__(self):
-        """Initialize the guidance handler."""
-        pass
+    __slots__ = ()
 
     async def handle(self, query: str, classification_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -28,15 +26,11 @@ class GuidanceHandler(BaseResponseHandler):
             Dict with response data
         """
         try:
-            logger.info(f"[GuidanceHandler] Processing query locally: {query[:100]}...")
+            logger.info("[GuidanceHandler] Processing query locally: %.100s...", query)
 
             # Prepare data for local processor
             # Normalize language to API format (only "english" or "hindi" accepted)
-            raw_language = classification_data.get("language", "hindi")
-            language = raw_language.lower() if raw_language else "hindi"
-            # Map hindlish to hindi since API only accepts english/hindi
-            if language == "hindlish":
-                language = "hindi"
+            language = normalize_handler_language(classification_data.get("language", "hindi"))
 
             json_data = {
                 "message": query,
@@ -47,31 +41,23 @@ class GuidanceHandler(BaseResponseHandler):
             # Get classification type
             initial_classification = classification_data.get("main_classification", "guidance_based")
 
-            # Process using local guidance processor
-            processor_response = guidance_main(json_data, initial_classification)
+            # Process using local guidance processor (it caches answers and coalesces duplicates itself)
+            processor_response = await guidance_main(json_data, initial_classification)
 
             # Wrap the processor response
-            response = {
-                "status": "success",
-                "data": processor_response,
-                "message": "Guidance response generated successfully (local)",
-                "metadata": {
-                    "subject": classification_data.get("subject"),
-                    "language": classification_data.get("language"),
-                    "processor": "local"
-                }
-            }
+            response = build_success(
+                processor_response,
+                "Guidance response generated successfully (local)",
+                classification_data,
+                processor="local"
+            )
 
-            logger.info(f"[GuidanceHandler] Local response generated successfully")
+            logger.info("[GuidanceHandler] Local response generated successfully")
             return response
 
         except Exception as e:
             logger.error(f"[GuidanceHandler] Error generating local response: {e}")
-            return {
-                "status": "error",
-                "data": None,
-                "message": f"Failed to generate guidance response: {str(e)}"
-            }
+            return build_error(f"Failed to generate guidance response: {str(e)}")
 
 
 # Global handler instance
@@ -4,17 +4,16 @@ Handles academic questions about specific topics, concepts, formulas, or problem
 Uses local SubjectProcessor for board and conceptual solutions.
 """
 from typing import Dict, Any
-from app.services.handlers.base_handler import BaseResponseHandler
+from app.services.handlers.base_handler import BaseResponseHandler, build_error, build_success, normalize_handler_language
 from app.core.logging_config import logger
 from app.services.subject_processor import subject_main
+from app.services.handlers._response_cache import response_cache
 
 
 class SubjectHandler(BaseResponseHandler):
     """Handler for subject-related classification responses using local processor."""
 
-    def __init__(self):
-        """Initialize the subject handler."""
-        pass
+    __slots__ = ()
 
     async def handle(self, query: str, classification_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -28,51 +27,48 @@ class SubjectHandler(BaseResponseHandler):
             Dict with response data
         """
         try:
-            logger.info(f"[SubjectHandler] Processing query locally: {query[:100]}...")
+            logger.info("[SubjectHandler] Processing query locally: %.100s...", query)
 
             # Prepare data for local processor
             # Normalize language to API format (only "english" or "hindi" accepted)
-            raw_language = classification_data.get("language", "hindi")
-            language = raw_language.lower() if raw_language else "hindi"
-            # Map hindlish to hindi since API only accepts english/hindi
-            if language == "hindlish":
-                language = "hindi"
+            language = normalize_handler_language(classification_data.get("language", "hindi"))
 
+            subject = classification_data.get("subject", "General")
             json_data = {
                 "message": query,
                 "userQuery": query,
-                "subject": classification_data.get("subject", "General"),
+                "subject": subject,
                 "language": language
             }
 
             # Get classification type
             initial_classification = classification_data.get("main_classification", "subject_related")
 
-            # Process using local subject processor
-            processor_response = await subject_main(json_data, initial_classification)
+            # Repeated doubts reuse the earlier solution; the query is not normalized since
+            # punctuation and case matter in equations
+            cache_key = response_cache.make_key(f"subject:{initial_classification}", language, False, query, subject, normalize=False)
+            processor_response = response_cache.get(cache_key)
+            if processor_response is None:
+                # Process using local subject processor
+                processor_response = await subject_main(json_data, initial_classification)
+                # Only solved doubts are cached, never the WhatsApp fallback
+                if processor_response.get("response") and not processor_response.get("openWhatsapp"):
+                    response_cache.put(cache_key, processor_response)
 
             # Wrap the processor response
-            response = {
-                "status": "success",
-                "data": processor_response,
-                "message": "Subject doubt response generated successfully (local)",
-                "metadata": {
-                    "subject": classification_data.get("subject"),
-                    "language": classification_data.get("language"),
-                    "processor": "local"
-                }
-            }
+            response = build_success(
+                processor_response,
+                "Subject doubt response generated successfully (local)",
+                classification_data,
+                processor="local"
+            )
 
-            logger.info(f"[SubjectHandler] Local response generated successfully")
+            logger.info("[SubjectHandler] Local response generated successfully")
             return response
 
         except Exception as e:
             logger.error(f"[SubjectHandler] Error generating local response: {e}")
-            return {
-                "status": "error",
-                "data": None,
-                "message": f"Failed to generate subject-related response: {str(e)}"
-            }
+            return build_error(f"Failed to generate subject-related response: {str(e)}")
 
 
 # Global handler instance
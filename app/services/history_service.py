@@ -2,10 +2,16 @@
 DynamoDB service for conversation history management.
 Handles saving and retrieving conversation history with 24-hour sliding window.
 """
+import asyncio
+import functools
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
 import boto3
-from decimal import Decimal
-from typing import List, Optional
+from botocore.config import Config
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Callable, Dict, List, Optional, Union
 from app.core.config import settings
 from app.core.logging_config import logger
 from app.models.history_schemas import (
@@ -14,6 +20,35 @@ from app.models.history_schemas import (
     HistorySaveRequest
 )
 
+try:
+    import aioboto3
+    from aiobotocore.config import AioConfig
+except ImportError:  # Optional dependency - single-item calls run on the DynamoDB thread pool instead
+    aioboto3 = None
+
+
+# processing_time_ms is stored with microsecond precision
+_PROCESSING_TIME_QUANTUM = Decimal("0.001")
+
+# Session layout: one item per (phone_number, hour), keyed by the hour's start in milliseconds
+SESSION_BUCKET_MS = 60 * 60 * 1000
+
+# Upper bound on the in-process known-users map
+KNOWN_USERS_MAX_SIZE = 200_000
+
+# Query expressions are constant strings, so botocore gets the same text every call;
+# only ExpressionAttributeValues (which boto3 serializes in place) is built per request.
+# 'timestamp', 'language' and 'ttl' are DynamoDB reserved words, hence the # aliases.
+HISTORY_KEY_CONDITION = 'phone_number = :phone AND #ts > :cutoff'
+SESSION_KEY_CONDITION = 'phone_number = :phone AND #ts >= :bucket'
+EXPIRED_KEY_CONDITION = 'phone_number = :phone AND #ts < :cutoff'
+HISTORY_PROJECTION = '#ts, request_message, response_message, classification, sub_classification, subject, #lang, is_follow_up'
+KEY_PROJECTION = 'phone_number, #ts'
+SESSION_APPEND_UPDATE = 'SET messages = list_append(if_not_exists(messages, :empty), :message), #ttl = :ttl'
+TIMESTAMP_NAMES = {'#ts': 'timestamp'}
+HISTORY_NAMES = {'#ts': 'timestamp', '#lang': 'language'}
+TTL_NAMES = {'#ttl': 'ttl'}
+
 
 class HistoryService:
     """Service for managing conversation history in DynamoDB."""
@@ -24,14 +59,34 @@ class HistoryService:
         self.retention_days = settings.history_retention_days
         self.messages_limit = settings.history_messages_limit
         self.window_hours = settings.history_window_hours
-
-        # Initialize DynamoDB client
+        # "session" stores one item per user per hour with the messages appended to a list
+        self.session_layout = settings.history_layout == "session"
+
+        # Dedicated threads for blocking boto3 calls, sized to the connection pool so a burst of
+        # DynamoDB calls neither queues behind nor starves the default asyncio executor
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.dynamodb_max_pool_connections,
+            thread_name_prefix="ddb"
+        )
+
+        # Users this process has saved or read history for, mapped to when that history leaves the window.
+        # With history_skip_unknown_users, once the process has been up a full window an unknown
+        # user cannot have in-window history (single-writer deployments only), so the query is skipped.
+        self.skip_unknown_users = settings.history_skip_unknown_users
+        self._known_users: "OrderedDict[str, float]" = OrderedDict()
+        self._started_at = time.monotonic()
+
+        # Initialize DynamoDB client; one pooled connection set is shared by every request
         try:
             self.dynamodb = boto3.resource(
                 'dynamodb',
                 region_name=settings.aws_region,
                 aws_access_key_id=settings.aws_access_key_id,
-                aws_secret_access_key=settings.aws_secret_access_key
+                aws_secret_access_key=settings.aws_secret_access_key,
+                config=Config(
+                    max_pool_connections=settings.dynamodb_max_pool_connections,
+                    retries={'max_attempts': 2, 'mode': 'adaptive'}
+                )
             )
             self.table = self.dynamodb.Table(self.table_name)
             logger.info(f"[HistoryService] Initialized DynamoDB client for table: {self.table_name}")
@@ -40,6 +95,17 @@ class HistoryService:
             self.dynamodb = None
             self.table = None
 
+        # Native async table for single-item calls (put/update/query); opened on first use because it
+        # is bound to the running event loop. Batch deletes stay on the sync table's batch_writer.
+        self._async_session = aioboto3.Session(
+            region_name=settings.aws_region,
+            aws_access_key_id=settings.aws_access_key_id,
+            aws_secret_access_key=settings.aws_secret_access_key
+        ) if aioboto3 is not None else None
+        self._async_table = None
+        self._async_loop = None
+        self._async_stack: Optional[AsyncExitStack] = None
+
     def _calculate_ttl(self) -> int:
         """
         Calculate TTL (Time To Live) for DynamoDB item.
@@ -61,6 +127,144 @@ class HistoryService:
         cutoff_ms = current_ms - (self.window_hours * 60 * 60 * 1000)
         return cutoff_ms
 
+    def _build_item(self, request: HistorySaveRequest) -> Dict[str, Any]:
+        """Convert a save request into a DynamoDB item."""
+        # Convert float to Decimal for DynamoDB compatibility, rounded to 3 places without a str round-trip
+        processing_time_decimal = Decimal(request.processing_time_ms).quantize(_PROCESSING_TIME_QUANTUM, rounding=ROUND_HALF_UP)
+
+        item = {
+            'phone_number': request.phone_number,
+            'timestamp': request.timestamp,
+            'request_message': request.request_message,
+            'response_message': request.response_message,
+            'classification': request.classification,
+            'language': request.language,
+            'is_follow_up': request.is_follow_up,
+            'processing_time_ms': processing_time_decimal,  # Use Decimal instead of float
+            'ttl': request.ttl
+        }
+
+        # Add optional fields
+        if request.sub_classification:
+            item['sub_classification'] = request.sub_classification
+        if request.subject:
+            item['subject'] = request.subject
+
+        return item
+
+    async def _run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking boto3 call on the DynamoDB executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def _get_async_table(self):
+        """Open (once per event loop) and return the aioboto3 table, or None if aioboto3 is unavailable."""
+        if self._async_session is None:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._async_table is not None and self._async_loop is loop:
+            return self._async_table
+
+        stack = AsyncExitStack()
+        try:
+            resource = await stack.enter_async_context(self._async_session.resource(
+                'dynamodb',
+                config=AioConfig(
+                    max_pool_connections=settings.dynamodb_max_pool_connections,
+                    retries={'max_attempts': 2, 'mode': 'adaptive'}
+                )
+            ))
+            table = await resource.Table(self.table_name)
+        except Exception as e:
+            await stack.aclose()
+            logger.error(f"[HistoryService] Failed to open async DynamoDB table, using thread pool: {e}")
+            self._async_session = None
+            return None
+
+        if self._async_table is not None and self._async_loop is loop:
+            # Another coroutine opened it while we were awaiting
+            await stack.aclose()
+            return self._async_table
+
+        self._async_stack, self._async_table, self._async_loop = stack, table, loop
+        return table
+
+    async def _table_call(self, method: str, **kwargs: Any) -> Any:
+        """Call a single-item table method natively async if possible, else on the DynamoDB executor."""
+        async_table = await self._get_async_table()
+        if async_table is not None:
+            return await getattr(async_table, method)(**kwargs)
+        return await self._run(getattr(self.table, method), **kwargs)
+
+    async def close(self) -> None:
+        """Close the async DynamoDB connection pool and the executor (call on shutdown)."""
+        if self._async_stack is not None:
+            await self._async_stack.aclose()
+            self._async_stack = self._async_table = self._async_loop = None
+        self._executor.shutdown(wait=False)
+
+    def _remember_user(self, phone_number: str, newest_timestamp_ms: Optional[int] = None) -> None:
+        """Mark the user as having history until their newest message (default: now) leaves the window (bounded LRU)."""
+        remaining_seconds = self.window_hours * 3600
+        if newest_timestamp_ms is not None:
+            remaining_seconds -= time.time() - newest_timestamp_ms / 1000
+        self._known_users[phone_number] = time.monotonic() + remaining_seconds
+        self._known_users.move_to_end(phone_number)
+        if len(self._known_users) > KNOWN_USERS_MAX_SIZE:
+            self._known_users.popitem(last=False)
+
+    def has_recent_history(self, phone_number: str) -> bool:
+        """Whether this process knows the user has in-window history, so a history lookup can be skipped."""
+        return self._known_users.get(phone_number, 0.0) > time.monotonic()
+
+    def is_known_user(self, phone_number: str) -> bool:
+        """Whether this process has seen the user with history at all (the entry may have expired since)."""
+        return phone_number in self._known_users
+
+    def _is_unknown_user(self, phone_number: str) -> bool:
+        """Whether the history query can be skipped because the user cannot have in-window history."""
+        if not self.skip_unknown_users:
+            return False
+        now = time.monotonic()
+        if now - self._started_at < self.window_hours * 3600:
+            return False  # Saves from before this process started may still be in the window
+        return self._known_users.get(phone_number, 0.0) <= now
+
+    @staticmethod
+    def _session_bucket(timestamp_ms: int) -> int:
+        """Start of the hour containing timestamp_ms (the session item's sort key)."""
+        return timestamp_ms - timestamp_ms % SESSION_BUCKET_MS
+
+    async def _append_to_session(self, item: Dict[str, Any]) -> None:
+        """Append one message to its hourly session item."""
+        message = {key: value for key, value in item.items() if key not in ('phone_number', 'ttl')}
+        await self._table_call(
+            'update_item',
+            Key={
+                'phone_number': item['phone_number'],
+                'timestamp': self._session_bucket(item['timestamp'])
+            },
+            UpdateExpression=SESSION_APPEND_UPDATE,
+            ExpressionAttributeNames=TTL_NAMES,
+            ExpressionAttributeValues={
+                ':empty': [],
+                ':message': [message],
+                ':ttl': item['ttl']
+            }
+        )
+
+    def _delete_items(self, items: List[Dict[str, Any]]) -> int:
+        """Blocking batch delete of items by key; run via _run."""
+        with self.table.batch_writer() as batch:
+            for item in items:
+                batch.delete_item(
+                    Key={
+                        'phone_number': item['phone_number'],
+                        'timestamp': item['timestamp']
+                    }
+                )
+        return len(items)
+
     async def save_conversation(self, request: HistorySaveRequest) -> bool:
         """
         Save a conversation to DynamoDB.
@@ -76,30 +280,14 @@ class HistoryService:
             return False
 
         try:
-            # Convert float to Decimal for DynamoDB compatibility
-            processing_time_decimal = Decimal(str(request.processing_time_ms))
-
-            item = {
-                'phone_number': request.phone_number,
-                'timestamp': request.timestamp,
-                'request_message': request.request_message,
-                'response_message': request.response_message,
-                'classification': request.classification,
-                'language': request.language,
-                'is_follow_up': request.is_follow_up,
-                'processing_time_ms': processing_time_decimal,  # Use Decimal instead of float
-                'ttl': request.ttl
-            }
-
-            # Add optional fields
-            if request.sub_classification:
-                item['sub_classification'] = request.sub_classification
-            if request.subject:
-                item['subject'] = request.subject
-
-            # Put item to DynamoDB
-            self.table.put_item(Item=item)
-
+            # Put item to DynamoDB off the event loop
+            item = self._build_item(request)
+            if self.session_layout:
+                await self._append_to_session(item)
+            else:
+                await self._table_call('put_item', Item=item)
+
+            self._remember_user(request.phone_number)
             logger.info(f"[HistoryService] Saved conversation for {request.phone_number}")
             return True
 
@@ -107,24 +295,79 @@ class HistoryService:
             logger.error(f"[HistoryService] Error saving conversation: {e}")
             return False
 
+    async def _query_session_messages(self, phone_number: str, cutoff_timestamp: int, message_limit: int) -> List[Dict[str, Any]]:
+        """Read the newest messages after cutoff from hourly session items."""
+        response = await self._table_call(
+            'query',
+            KeyConditionExpression=SESSION_KEY_CONDITION,
+            ProjectionExpression='messages',
+            ExpressionAttributeNames=TIMESTAMP_NAMES,
+            ExpressionAttributeValues={
+                ':phone': phone_number,
+                ':bucket': self._session_bucket(cutoff_timestamp)
+            },
+            ScanIndexForward=False  # Newest hour first
+        )
+
+        messages = []
+        for session in response.get('Items', []):
+            for message in reversed(session.get('messages', [])):
+                if message['timestamp'] <= cutoff_timestamp:
+                    continue
+                messages.append(message)
+                if len(messages) >= message_limit:
+                    return messages
+        return messages
+
+    @staticmethod
+    def _to_message(item: Dict[str, Any]) -> ConversationMessage:
+        """Build a ConversationMessage from a DynamoDB item; items come from our own writes, so validation is skipped."""
+        return ConversationMessage.model_construct(
+            timestamp=int(item['timestamp']),
+            request_message=item['request_message'],
+            response_message=item['response_message'],
+            classification=item['classification'],
+            sub_classification=item.get('sub_classification'),
+            subject=item.get('subject'),
+            language=item['language'],
+            is_follow_up=item.get('is_follow_up', False)
+        )
+
+    def _history(self, phone_number: str, items: List[Dict[str, Any]], raw: bool) -> Union[ConversationHistory, Dict[str, Any]]:
+        """Wrap history items as a raw dict or a ConversationHistory."""
+        if raw:
+            return {"phone_number": phone_number, "messages": items, "total_count": len(items)}
+        return ConversationHistory.model_construct(
+            phone_number=phone_number,
+            messages=[self._to_message(item) for item in items],
+            total_count=len(items)
+        )
+
     async def get_conversation_history(
         self,
         phone_number: str,
-        limit: Optional[int] = None
-    ) -> ConversationHistory:
+        limit: Optional[int] = None,
+        raw: bool = False
+    ) -> Union[ConversationHistory, Dict[str, Any]]:
         """
         Retrieve conversation history for a phone number within 24-hour window.
 
         Args:
             phone_number: User's phone number
             limit: Maximum number of messages to retrieve (default: from config)
+            raw: Return a plain dict with the DynamoDB items (newest first) instead of models
 
         Returns:
-            ConversationHistory object with messages
+            ConversationHistory object with messages, or with raw=True a dict with
+            phone_number, messages (item dicts) and total_count
         """
         if not self.table:
             logger.warning("[HistoryService] DynamoDB not initialized, returning empty history")
-            return ConversationHistory(phone_number=phone_number, messages=[], total_count=0)
+            return self._history(phone_number, [], raw)
+
+        if self._is_unknown_user(phone_number):
+            logger.info(f"[HistoryService] No saved history for {phone_number} in this window, skipping query")
+            return self._history(phone_number, [], raw)
 
         try:
             cutoff_timestamp = self._get_cutoff_timestamp()
@@ -132,47 +375,37 @@ class HistoryService:
 
             logger.info(f"[HistoryService] Fetching history for {phone_number} (last {self.window_hours}h)")
 
-            # Query DynamoDB with sliding window
-            response = self.table.query(
-                KeyConditionExpression='phone_number = :phone AND #ts > :cutoff',
-                ExpressionAttributeNames={
-                    '#ts': 'timestamp'
-                },
-                ExpressionAttributeValues={
-                    ':phone': phone_number,
-                    ':cutoff': cutoff_timestamp
-                },
-                ScanIndexForward=False,  # Newest first
-                Limit=message_limit
-            )
+            if self.session_layout:
+                items = await self._query_session_messages(phone_number, cutoff_timestamp, message_limit)
+            else:
+                # Query DynamoDB with sliding window (off the event loop), fetching only the message fields
+                response = await self._table_call(
+                    'query',
+                    KeyConditionExpression=HISTORY_KEY_CONDITION,
+                    ProjectionExpression=HISTORY_PROJECTION,
+                    ExpressionAttributeNames=HISTORY_NAMES,
+                    ExpressionAttributeValues={
+                        ':phone': phone_number,
+                        ':cutoff': cutoff_timestamp
+                    },
+                    ScanIndexForward=False,  # Newest first
+                    Limit=message_limit
+                )
 
-            items = response.get('Items', [])
+                items = response.get('Items', [])
+                if 'LastEvaluatedKey' in response:
+                    # Limit stops the query at the newest messages; older ones are intentionally not paged in
+                    logger.debug(f"[HistoryService] History for {phone_number} truncated at {message_limit} messages")
 
-            # Convert to ConversationMessage objects
-            messages = []
-            for item in items:
-                messages.append(ConversationMessage(
-                    timestamp=item['timestamp'],
-                    request_message=item['request_message'],
-                    response_message=item['response_message'],
-                    classification=item['classification'],
-                    sub_classification=item.get('sub_classification'),
-                    subject=item.get('subject'),
-                    language=item['language'],
-                    is_follow_up=item.get('is_follow_up', False)
-                ))
-
-            logger.info(f"[HistoryService] Retrieved {len(messages)} messages for {phone_number}")
-
-            return ConversationHistory(
-                phone_number=phone_number,
-                messages=messages,
-                total_count=len(messages)
-            )
+            logger.info(f"[HistoryService] Retrieved {len(items)} messages for {phone_number}")
+            if items:
+                # Items are newest first
+                self._remember_user(phone_number, int(items[0]['timestamp']))
+            return self._history(phone_number, items, raw)
 
         except Exception as e:
             logger.error(f"[HistoryService] Error retrieving conversation history: {e}")
-            return ConversationHistory(phone_number=phone_number, messages=[], total_count=0)
+            return self._history(phone_number, [], raw)
 
     async def delete_old_conversations(self, phone_number: str) -> int:
         """
@@ -191,13 +424,16 @@ class HistoryService:
 
         try:
             cutoff_timestamp = int(time.time() * 1000) - (self.retention_days * 24 * 60 * 60 * 1000)
-
-            # Query old items
-            response = self.table.query(
-                KeyConditionExpression='phone_number = :phone AND #ts < :cutoff',
-                ExpressionAttributeNames={
-                    '#ts': 'timestamp'
-                },
+            if self.session_layout:
+                # Only delete hours that end before the cutoff
+                cutoff_timestamp = self._session_bucket(cutoff_timestamp)
+
+            # Query old items (key attributes only)
+            response = await self._table_call(
+                'query',
+                KeyConditionExpression=EXPIRED_KEY_CONDITION,
+                ProjectionExpression=KEY_PROJECTION,
+                ExpressionAttributeNames=TIMESTAMP_NAMES,
                 ExpressionAttributeValues={
                     ':phone': phone_number,
                     ':cutoff': cutoff_timestamp
@@ -205,17 +441,9 @@ class HistoryService:
             )
 
             items = response.get('Items', [])
-            deleted_count = 0
 
-            # Delete each item
-            for item in items:
-                self.table.delete_item(
-                    Key={
-                        'phone_number': item['phone_number'],
-                        'timestamp': item['timestamp']
-                    }
-                )
-                deleted_count += 1
+            # Delete in BatchWriteItem calls of up to 25 keys
+            deleted_count = await self._run(self._delete_items, items)
 
             logger.info(f"[HistoryService] Deleted {deleted_count} old conversations for {phone_number}")
             return deleted_count
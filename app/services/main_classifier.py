@@ -8,7 +8,14 @@ Classifies queries into 6 main categories:
 - conversation_based
 - exam_related_info
 """
+import functools
+import hashlib
+import os
+import re
+import threading
 import time
+from collections import OrderedDict
+from typing import Optional
 from langchain_openai import ChatOpenAI
 from openai import AuthenticationError, APIStatusError
 from app.core.config import settings
@@ -16,24 +23,37 @@ from app.core.logging_config import logger
 from app.utils.exceptions import ClassificationError
 
 
-class ClassifierAgent:
-    """Agent responsible for classifying user queries into categories."""
-
-    def __init__(self, llm):
-        self.llm = llm
-        self.categories = {
-            'subject_related': 'Academic questions about specific topics, concepts, formulas, or any educational content explanation. Students asking for solutions to questions.',
-            'app_related': 'Questions about app features, navigation, how to access content, technical functionality, batch details, course information, platform usage, pricing, payments, subscriptions, discounts, and how to join batches.',
-            'complaint': 'Expressions of dissatisfaction, frustration, or problems with content quality, app functionality, locked content, or any negative experience.',
-            'guidance_based': 'Questions about study planning, exam preparation strategies, motivation, career guidance, and general educational advice.',
-            'conversation_based': 'Casual greetings, thanks, general chat, and social interactions without specific requests.',
-            'exam_related_info': 'Questions about exam patterns, schedules, syllabus, important topics, exam strategies, and examination-related information. but not the study material related to exam.'
-        }
-        self.valid_categories = set(self.categories.keys())
-
-    def classify(self, question):
-        """Classify a question into one of the 6 categories."""
-        prompt = f"""You are an expert classifier for Arivihan – an EdTech platform for 11th and 12th-grade students.
+# Classification cache on the normalized query. Only exact repeats reuse a label: near-duplicate
+# messages ("physics lecture chahiye" / "physics lecture nahi chal raha") can belong to different categories.
+CLASSIFICATION_CACHE_SIZE = int(os.getenv("MAIN_CLASSIFIER_CACHE_SIZE", "10000"))
+
+
+# Fast path: messages the prompt's own rules classify without ambiguity skip the LLM call.
+# Anything carrying a negation, a how/where/when/why, or an app reference can be a complaint
+# or an access question instead, so it always goes to the LLM.
+_GREETING_ONLY_RE = re.compile(
+    r"^\s*(hi+|hello+|hey+|namaste|namaskar|good\s+(morning|afternoon|evening|night)|"
+    r"thanks?|thank\s*(you|u)|dhanyawad|dhanyavad|dhanyavaad|shukriya)"
+    r"(\s+(sir|mam|ma'am|ji))?\s*[!.]*\s*$",
+    re.IGNORECASE
+)
+_FAST_PATH_BLOCKER_RE = re.compile(
+    r"\b(nahi|nahin|nhi|not|no|problem|issue|kharab|galat|wrong|refund|"
+    r"kaise|kaha|kahan|kab|kyu|kyon|how|where|when|why|app)\b",
+    re.IGNORECASE
+)
+_PYQ_RE = re.compile(r"\b(pyqs?|previous\s+years?\s+(questions?|papers?))\b", re.IGNORECASE)
+_LECTURE_OR_TEST_RE = re.compile(r"\b(lectures?|tests?)\b", re.IGNORECASE)
+_CONTENT_REQUEST_RE = re.compile(
+    r"^\s*(mujhe\s+)?(\w+\s+){0,4}?(lectures?|mock\s+tests?|tests?)\s+"
+    r"(chahiye|chahie|do|dijiye|bhejo|dena\s+hai)\s*[!.?]*\s*$",
+    re.IGNORECASE
+)
+
+
+# Static classifier prompt, split around the question so every request sends byte-identical
+# prefix text (eligible for OpenAI's automatic prompt caching) and nothing is re-formatted per call
+_CLASSIFIER_PROMPT_PREFIX = """You are an expert classifier for Arivihan – an EdTech platform for 11th and 12th-grade students.
 
 Your task is to classify each student query into EXACTLY ONE of these 6 categories based on the PRIMARY INTENT:
 
@@ -305,11 +325,88 @@ Is the student asking for EXAM-SPECIFIC ACADEMIC GUIDANCE, preparation strategie
 
 INSTRUCTION: Classify this query into ONE of these categories: subject_related, app_related, complaint, guidance_based, conversation_based, exam_related_info
 
-Q: {question}
+Q: """
+_CLASSIFIER_PROMPT_SUFFIX = "\n\nReturn ONLY the category name:"
+
+
+def _normalize_question(question: str) -> str:
+    """Lowercase and collapse whitespace so trivially different spellings share a cache entry."""
+    return " ".join((question or "").lower().split())
 
-Return ONLY the category name:"""
 
+class ClassificationCache:
+    """LRU cache of question -> category, keyed by sha256 of the normalized question."""
 
+    def __init__(self, max_size: int = CLASSIFICATION_CACHE_SIZE):
+        """
+        Args:
+            max_size: Maximum cached questions
+        """
+        self.max_size = max_size
+        self._exact: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(question: str) -> str:
+        return hashlib.sha256(_normalize_question(question).encode("utf-8")).hexdigest()
+
+    def lookup(self, question: str) -> Optional[str]:
+        """Return the cached category for the question, or None on a miss."""
+        key = self._key(question)
+        with self._lock:
+            category = self._exact.get(key)
+            if category is not None:
+                self._exact.move_to_end(key)
+                logger.info(f"[ClassificationCache] Hit: {category}")
+            return category
+
+    def store(self, question: str, category: str) -> None:
+        """Record the category for the question."""
+        key = self._key(question)
+        with self._lock:
+            self._exact[key] = category
+            self._exact.move_to_end(key)
+            while len(self._exact) > self.max_size:
+                self._exact.popitem(last=False)
+
+
+class ClassifierAgent:
+    """Agent responsible for classifying user queries into categories."""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.categories = {
+            'subject_related': 'Academic questions about specific topics, concepts, formulas, or any educational content explanation. Students asking for solutions to questions.',
+            'app_related': 'Questions about app features, navigation, how to access content, technical functionality, batch details, course information, platform usage, pricing, payments, subscriptions, discounts, and how to join batches.',
+            'complaint': 'Expressions of dissatisfaction, frustration, or problems with content quality, app functionality, locked content, or any negative experience.',
+            'guidance_based': 'Questions about study planning, exam preparation strategies, motivation, career guidance, and general educational advice.',
+            'conversation_based': 'Casual greetings, thanks, general chat, and social interactions without specific requests.',
+            'exam_related_info': 'Questions about exam patterns, schedules, syllabus, important topics, exam strategies, and examination-related information. but not the study material related to exam.'
+        }
+        self.valid_categories = set(self.categories.keys())
+
+    @staticmethod
+    def _fast_path(question: str) -> Optional[str]:
+        """Return the category for keyword-unambiguous messages, or None to ask the LLM."""
+        if _GREETING_ONLY_RE.match(question):
+            return 'conversation_based'
+        if _FAST_PATH_BLOCKER_RE.search(question):
+            return None
+        if _PYQ_RE.search(question):
+            # "pyq lecture chahiye" is a lecture request (app_related), so mixed requests go to the LLM
+            return None if _LECTURE_OR_TEST_RE.search(question) else 'exam_related_info'
+        if _CONTENT_REQUEST_RE.match(question):
+            return 'app_related'
+        return None
+
+    def classify(self, question):
+        """Classify a question into one of the 6 categories."""
+        fast_category = self._fast_path(question)
+        if fast_category is not None:
+            logger.info(f"[Classifier Main] Fast path: {fast_category}")
+            return fast_category
+
+        prompt = _CLASSIFIER_PROMPT_PREFIX + question + _CLASSIFIER_PROMPT_SUFFIX
         response = self.llm.invoke(prompt).content.strip().lower()
         for category in self.valid_categories:
             if category in response:
@@ -347,12 +444,21 @@ Return ONLY the category name:"""
 class SupervisorAgent:
     """Supervisor agent that wraps the classifier."""
 
-    def __init__(self, classifier_agent):
+    def __init__(self, classifier_agent, cache: Optional[ClassificationCache] = None):
         self.classifier_agent = classifier_agent
+        self.cache = cache
 
     def handle_doubt(self, question):
-        """Handle a question by classifying it."""
+        """Handle a question by classifying it, reusing the label of an identical question."""
+        if self.cache is None:
+            return self.classifier_agent.classify(question)
+
+        classification = self.cache.lookup(question)
+        if classification is not None:
+            return classification
+
         classification = self.classifier_agent.classify(question)
+        self.cache.store(question, classification)
         return classification
 
 
@@ -365,10 +471,16 @@ def create_classifier():
         temperature=settings.openai_temperature
     )
     classifier_agent = ClassifierAgent(llm)
-    supervisor_agent = SupervisorAgent(classifier_agent)
+    supervisor_agent = SupervisorAgent(classifier_agent, ClassificationCache())
     return supervisor_agent
 
 
+@functools.lru_cache(maxsize=1)
+def get_classifier():
+    """Shared classifier, built once so the ChatOpenAI client and its connection pool are reused."""
+    return create_classifier()
+
+
 def initial_main_classifier(question: str) -> str:
     """
     Main entry point for classification.
@@ -386,7 +498,7 @@ def initial_main_classifier(question: str) -> str:
         logger.info(f"[Classifier Main] Question: {question}")
         start_time = time.time()
 
-        supervisor = create_classifier()
+        supervisor = get_classifier()
         classification = supervisor.handle_doubt(question)
 
         elapsed_time = time.time() - start_time
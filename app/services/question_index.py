@@ -0,0 +1,346 @@
+"""
+Local ANN index over the FAQ Parquet questions.
+Serves top-k similar-question lookups in-process with FAISS (HNSW) instead of
+an OpenAI file_search round-trip. Corpus embeddings are cached in a sidecar
+.npy file next to the Parquet file so they are only computed once, and are
+held in float16: the HNSW graph searches fp16 vectors and the top candidates
+are re-scored exactly. The built index is written next to the sidecar, and both
+are memory-mapped read-only so every worker process shares one page-cache copy.
+A small .meta JSON file records the Parquet fingerprint both were built from, so
+editing the Parquet file triggers a rebuild. Files are written to a temp name and
+renamed into place (readers never map a half-written file), and a rebuild holds
+an exclusive .lock file so only one worker embeds the corpus.
+"""
+import asyncio
+import contextlib
+import json
+import os
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from app.core.logging_config import logger
+
+try:
+    import faiss
+except ImportError:  # Optional dependency - callers fall back to the vector store
+    faiss = None
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows - rebuilds are then unsynchronized across processes
+    fcntl = None
+
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_BATCH_SIZE = 2048
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+RERANK_CANDIDATES = 32
+EMBEDDING_MICRO_BATCH = 64
+EMBEDDING_WINDOW_SECONDS = 0.008
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so inner product equals cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _to_query_vector(response) -> np.ndarray:
+    """Convert an embeddings response for a single input into a normalized (1, dim) float32 matrix."""
+    vector = np.asarray([response.data[0].embedding], dtype=np.float32)
+    return _normalize_rows(vector)
+
+
+def embed_query(openai_client, text: str) -> np.ndarray:
+    """Embed a single query with the sync OpenAI client."""
+    response = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=[text])
+    return _to_query_vector(response)
+
+
+async def aembed_query(async_openai_client, text: str) -> np.ndarray:
+    """Embed a single query with the async OpenAI client."""
+    response = await async_openai_client.embeddings.create(model=EMBEDDING_MODEL, input=[text])
+    return _to_query_vector(response)
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batcher for single-query embeddings.
+
+    Texts submitted within a short window (up to max_batch of them) are embedded
+    with one embeddings.create call, amortizing the HTTP round trip under load.
+    """
+
+    def __init__(self, async_openai_client, max_batch: int = EMBEDDING_MICRO_BATCH, window_seconds: float = EMBEDDING_WINDOW_SECONDS):
+        self.client = async_openai_client
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Queue one text and wait for its normalized (1, dim) float32 embedding."""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        """Drain the queue into batches and dispatch them without waiting for the previous call."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window_seconds
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch):
+        """Embed the batch in one call and resolve each caller's future."""
+        try:
+            response = await self.client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=[text or " " for text, _ in batch]
+            )
+            vectors = _normalize_rows(np.asarray(
+                [item.embedding for item in sorted(response.data, key=lambda item: item.index)],
+                dtype=np.float32
+            ))
+
+            for row, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(vectors[row:row + 1])
+
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+class LocalQuestionIndex:
+    """In-process cosine-similarity index over the Parquet 'question' column."""
+
+    # index_path -> (faiss index, labels, embeddings); one loaded copy per process
+    _SHARED: Dict[str, Tuple[object, List[str], np.ndarray]] = {}
+
+    def __init__(self, parquet_file_path: str, embeddings_path: Optional[str] = None):
+        """
+        Args:
+            parquet_file_path: Parquet file with 'question' (and optionally 'id') columns
+            embeddings_path: Sidecar .npy cache (default: qa_embeddings.npy next to the Parquet file)
+        """
+        self.parquet_file_path = parquet_file_path
+        self.embeddings_path = embeddings_path or os.path.join(
+            os.path.dirname(parquet_file_path), "qa_embeddings.npy"
+        )
+        self.index_path = os.path.splitext(self.embeddings_path)[0] + ".faiss"
+        self.meta_path = os.path.splitext(self.embeddings_path)[0] + ".meta"
+        self.lock_path = os.path.splitext(self.embeddings_path)[0] + ".lock"
+        self._faiss_index = None
+        self._faiss_ids: List[str] = []
+        self._embeddings: Optional[np.ndarray] = None
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether the index has been built and can serve searches."""
+        return self._faiss_index is not None
+
+    def _load_corpus(self) -> Tuple[List[str], List[str]]:
+        """
+        Read the Parquet questions.
+
+        Returns:
+            (labels, questions): one label per row in the 'question <id>:- <text>' form
+            understood by extract_question_id (so downstream Parquet lookups can match
+            by ID), and the raw question text that is actually embedded
+        """
+        df = pd.read_parquet(self.parquet_file_path)
+        questions = df['question'].fillna("").astype(str).tolist()
+
+        if 'id' in df.columns:
+            labels = [f"question {qid}:- {question}" for qid, question in zip(df['id'].tolist(), questions)]
+            return labels, questions
+        return questions, questions
+
+    def _fingerprint(self, row_count: int) -> Dict[str, object]:
+        """Identify the Parquet contents and embedding setup the cached files were built from."""
+        stat = os.stat(self.parquet_file_path)
+        return {
+            "parquet_mtime_ns": stat.st_mtime_ns,
+            "parquet_size": stat.st_size,
+            "rows": row_count,
+            "model": EMBEDDING_MODEL,
+            "input": "question",
+        }
+
+    def _read_meta(self) -> Optional[Dict[str, object]]:
+        """Fingerprint stored next to the cached files, or None if missing/unreadable."""
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _replace_atomically(path: str, write):
+        """Call write(tmp_path) on a temp file in the same directory, then rename it over path."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @contextlib.contextmanager
+    def _build_lock(self):
+        """Hold an exclusive lock on the .lock file so concurrent workers build one at a time."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_meta(self, fingerprint: Dict[str, object]):
+        """Record the fingerprint once the sidecar and index are both written."""
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(fingerprint, f)
+        self._replace_atomically(self.meta_path, write)
+
+    def _save_embeddings(self, embeddings: np.ndarray):
+        """Write the .npy sidecar without exposing a partial file to memory-mapping readers."""
+        def write(tmp_path):
+            # A file object, not a path, so np.save does not append .npy to the temp name
+            with open(tmp_path, "wb") as f:
+                np.save(f, embeddings)
+        self._replace_atomically(self.embeddings_path, write)
+
+    def _load_or_compute_embeddings(self, openai_client, questions: List[str], reuse_cache: bool) -> np.ndarray:
+        """Load cached corpus embeddings, or embed the corpus in batches and cache the result (float16)."""
+        if reuse_cache and os.path.exists(self.embeddings_path):
+            embeddings = np.load(self.embeddings_path, mmap_mode="r")
+            if embeddings.shape[0] == len(questions):
+                logger.info(f"[QuestionIndex] Loaded {embeddings.shape[0]} cached embeddings from {self.embeddings_path}")
+                if embeddings.dtype != np.float16:
+                    # Older fp32 sidecar: rewrite once as fp16 so later loads can stay memory-mapped
+                    embeddings = np.asarray(embeddings, dtype=np.float16)
+                    self._save_embeddings(embeddings)
+                return embeddings
+            logger.warning("[QuestionIndex] Cached embeddings do not match Parquet row count, recomputing")
+
+        logger.info(f"[QuestionIndex] Embedding {len(questions)} questions with {EMBEDDING_MODEL}")
+        vectors = []
+        for start in range(0, len(questions), EMBEDDING_BATCH_SIZE):
+            batch = [question or " " for question in questions[start:start + EMBEDDING_BATCH_SIZE]]
+            response = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
+            vectors.extend(item.embedding for item in response.data)
+
+        embeddings = _normalize_rows(np.asarray(vectors, dtype=np.float32)).astype(np.float16)
+        self._save_embeddings(embeddings)
+        return embeddings
+
+    def build(self, openai_client) -> bool:
+        """
+        Build the HNSW index.
+
+        Returns:
+            True if the index is ready, False if FAISS is unavailable or the build failed
+        """
+        if faiss is None:
+            logger.warning("[QuestionIndex] faiss not installed, local index disabled")
+            return False
+
+        shared = LocalQuestionIndex._SHARED.get(self.index_path)
+        if shared is not None:
+            self._faiss_index, self._faiss_ids, self._embeddings = shared
+            return True
+
+        try:
+            # The fingerprint is read under the lock: a worker that waited on another's
+            # rebuild then finds matching files and just maps them
+            with self._build_lock():
+                labels, questions = self._load_corpus()
+                fingerprint = self._fingerprint(len(labels))
+                reuse_cache = self._read_meta() == fingerprint
+                if not reuse_cache:
+                    logger.info("[QuestionIndex] Parquet file changed or no fingerprint on disk, rebuilding cached embeddings and index")
+                embeddings = self._load_or_compute_embeddings(openai_client, questions, reuse_cache)
+
+                index = None
+                if reuse_cache and os.path.exists(self.index_path):
+                    index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                    if index.ntotal == len(labels):
+                        logger.info(f"[QuestionIndex] Memory-mapped index from {self.index_path}")
+                    else:
+                        logger.warning("[QuestionIndex] Saved index does not match Parquet row count, rebuilding")
+                        index = None
+
+                if index is None:
+                    vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+                    # fp16 scalar-quantized storage halves the memory the graph search reads
+                    index = faiss.IndexHNSWSQ(vectors.shape[1], faiss.ScalarQuantizer.QT_fp16, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+                    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+                    index.train(vectors)
+                    index.add(vectors)
+                    self._replace_atomically(self.index_path, lambda tmp_path: faiss.write_index(index, tmp_path))
+
+                if not reuse_cache:
+                    self._write_meta(fingerprint)
+
+            self._faiss_index = index
+            self._faiss_ids = labels
+            self._embeddings = embeddings
+            LocalQuestionIndex._SHARED[self.index_path] = (index, labels, embeddings)
+            logger.info(f"[QuestionIndex] HNSW index ready with {len(labels)} questions")
+            return True
+
+        except Exception as e:
+            logger.error(f"[QuestionIndex] Failed to build local index: {e}")
+            return False
+
+    def search(self, query_vector: np.ndarray, top_k: int = 3) -> List[str]:
+        """
+        Return the labels of the top_k most similar questions.
+
+        Args:
+            query_vector: Normalized (1, dim) float32 query embedding
+            top_k: Number of results
+        """
+        labels, _ = self.search_with_scores(query_vector, top_k)
+        return labels
+
+    def search_with_scores(self, query_vector: np.ndarray, top_k: int = 3) -> Tuple[List[str], List[float]]:
+        """Like search, but also return the cosine similarity of each result (best first)."""
+        candidate_count = min(max(top_k, RERANK_CANDIDATES), len(self._faiss_ids))
+        _, indices = self._faiss_index.search(query_vector, candidate_count)
+        candidates = np.asarray([i for i in indices[0] if i >= 0], dtype=np.int64)
+        if candidates.size == 0:
+            return [], []
+
+        # Re-score the candidates exactly in fp32 and keep the best top_k
+        scores = self._embeddings[candidates].astype(np.float32) @ query_vector[0]
+        order = np.argsort(-scores)[:top_k]
+        return [self._faiss_ids[i] for i in candidates[order]], [float(score) for score in scores[order]]
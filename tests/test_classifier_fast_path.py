@@ -0,0 +1,38 @@
+"""
+Tests for the keyword fast path of the main classifier (ClassifierAgent._fast_path).
+
+Only keyword-unambiguous messages skip the LLM; questions, complaints and mixed
+requests must return None so the LLM decides.
+
+Run: python -m pytest tests/test_classifier_fast_path.py -q
+"""
+import pytest
+
+from app.services.main_classifier import ClassifierAgent
+
+
+@pytest.mark.parametrize("message", ["hi", "Hello sir!", "good morning ji", "thank you", "dhanyawad"])
+def test_greetings_are_conversation(message):
+    assert ClassifierAgent._fast_path(message) == "conversation_based"
+
+
+@pytest.mark.parametrize("message", ["physics pyq", "previous year questions of chemistry"])
+def test_pyq_requests_are_exam_info(message):
+    assert ClassifierAgent._fast_path(message) == "exam_related_info"
+
+
+@pytest.mark.parametrize("message", ["physics lecture chahiye", "mujhe chemistry ke mock test do"])
+def test_content_requests_are_app_related(message):
+    assert ClassifierAgent._fast_path(message) == "app_related"
+
+
+@pytest.mark.parametrize("message", [
+    "pyq lecture chahiye",
+    "pyq kab milega",
+    "physics lecture nahi chal raha chahiye",
+    "app mein lecture kaise dekhe",
+    "hi sir, electrostatics samjhao",
+    "what is ohm's law",
+])
+def test_ambiguous_messages_go_to_the_llm(message):
+    assert ClassifierAgent._fast_path(message) is None
@@ -0,0 +1,87 @@
+"""
+Tests for follow-up detection micro-batching (followup_detector._DetectBatcher).
+
+Requests from different users never share a GPT call, a lone request uses the
+single-conversation prompt, and batch entries the model skipped (or a failed
+batch call) are re-run one by one.
+
+Run: python -m pytest tests/test_detect_batcher.py -q
+"""
+import asyncio
+
+from app.services.followup_detector import _DetectBatcher
+
+
+class _FakeDetector:
+    def __init__(self, batch_results=None, batch_error=None):
+        self.batch_calls = []
+        self.single_calls = []
+        self.batch_results = batch_results
+        self.batch_error = batch_error
+
+    async def _detect_batch(self, items):
+        self.batch_calls.append(list(items))
+        if self.batch_error is not None:
+            raise self.batch_error
+        if self.batch_results is not None:
+            return list(self.batch_results)
+        return [{"is_follow_up": True, "enriched_message": message} for message, _ in items]
+
+    async def _detect_single(self, current_message, context_string):
+        self.single_calls.append(current_message)
+        return {"is_follow_up": False, "enriched_message": current_message}
+
+
+def _submit_all(detector, requests):
+    async def run():
+        batcher = _DetectBatcher(detector, window_seconds=0.01)
+        try:
+            return await asyncio.gather(*(batcher.submit(*request) for request in requests))
+        finally:
+            await batcher.close()
+
+    return asyncio.run(run())
+
+
+def test_users_are_never_batched_together():
+    detector = _FakeDetector()
+    results = _submit_all(detector, [
+        ("user-a", "a1", "ctx-a"),
+        ("user-b", "b1", "ctx-b"),
+        ("user-a", "a2", "ctx-a"),
+    ])
+
+    assert detector.batch_calls == [[("a1", "ctx-a"), ("a2", "ctx-a")]]
+    assert detector.single_calls == ["b1"]
+    assert [result["enriched_message"] for result in results] == ["a1", "b1", "a2"]
+
+
+def test_skipped_batch_entries_are_retried_alone():
+    detector = _FakeDetector(batch_results=[{"is_follow_up": True, "enriched_message": "a1"}, None])
+    results = _submit_all(detector, [("user-a", "a1", "ctx"), ("user-a", "a2", "ctx")])
+
+    assert detector.single_calls == ["a2"]
+    assert results == [
+        {"is_follow_up": True, "enriched_message": "a1"},
+        {"is_follow_up": False, "enriched_message": "a2"},
+    ]
+
+
+def test_failed_batch_call_is_retried_one_by_one():
+    detector = _FakeDetector(batch_error=RuntimeError("bad JSON"))
+    results = _submit_all(detector, [("user-a", "a1", "ctx"), ("user-a", "a2", "ctx")])
+
+    assert sorted(detector.single_calls) == ["a1", "a2"]
+    assert [result["enriched_message"] for result in results] == ["a1", "a2"]
+
+
+def test_close_stops_the_worker():
+    async def run():
+        batcher = _DetectBatcher(_FakeDetector(), window_seconds=0.01)
+        await batcher.submit("user-a", "a1", "ctx")
+        worker = batcher._worker
+        await batcher.close()
+        return worker
+
+    worker = asyncio.run(run())
+    assert worker.cancelled()
@@ -0,0 +1,45 @@
+"""
+Tests for the FAQ answer token budget (exam_faq_query._budget).
+
+Hindi answers tokenize to several tokens per word, so they must keep the full
+budget even for short queries; only short English queries are capped.
+
+Run: python -m pytest tests/test_exam_faq_budget.py -q
+"""
+import pytest
+
+from app.services.exam_faq_query import (
+    _MAX_TOKENS_DEFAULT,
+    _MAX_TOKENS_EXPLAIN,
+    _MAX_TOKENS_SHORT,
+    _budget,
+)
+
+
+@pytest.mark.parametrize("query", [
+    "exam kab hai",
+    "admit card kaise milega",
+    "physics ka syllabus",
+])
+def test_hindi_answers_keep_full_budget(query):
+    assert _budget(query, "hindi") == _MAX_TOKENS_DEFAULT
+
+
+@pytest.mark.parametrize("query", [
+    "परीक्षा कब है",
+    "प्रवेश पत्र कैसे मिलेगा",
+])
+def test_devanagari_queries_keep_full_budget(query):
+    assert _budget(query, "english") == _MAX_TOKENS_DEFAULT
+
+
+def test_short_english_query_is_capped():
+    assert _budget("when is the exam", "english") == _MAX_TOKENS_SHORT
+
+
+def test_long_english_explain_query():
+    assert _budget("please explain how the board exam marking scheme works this year", "english") == _MAX_TOKENS_EXPLAIN
+
+
+def test_long_english_query_gets_default():
+    assert _budget("which documents do I need to carry to the board exam centre on the first day", "english") == _MAX_TOKENS_DEFAULT
@@ -0,0 +1,30 @@
+"""
+Tests for the exam API session IDs (exam_handler._uuid7).
+
+IDs are RFC 4122 version-7 UUIDs whose leading 48 bits are the millisecond
+timestamp, so they sort by creation time across milliseconds.
+
+Run: python -m pytest tests/test_exam_session_id.py -q
+"""
+import uuid
+from types import SimpleNamespace
+
+from app.services.handlers import exam_handler
+
+
+def test_uuid7_version_variant_and_timestamp(monkeypatch):
+    monkeypatch.setattr(exam_handler, "time", SimpleNamespace(time_ns=lambda: 1_700_000_000_123_456_789))
+    value = uuid.UUID(exam_handler._uuid7())
+
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+    assert value.int >> 80 == 1_700_000_000_123
+
+
+def test_uuid7_sorts_by_millisecond(monkeypatch):
+    clock = iter(range(1_700_000_000_000_000_000, 1_700_000_000_050_000_000, 1_000_000))
+    monkeypatch.setattr(exam_handler, "time", SimpleNamespace(time_ns=lambda: next(clock)))
+    ids = [exam_handler._uuid7() for _ in range(50)]
+
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
@@ -0,0 +1,87 @@
+"""
+Tests for the local follow-up pre-filter (FollowUpDetector._may_be_follow_up).
+
+Stop phrases and anaphora must short-circuit to True (GPT decides) without an
+embedding call; long unrelated messages fall through to the similarity check.
+
+Run: python -m pytest tests/test_followup_prefilter.py -q
+"""
+import asyncio
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from app.services.followup_detector import FollowUpDetector
+
+
+class _OrthogonalBatcher:
+    """Embeds every distinct text to a different unit vector, so similarity is always 0."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def embed(self, text):
+        self.calls += 1
+        vector = np.zeros((1, 8), dtype=np.float32)
+        vector[0, self.calls % 8] = 1.0
+        return vector
+
+
+def _detector():
+    detector = FollowUpDetector.__new__(FollowUpDetector)
+    detector._embedding_batcher = _OrthogonalBatcher()
+    detector._last_turn_embeddings = OrderedDict()
+    return detector
+
+
+def _may_be_follow_up(detector, message):
+    return asyncio.run(detector._may_be_follow_up(
+        message, "919999999999", "What are the important questions for electrostatics"
+    ))
+
+
+@pytest.mark.parametrize("message", [
+    "please don't reply to me anymore",
+    "dont respond to my messages again",
+    "just leave me alone for today",
+    "I am not interested in this at all",
+    "mujhse baat mat karo ab please",
+    "chup ho jao mujhe nahi padhna",
+    "bas karo yaar bahut ho gaya",
+    "मुझसे अब बात मत करो प्लीज़",
+    "चुप हो जाओ मुझे नहीं पढ़ना",
+])
+def test_stop_phrases_defer_to_gpt(message):
+    detector = _detector()
+    assert _may_be_follow_up(detector, message) is True
+    assert detector._embedding_batcher.calls == 0
+
+
+@pytest.mark.parametrize("message", [
+    "can you give an example of that",
+    "explain the second one in more detail",
+    "उसके बारे में थोड़ा और बताइए",
+    "ये वाला सवाल फिर से समझाइए",
+])
+def test_anaphora_defers_to_gpt(message):
+    detector = _detector()
+    assert _may_be_follow_up(detector, message) is True
+    assert detector._embedding_batcher.calls == 0
+
+
+@pytest.mark.parametrize("message", ["more", "haan", "why?"])
+def test_short_messages_defer_to_gpt(message):
+    detector = _detector()
+    assert _may_be_follow_up(detector, message) is True
+    assert detector._embedding_batcher.calls == 0
+
+
+@pytest.mark.parametrize("message", [
+    "Chemistry ke important questions bhejo class 12 board",
+    "Send me the biology syllabus for class 11 please",
+])
+def test_unrelated_long_messages_are_new_topics(message):
+    detector = _detector()
+    assert _may_be_follow_up(detector, message) is False
+    assert detector._embedding_batcher.calls == 2
@@ -0,0 +1,180 @@
+"""
+Tests for the guidance answer caches and request coalescing (guidance_processor).
+
+QueryCache expires entries after their TTL and evicts least recently used entries;
+AnswerCache zstd-packs long answers; concurrent identical queries share one
+_answer_query call, including when the owner fails or is cancelled.
+
+Run: python -m pytest tests/test_guidance_caches.py -q
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import guidance_processor
+from app.services.guidance_processor import (
+    CACHE_COMPRESS_MIN_BYTES,
+    FALLBACK_GENERATION_TEXT,
+    FALLBACK_QUESTION_RESPONSE,
+    AnswerCache,
+    QueryCache,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(guidance_processor, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_query_cache_expires_after_ttl(clock):
+    cache = QueryCache(max_size=4, ttl_seconds=60)
+    cache.put(("q",), "value")
+
+    clock.now += 59
+    assert cache.get(("q",)) == "value"
+    clock.now += 1
+    assert cache.get(("q",)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_query_cache_evicts_least_recently_used(clock):
+    cache = QueryCache(max_size=2, ttl_seconds=60)
+    cache.put(("a",), 1)
+    cache.put(("b",), 2)
+    cache.get(("a",))
+    cache.put(("c",), 3)
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1
+    assert cache.get(("c",)) == 3
+
+
+def test_answer_cache_key_normalizes_query():
+    assert AnswerCache.make_key("  Exam  KAB hai ", "Physics", None) == ("exam kab hai", "physics", "hindi")
+
+
+def test_answer_cache_stores_short_answers_as_text():
+    cache = AnswerCache()
+    cache.put(("q",), "short answer")
+    assert cache._entries[("q",)][1] == "short answer"
+    assert cache.get(("q",)) == "short answer"
+
+
+@pytest.mark.skipif(guidance_processor.zstandard is None, reason="zstandard not installed")
+def test_answer_cache_compresses_long_answers():
+    cache = AnswerCache()
+    answer = "Beta, roz 2 ghante padhai karo. " * (CACHE_COMPRESS_MIN_BYTES // 8)
+    cache.put(("q",), answer)
+
+    packed = cache._entries[("q",)][1]
+    assert isinstance(packed, bytes) and len(packed) < len(answer.encode("utf-8"))
+    assert cache.get(("q",)) == answer
+
+
+@pytest.fixture
+def answer_cache(monkeypatch):
+    cache = AnswerCache()
+    monkeypatch.setattr(guidance_processor, "answer_cache", cache)
+    return cache
+
+
+def _patch_answer_query(monkeypatch, answer_query):
+    calls = []
+
+    async def fake_answer_query(query, subject, language):
+        calls.append(query)
+        return await answer_query()
+
+    monkeypatch.setattr(guidance_processor, "_answer_query", fake_answer_query)
+    return calls
+
+
+async def _ask_twice():
+    """Start an owner request, let it register, then join it with an identical one."""
+    owner = asyncio.create_task(guidance_processor.ask_arivihan_question("exam kab hai", "physics"))
+    await asyncio.sleep(0)
+    joiner = asyncio.create_task(guidance_processor.ask_arivihan_question("Exam kab  hai", "physics"))
+    await asyncio.sleep(0)
+    return owner, joiner
+
+
+def test_identical_queries_share_one_answer(monkeypatch, answer_cache):
+    release = asyncio.Event()
+
+    async def answer():
+        await release.wait()
+        return "March mein", True
+
+    calls = _patch_answer_query(monkeypatch, answer)
+
+    async def run():
+        owner, joiner = await _ask_twice()
+        release.set()
+        return await owner, await joiner
+
+    owner_response, joiner_response = asyncio.run(run())
+    assert calls == ["exam kab hai"]
+    assert owner_response["text"] == joiner_response["text"] == "March mein"
+    assert guidance_processor._inflight_answers == {}
+    assert answer_cache.get(AnswerCache.make_key("exam kab hai", "physics", "hindi")) == "March mein"
+
+
+def test_ungrounded_answer_is_not_cached(monkeypatch, answer_cache):
+    async def answer():
+        return "Generic advice", False
+
+    _patch_answer_query(monkeypatch, answer)
+
+    response = asyncio.run(guidance_processor.ask_arivihan_question("exam kab hai", "physics"))
+    assert response["text"] == "Generic advice"
+    assert answer_cache.get(AnswerCache.make_key("exam kab hai", "physics", "hindi")) is None
+
+
+def test_owner_failure_is_shared_with_joined_requests(monkeypatch, answer_cache):
+    release = asyncio.Event()
+
+    async def answer():
+        await release.wait()
+        raise RuntimeError("search down")
+
+    calls = _patch_answer_query(monkeypatch, answer)
+
+    async def run():
+        owner, joiner = await _ask_twice()
+        release.set()
+        return await owner, await joiner
+
+    owner_response, joiner_response = asyncio.run(run())
+    assert len(calls) == 1
+    assert owner_response == joiner_response == FALLBACK_QUESTION_RESPONSE
+    assert guidance_processor._inflight_answers == {}
+
+
+def test_owner_cancellation_falls_back_for_joined_requests(monkeypatch, answer_cache):
+    async def answer():
+        await asyncio.Event().wait()
+
+    _patch_answer_query(monkeypatch, answer)
+
+    async def run():
+        owner, joiner = await _ask_twice()
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await joiner
+
+    joiner_response = asyncio.run(run())
+    assert joiner_response["text"] == FALLBACK_GENERATION_TEXT
+    assert guidance_processor._inflight_answers == {}
+    assert answer_cache.get(AnswerCache.make_key("exam kab hai", "physics", "hindi")) is None
@@ -0,0 +1,90 @@
+"""
+Tests for the hourly session layout of HistoryService and its known-users map.
+
+Each message is appended to one item per (phone_number, hour); reads walk the
+hours newest first, skip messages older than the window cutoff and stop at the
+limit. Users with saved or read history skip the lookup until it leaves the window.
+
+Run: python -m pytest tests/test_history_session_layout.py -q
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+from app.services.history_service import SESSION_BUCKET_MS, HistoryService
+
+HOUR_START = 480_000 * SESSION_BUCKET_MS
+
+
+class _FakeTable:
+    def __init__(self, response=None):
+        self.calls = []
+        self.response = response or {}
+
+    async def __call__(self, method, **kwargs):
+        self.calls.append((method, kwargs))
+        return self.response
+
+
+def _service(table):
+    service = HistoryService.__new__(HistoryService)
+    service.window_hours = 24
+    service.skip_unknown_users = False
+    service._known_users = OrderedDict()
+    service._started_at = time.monotonic()
+    service._table_call = table
+    return service
+
+
+def _message(timestamp):
+    return {"timestamp": timestamp, "request_message": f"q{timestamp}"}
+
+
+def test_session_bucket_is_start_of_hour():
+    assert HistoryService._session_bucket(HOUR_START) == HOUR_START
+    assert HistoryService._session_bucket(HOUR_START + SESSION_BUCKET_MS - 1) == HOUR_START
+
+
+def test_append_goes_to_the_hour_item_without_key_attributes():
+    table = _FakeTable()
+    item = {"phone_number": "919999999999", "timestamp": HOUR_START + 1234, "ttl": 99, "request_message": "hi"}
+    asyncio.run(_service(table)._append_to_session(item))
+
+    [(method, kwargs)] = table.calls
+    assert method == "update_item"
+    assert kwargs["Key"] == {"phone_number": "919999999999", "timestamp": HOUR_START}
+    assert kwargs["ExpressionAttributeValues"][":message"] == [{"timestamp": HOUR_START + 1234, "request_message": "hi"}]
+    assert kwargs["ExpressionAttributeValues"][":ttl"] == 99
+
+
+def test_query_reads_newest_first_and_skips_messages_before_cutoff():
+    # Sessions come newest hour first; messages inside a session are oldest first
+    table = _FakeTable({"Items": [
+        {"messages": [_message(HOUR_START + 10), _message(HOUR_START + 20)]},
+        {"messages": [_message(HOUR_START - 20), _message(HOUR_START - 10)]},
+    ]})
+    service = _service(table)
+
+    messages = asyncio.run(service._query_session_messages("919999999999", HOUR_START - 15, 10))
+
+    assert [m["timestamp"] for m in messages] == [HOUR_START + 20, HOUR_START + 10, HOUR_START - 10]
+    assert table.calls[0][1]["ExpressionAttributeValues"][":bucket"] == HOUR_START - SESSION_BUCKET_MS
+
+
+def test_query_stops_at_limit():
+    table = _FakeTable({"Items": [{"messages": [_message(HOUR_START + i) for i in range(5)]}]})
+    messages = asyncio.run(_service(table)._query_session_messages("919999999999", HOUR_START - 1, 2))
+    assert [m["timestamp"] for m in messages] == [HOUR_START + 4, HOUR_START + 3]
+
+
+def test_known_user_expires_with_newest_message():
+    service = _service(_FakeTable())
+    now_ms = int(time.time() * 1000)
+
+    service._remember_user("fresh")
+    service._remember_user("stale", now_ms - service.window_hours * 3600 * 1000 - 1000)
+
+    assert service.has_recent_history("fresh")
+    assert not service.has_recent_history("stale")
+    assert service.is_known_user("stale")
+    assert not service.is_known_user("never-seen")
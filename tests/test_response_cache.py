@@ -0,0 +1,87 @@
+"""
+Tests for the handler response cache (handlers._response_cache).
+
+Keys match on the normalized message text, entries expire after the TTL and
+are evicted least recently used first, and callers get their own copies.
+
+Run: python -m pytest tests/test_response_cache.py -q
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.handlers import _response_cache
+from app.services.handlers._response_cache import ResponseCache, normalize_query
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(_response_cache, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_normalize_query():
+    assert normalize_query("  Hello!!  Sir ") == "hello sir"
+    assert normalize_query(None) == ""
+
+
+def test_key_ignores_case_punctuation_and_spacing():
+    assert ResponseCache.make_key("greeting", "Hindi", True, "Hello Sir!") == \
+        ResponseCache.make_key("greeting", "hindi", True, "hello   sir")
+
+
+def test_key_without_normalization_keeps_punctuation():
+    assert ResponseCache.make_key("doubt", "english", False, "x^2 + 1", normalize=False) != \
+        ResponseCache.make_key("doubt", "english", False, "x2 1", normalize=False)
+
+
+def test_key_separates_first_message_and_subject():
+    base = ResponseCache.make_key("greeting", "hindi", True, "hi", subject="physics")
+    assert base != ResponseCache.make_key("greeting", "hindi", False, "hi", subject="physics")
+    assert base != ResponseCache.make_key("greeting", "hindi", True, "hi", subject="chemistry")
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(max_size=4, ttl_seconds=60)
+    key = ResponseCache.make_key("greeting", "hindi", True, "hi")
+    cache.put(key, {"status": "success"})
+
+    clock.now += 60
+    assert cache.get(key) == {"status": "success"}
+    clock.now += 1
+    assert cache.get(key) is None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(max_size=2, ttl_seconds=60)
+    keys = [ResponseCache.make_key("greeting", "hindi", True, text) for text in ("hi", "hello", "namaste")]
+    cache.put(keys[0], {"n": 0})
+    cache.put(keys[1], {"n": 1})
+    cache.get(keys[0])
+    cache.put(keys[2], {"n": 2})
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == {"n": 0}
+    assert cache.get(keys[2]) == {"n": 2}
+
+
+def test_callers_get_independent_copies():
+    cache = ResponseCache()
+    key = ResponseCache.make_key("greeting", "hindi", True, "hi")
+    response = {"status": "success", "metadata": {"subject": None}}
+    cache.put(key, response)
+
+    response["metadata"]["subject"] = "physics"
+    first = cache.get(key)
+    first["metadata"]["cached"] = True
+
+    assert cache.get(key) == {"status": "success", "metadata": {"subject": None}}